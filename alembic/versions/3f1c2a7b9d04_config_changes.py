@@ -0,0 +1,42 @@
+"""config change log
+
+Revision ID: 3f1c2a7b9d04
+Revises: d9e556c55835
+Create Date: 2026-10-17 10:12:44.318201
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a7b9d04'
+down_revision: Union[str, Sequence[str], None] = 'd9e556c55835'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('config_changes',
+    sa.Column('version', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('entity_type', sa.String(length=32), nullable=False),
+    sa.Column('entity_id', sa.String(length=36), nullable=False),
+    sa.Column('action', sa.String(length=16), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('version'),
+    sqlite_autoincrement=True
+    )
+    # Existing entities start out as upserts so a sync from version 0 sees them.
+    for entity_type, table in (('environment', 'environments'), ('flag', 'flags'), ('rule', 'rules')):
+        op.execute(
+            "INSERT INTO config_changes (entity_type, entity_id, action, created_at) "
+            f"SELECT '{entity_type}', id, 'upsert', CURRENT_TIMESTAMP FROM {table}"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('config_changes')
@@ -0,0 +1,139 @@
+"""Incremental configuration sync: changes since a version, and a live SSE stream."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from app.api.v1.flags import flag_to_response
+from app.api.v1.rules import rule_to_response
+from app.core.auth import require_read
+from app.core.changes import changes_since
+from app.core.config import Settings, get_settings
+from app.core.database import get_db
+from app.core.targeting import flag_level_lists
+from app.models.models import Environment, Flag, Rule
+from app.schemas.schemas import ChangesResponse, ConfigChangeEntry, EnvironmentResponse
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Callable, Mapping
+
+    from sqlalchemy.orm import Session
+
+    from app.core.targeting import FlagLevelList
+    from app.models.models import ConfigChange
+
+router = APIRouter(prefix="/changes", tags=["changes"])
+
+HEARTBEAT_SECONDS = 15.0
+
+
+def _to_entry(
+    change: ConfigChange,
+    entity: Flag | Environment | Rule | None,
+    targeting: Mapping[tuple[str, str], FlagLevelList],
+) -> ConfigChangeEntry:
+    payload: object = None
+    if isinstance(entity, Flag):
+        payload = flag_to_response(entity, targeting)
+    elif isinstance(entity, Rule):
+        payload = rule_to_response(entity)
+    elif isinstance(entity, Environment):
+        payload = EnvironmentResponse.model_validate(entity)
+    return ConfigChangeEntry.model_validate(
+        {
+            "version": change.version,
+            "entity_type": change.entity_type,
+            "entity_id": change.entity_id,
+            "action": change.action,
+            "entity": payload,
+        }
+    )
+
+
+def load_changes(db: Session, since: int) -> ChangesResponse:
+    """Return the compacted changes after ``since`` with their current entities."""
+    version, changes = changes_since(db, since)
+    flag_ids = [entity.id for _change, entity in changes if isinstance(entity, Flag)]
+    targeting = flag_level_lists(db, flag_ids) if flag_ids else {}
+    response = ChangesResponse(
+        version=version,
+        changes=[_to_entry(change, entity, targeting) for change, entity in changes],
+    )
+    # End the read transaction so the next poll sees later commits.
+    db.rollback()
+    return response
+
+
+async def change_events(
+    poll: Callable[[int], ChangesResponse],
+    since: int,
+    *,
+    interval: float,
+    heartbeat: float = HEARTBEAT_SECONDS,
+) -> AsyncIterator[str]:
+    """Yield server-sent events for every change after ``since``, polling forever.
+
+    Each event's id is its version, so a reconnecting client resumes from
+    ``Last-Event-ID``. A comment line is sent after ``heartbeat`` idle seconds
+    to keep proxies from closing the connection.
+    """
+    yield f"retry: {max(int(interval * 2000), 1000)}\n\n"
+    idle = 0.0
+    while True:
+        result = await run_in_threadpool(poll, since)
+        if result.changes:
+            for entry in result.changes:
+                yield f"id: {entry.version}\nevent: change\ndata: {entry.model_dump_json()}\n\n"
+            since = result.version
+            idle = 0.0
+        else:
+            idle += interval
+            if idle >= heartbeat:
+                yield ": keep-alive\n\n"
+                idle = 0.0
+        await asyncio.sleep(interval)
+
+
+@router.get("", response_model=ChangesResponse)
+def list_changes(
+    since: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    _key: str = Depends(require_read),
+) -> ChangesResponse:
+    """Return entities changed or deleted after version ``since``.
+
+    Pass the returned ``version`` as ``since`` on the next call.
+    """
+    return load_changes(db, since)
+
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_changes(
+    since: int = Query(0, ge=0),
+    last_event_id: str | None = Header(None),
+    db: Session = Depends(get_db),
+    settings: Settings = Depends(get_settings),
+    _key: str = Depends(require_read),
+) -> StreamingResponse:
+    """Stream changes as server-sent events as soon as they are committed.
+
+    The change log is polled, so writes made by other workers or processes are
+    picked up too.
+    """
+    if last_event_id is not None and last_event_id.isdigit():
+        since = int(last_event_id)
+    events = change_events(
+        lambda version: load_changes(db, version),
+        since,
+        interval=settings.change_poll_interval_seconds,
+    )
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
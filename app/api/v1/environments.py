@@ -8,14 +8,18 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
 
 from app.core.auth import require_admin
-from app.core.database import get_db
+from app.core.changes import ENVIRONMENT, record_change
+from app.core.database import get_async_db, get_db
+from app.core.snapshot import mark_config_changed
 from app.models.models import Environment
 from app.schemas.schemas import EnvironmentCreate, EnvironmentResponse
 
 if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
     from sqlalchemy.orm import Session
 
 router = APIRouter(prefix="/environments", tags=["environments"])
+async_router = APIRouter(prefix="/environments", tags=["environments"])
 
 
 @router.post("", response_model=EnvironmentResponse, status_code=status.HTTP_201_CREATED)
@@ -33,7 +37,10 @@ def create_environment(
         )
     env = Environment(key=body.key, name=body.name, description=body.description)
     db.add(env)
+    db.flush()
+    record_change(db, ENVIRONMENT, env.id)
     db.commit()
+    mark_config_changed()
     db.refresh(env)
     return EnvironmentResponse.model_validate(env)
 
@@ -45,3 +52,39 @@ def list_environments(
 ) -> list[EnvironmentResponse]:
     envs = db.execute(select(Environment).order_by(Environment.created_at.desc())).scalars().all()
     return [EnvironmentResponse.model_validate(e) for e in envs]
+
+
+@async_router.post("", response_model=EnvironmentResponse, status_code=status.HTTP_201_CREATED)
+async def create_environment_async(
+    body: EnvironmentCreate,
+    db: AsyncSession = Depends(get_async_db),
+    _key: str = Depends(require_admin),
+) -> EnvironmentResponse:
+    existing = (
+        await db.execute(select(Environment).where(Environment.key == body.key))
+    ).scalar_one_or_none()
+    if existing:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Environment key already exists"
+        )
+    env = Environment(key=body.key, name=body.name, description=body.description)
+    db.add(env)
+    await db.flush()
+    record_change(db, ENVIRONMENT, env.id)
+    await db.commit()
+    mark_config_changed()
+    await db.refresh(env)
+    return EnvironmentResponse.model_validate(env)
+
+
+@async_router.get("", response_model=list[EnvironmentResponse])
+async def list_environments_async(
+    db: AsyncSession = Depends(get_async_db),
+    _key: str = Depends(require_admin),
+) -> list[EnvironmentResponse]:
+    envs = (
+        (await db.execute(select(Environment).order_by(Environment.created_at.desc())))
+        .scalars()
+        .all()
+    )
+    return [EnvironmentResponse.model_validate(e) for e in envs]
@@ -4,26 +4,150 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
+from fastapi.concurrency import run_in_threadpool
 
 from app.core.auth import require_read
-from app.core.database import get_db
-from app.core.evaluation import evaluate_flag
-from app.schemas.schemas import BulkEvalRequest, BulkEvalResponse, EvalRequest, EvalResponse
+from app.core.cache import get_decision_cache
+from app.core.database import get_async_db, get_read_db
+from app.core.evaluation import (
+    evaluate_all_with_snapshot,
+    evaluate_bulk_with_snapshot,
+    evaluate_ndjson,
+    evaluate_with_snapshot,
+)
+from app.core.snapshot import get_snapshot, get_snapshot_async
+from app.core.streaming import LineSplitter, NDJSONResponse
+from app.core.timing import phase, record_evaluations
+from app.schemas.schemas import (
+    BulkEvalRequest,
+    BulkEvalResponse,
+    EvalAllRequest,
+    EvalRequest,
+    EvalResponse,
+)
 
 if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from sqlalchemy.ext.asyncio import AsyncSession
     from sqlalchemy.orm import Session
 
+    from app.core.snapshot import Snapshot
+
 router = APIRouter(tags=["evaluate"])
+async_router = APIRouter(tags=["evaluate"])
+
+
+def _evaluate(
+    body: EvalRequest | BulkEvalRequest, snapshot: Snapshot
+) -> EvalResponse | BulkEvalResponse:
+    cache = get_decision_cache()
+    if isinstance(body, BulkEvalRequest):
+        record_evaluations(snapshot, ((req.flag_key, req.env_key) for req in body.evaluations))
+        return BulkEvalResponse(
+            results=evaluate_bulk_with_snapshot(body.evaluations, snapshot, cache)
+        )
+    record_evaluations(snapshot, ((body.flag_key, body.env_key),))
+    return evaluate_with_snapshot(body, snapshot, cache)
+
+
+def _evaluate_all(body: EvalAllRequest, snapshot: Snapshot) -> BulkEvalResponse:
+    configs = snapshot.flags_for_env(body.env_key)
+    record_evaluations(snapshot, ((config.flag_key, body.env_key) for config in configs))
+    return BulkEvalResponse(
+        results=evaluate_all_with_snapshot(body.env_key, body.user_id, body.attributes, snapshot)
+    )
 
 
 @router.post("/evaluate", response_model=EvalResponse | BulkEvalResponse)
 def evaluate(
     body: EvalRequest | BulkEvalRequest,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     _key: str = Depends(require_read),
 ) -> EvalResponse | BulkEvalResponse:
-    if isinstance(body, BulkEvalRequest):
-        results = [evaluate_flag(req, db) for req in body.evaluations]
-        return BulkEvalResponse(results=results)
-    return evaluate_flag(body, db)
+    with phase("db"):
+        snapshot = get_snapshot(db)
+    with phase("match"):
+        return _evaluate(body, snapshot)
+
+
+@router.post("/evaluate/all", response_model=BulkEvalResponse)
+def evaluate_all_flags(
+    body: EvalAllRequest,
+    db: Session = Depends(get_read_db),
+    _key: str = Depends(require_read),
+) -> BulkEvalResponse:
+    with phase("db"):
+        snapshot = get_snapshot(db)
+    with phase("match"):
+        return _evaluate_all(body, snapshot)
+
+
+@router.post("/evaluate/stream", response_class=NDJSONResponse)
+async def evaluate_stream(
+    request: Request,
+    db: Session = Depends(get_read_db),
+    _key: str = Depends(require_read),
+) -> NDJSONResponse:
+    """Evaluate newline-delimited JSON requests, streaming NDJSON results back.
+
+    Every body chunk is evaluated on a worker thread as it arrives against one
+    configuration snapshot, so memory does not grow with the batch size.
+    """
+    snapshot = await run_in_threadpool(get_snapshot, db)
+    return NDJSONResponse(_stream_results(request, snapshot))
+
+
+async def _stream_results(request: Request, snapshot: Snapshot) -> AsyncIterator[bytes]:
+    cache = get_decision_cache()
+    splitter = LineSplitter()
+    index = 0
+    async for block in request.stream():
+        lines = splitter.push(block)
+        if lines:
+            yield await run_in_threadpool(evaluate_ndjson, lines, snapshot, cache, start=index)
+            index += len(lines)
+    lines = splitter.finish()
+    if lines:
+        yield await run_in_threadpool(evaluate_ndjson, lines, snapshot, cache, start=index)
+
+
+# ── Async variants ─────────────────────────────────────────────────
+# Served when ASYNC_DATABASE is enabled. Evaluation itself is CPU-only and
+# runs on the event loop; only a snapshot rebuild awaits the database.
+
+
+@async_router.post("/evaluate", response_model=EvalResponse | BulkEvalResponse)
+async def evaluate_async(
+    body: EvalRequest | BulkEvalRequest,
+    db: AsyncSession = Depends(get_async_db),
+    _key: str = Depends(require_read),
+) -> EvalResponse | BulkEvalResponse:
+    with phase("db"):
+        snapshot = await get_snapshot_async(db)
+    with phase("match"):
+        return _evaluate(body, snapshot)
+
+
+@async_router.post("/evaluate/all", response_model=BulkEvalResponse)
+async def evaluate_all_flags_async(
+    body: EvalAllRequest,
+    db: AsyncSession = Depends(get_async_db),
+    _key: str = Depends(require_read),
+) -> BulkEvalResponse:
+    with phase("db"):
+        snapshot = await get_snapshot_async(db)
+    with phase("match"):
+        return _evaluate_all(body, snapshot)
+
+
+@async_router.post("/evaluate/stream", response_class=NDJSONResponse)
+async def evaluate_stream_async(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    _key: str = Depends(require_read),
+) -> NDJSONResponse:
+    """Evaluate newline-delimited JSON requests, streaming NDJSON results back."""
+    snapshot = await get_snapshot_async(db)
+    return NDJSONResponse(_stream_results(request, snapshot))
@@ -0,0 +1,41 @@
+"""Configuration snapshot export endpoint."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from fastapi import APIRouter, Depends, Header, Query, Response, status
+
+from app.core.auth import require_read
+from app.core.database import get_read_db
+from app.core.export import etag_matches, export_snapshot
+from app.core.snapshot import get_snapshot
+from app.schemas.schemas import SnapshotExport
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+router = APIRouter(tags=["snapshot"])
+
+
+@router.get(
+    "/snapshot",
+    response_model=SnapshotExport,
+    responses={304: {"description": "Not modified since the ETag in If-None-Match"}},
+)
+def get_snapshot_export(
+    env_key: str = Query("production"),
+    if_none_match: str | None = Header(None),
+    db: Session = Depends(get_read_db),
+    _key: str = Depends(require_read),
+) -> Response:
+    """Return the effective configuration of one environment for local evaluation."""
+    exported = export_snapshot(get_snapshot(db), env_key)
+    headers = {
+        "ETag": exported.etag,
+        "Cache-Control": "no-cache",
+        "X-Config-Version": str(exported.config_version),
+    }
+    if etag_matches(if_none_match, exported.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=exported.body, media_type="application/json", headers=headers)
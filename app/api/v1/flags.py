@@ -2,24 +2,46 @@
 
 from __future__ import annotations
 
-import json
+import datetime
 from typing import TYPE_CHECKING
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 
 from app.core.auth import require_admin
-from app.core.database import get_db
+from app.core.changes import DELETE, FLAG, RULE, record_change
+from app.core.database import get_async_db, get_db
+from app.core.snapshot import mark_config_changed
+from app.core.targeting import (
+    ALLOW,
+    DENY,
+    FlagLevelList,
+    flag_level_lists,
+    replace_members,
+)
 from app.models.models import Flag
 from app.schemas.schemas import FlagCreate, FlagResponse, FlagUpdate
 
 if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from sqlalchemy.ext.asyncio import AsyncSession
     from sqlalchemy.orm import Session
 
 router = APIRouter(prefix="/flags", tags=["flags"])
+# Same endpoints on an AsyncSession, served when ASYNC_DATABASE is enabled.
+async_router = APIRouter(prefix="/flags", tags=["flags"])
+
+_EMPTY = FlagLevelList([], 0)
 
 
-def _flag_to_response(flag: Flag) -> FlagResponse:
+def flag_to_response(
+    flag: Flag, targeting: Mapping[tuple[str, str], FlagLevelList]
+) -> FlagResponse:
+    """Build the response; ``targeting`` comes from :func:`flag_level_lists`."""
+    allow = targeting.get((flag.id, ALLOW), _EMPTY)
+    deny = targeting.get((flag.id, DENY), _EMPTY)
     return FlagResponse(
         id=flag.id,
         key=flag.key,
@@ -29,13 +51,45 @@ def _flag_to_response(flag: Flag) -> FlagResponse:
         archived=flag.archived,
         default_variant=flag.default_variant,
         rollout_percentage=flag.rollout_percentage,
-        targeted_allow=json.loads(flag.targeted_allow),
-        targeted_deny=json.loads(flag.targeted_deny),
+        targeted_allow=allow.user_ids,
+        targeted_deny=deny.user_ids,
+        targeted_allow_count=allow.size,
+        targeted_deny_count=deny.size,
         created_at=flag.created_at,
         updated_at=flag.updated_at,
     )
 
 
+def _new_flag(body: FlagCreate) -> Flag:
+    return Flag(
+        key=body.key,
+        name=body.name,
+        description=body.description,
+        enabled=body.enabled,
+        default_variant=body.default_variant,
+        rollout_percentage=body.rollout_percentage,
+    )
+
+
+def _apply_update(flag: Flag, body: FlagUpdate) -> None:
+    update_data = body.model_dump(exclude_unset=True, exclude={"targeted_allow", "targeted_deny"})
+    for field, value in update_data.items():
+        setattr(flag, field, value)
+    if body.targeted_allow is not None or body.targeted_deny is not None:
+        # Targeting lives in its own table; keep updated_at in step with it.
+        flag.updated_at = datetime.datetime.now(datetime.UTC)
+
+
+def _save_targeting(db: Session, flag_id: str, body: FlagCreate | FlagUpdate) -> None:
+    for kind, user_ids in ((ALLOW, body.targeted_allow), (DENY, body.targeted_deny)):
+        if user_ids is not None:
+            replace_members(db, flag_id, None, kind, user_ids)
+
+
+def _response(db: Session, flag: Flag) -> FlagResponse:
+    return flag_to_response(flag, flag_level_lists(db, [flag.id]))
+
+
 @router.post("", response_model=FlagResponse, status_code=status.HTTP_201_CREATED)
 def create_flag(
     body: FlagCreate,
@@ -45,20 +99,15 @@ def create_flag(
     existing = db.execute(select(Flag).where(Flag.key == body.key)).scalar_one_or_none()
     if existing:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Flag key already exists")
-    flag = Flag(
-        key=body.key,
-        name=body.name,
-        description=body.description,
-        enabled=body.enabled,
-        default_variant=body.default_variant,
-        rollout_percentage=body.rollout_percentage,
-        targeted_allow=json.dumps(body.targeted_allow),
-        targeted_deny=json.dumps(body.targeted_deny),
-    )
+    flag = _new_flag(body)
     db.add(flag)
+    db.flush()
+    _save_targeting(db, flag.id, body)
+    record_change(db, FLAG, flag.id)
     db.commit()
+    mark_config_changed()
     db.refresh(flag)
-    return _flag_to_response(flag)
+    return _response(db, flag)
 
 
 @router.get("", response_model=list[FlagResponse])
@@ -67,7 +116,8 @@ def list_flags(
     _key: str = Depends(require_admin),
 ) -> list[FlagResponse]:
     flags = db.execute(select(Flag).order_by(Flag.created_at.desc())).scalars().all()
-    return [_flag_to_response(f) for f in flags]
+    targeting = flag_level_lists(db)
+    return [flag_to_response(f, targeting) for f in flags]
 
 
 @router.get("/{flag_id}", response_model=FlagResponse)
@@ -79,7 +129,7 @@ def get_flag(
     flag = db.execute(select(Flag).where(Flag.id == flag_id)).scalar_one_or_none()
     if not flag:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Flag not found")
-    return _flag_to_response(flag)
+    return _response(db, flag)
 
 
 @router.patch("/{flag_id}", response_model=FlagResponse)
@@ -92,15 +142,13 @@ def update_flag(
     flag = db.execute(select(Flag).where(Flag.id == flag_id)).scalar_one_or_none()
     if not flag:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Flag not found")
-    update_data = body.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        if field in ("targeted_allow", "targeted_deny"):
-            setattr(flag, field, json.dumps(value))
-        else:
-            setattr(flag, field, value)
+    _apply_update(flag, body)
+    _save_targeting(db, flag.id, body)
+    record_change(db, FLAG, flag.id)
     db.commit()
+    mark_config_changed()
     db.refresh(flag)
-    return _flag_to_response(flag)
+    return _response(db, flag)
 
 
 @router.delete("/{flag_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -112,5 +160,94 @@ def delete_flag(
     flag = db.execute(select(Flag).where(Flag.id == flag_id)).scalar_one_or_none()
     if not flag:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Flag not found")
+    # Rules go with the flag; log them so synced clients drop them too.
+    for rule in flag.rules:
+        record_change(db, RULE, rule.id, DELETE)
+    record_change(db, FLAG, flag.id, DELETE)
     db.delete(flag)
     db.commit()
+    mark_config_changed()
+
+
+# ── Async variants ─────────────────────────────────────────────────
+
+
+@async_router.post("", response_model=FlagResponse, status_code=status.HTTP_201_CREATED)
+async def create_flag_async(
+    body: FlagCreate,
+    db: AsyncSession = Depends(get_async_db),
+    _key: str = Depends(require_admin),
+) -> FlagResponse:
+    existing = (await db.execute(select(Flag).where(Flag.key == body.key))).scalar_one_or_none()
+    if existing:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Flag key already exists")
+    flag = _new_flag(body)
+    db.add(flag)
+    await db.flush()
+    await db.run_sync(_save_targeting, flag.id, body)
+    record_change(db, FLAG, flag.id)
+    await db.commit()
+    mark_config_changed()
+    await db.refresh(flag)
+    return await db.run_sync(_response, flag)
+
+
+@async_router.get("", response_model=list[FlagResponse])
+async def list_flags_async(
+    db: AsyncSession = Depends(get_async_db),
+    _key: str = Depends(require_admin),
+) -> list[FlagResponse]:
+    flags = (await db.execute(select(Flag).order_by(Flag.created_at.desc()))).scalars().all()
+    targeting = await db.run_sync(flag_level_lists)
+    return [flag_to_response(f, targeting) for f in flags]
+
+
+@async_router.get("/{flag_id}", response_model=FlagResponse)
+async def get_flag_async(
+    flag_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    _key: str = Depends(require_admin),
+) -> FlagResponse:
+    flag = await db.get(Flag, flag_id)
+    if not flag:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Flag not found")
+    return await db.run_sync(_response, flag)
+
+
+@async_router.patch("/{flag_id}", response_model=FlagResponse)
+async def update_flag_async(
+    flag_id: str,
+    body: FlagUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    _key: str = Depends(require_admin),
+) -> FlagResponse:
+    flag = await db.get(Flag, flag_id)
+    if not flag:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Flag not found")
+    _apply_update(flag, body)
+    await db.run_sync(_save_targeting, flag.id, body)
+    record_change(db, FLAG, flag.id)
+    await db.commit()
+    mark_config_changed()
+    await db.refresh(flag)
+    return await db.run_sync(_response, flag)
+
+
+@async_router.delete("/{flag_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_flag_async(
+    flag_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    _key: str = Depends(require_admin),
+) -> None:
+    # Cascaded children must be loaded up front; lazy loads cannot run here.
+    flag = await db.get(
+        Flag, flag_id, options=[selectinload(Flag.rules), selectinload(Flag.flag_environments)]
+    )
+    if not flag:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Flag not found")
+    for rule in flag.rules:
+        record_change(db, RULE, rule.id, DELETE)
+    record_change(db, FLAG, flag.id, DELETE)
+    await db.delete(flag)
+    await db.commit()
+    mark_config_changed()
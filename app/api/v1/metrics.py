@@ -0,0 +1,81 @@
+"""Prometheus metrics endpoint (public, no auth, like the health checks)."""
+
+from __future__ import annotations
+
+from anyio.to_thread import current_default_thread_limiter
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.cache import get_decision_cache, unknown_flags
+from app.core.metrics import CONTENT_TYPE, Gauge, render
+from app.core.snapshot import get_config_version
+
+router = APIRouter(tags=["metrics"])
+
+
+def _cache_stat(name: str) -> float:
+    cache = get_decision_cache()
+    if cache is None:
+        return 0
+    value: float = getattr(cache.stats(), name)
+    return value
+
+
+# Read when scraped; the threadpool figures need the event loop, so the
+# endpoint itself is async.
+_SCRAPED = (
+    Gauge(
+        "featureflags_threadpool_threads",
+        "Size of the threadpool running sync endpoints and database calls.",
+        lambda: current_default_thread_limiter().total_tokens,
+    ),
+    Gauge(
+        "featureflags_threadpool_busy_threads",
+        "Threadpool threads currently running a task.",
+        lambda: current_default_thread_limiter().borrowed_tokens,
+    ),
+    Gauge(
+        "featureflags_threadpool_waiting_tasks",
+        "Tasks queued for a free threadpool thread.",
+        lambda: current_default_thread_limiter().statistics().tasks_waiting,
+    ),
+    Gauge(
+        "featureflags_decision_cache_hits_total",
+        "Evaluations answered from the decision cache.",
+        lambda: _cache_stat("hits"),
+        kind="counter",
+    ),
+    Gauge(
+        "featureflags_decision_cache_misses_total",
+        "Evaluations the decision cache could not answer.",
+        lambda: _cache_stat("misses"),
+        kind="counter",
+    ),
+    Gauge(
+        "featureflags_decision_cache_hit_ratio",
+        "Share of decision cache lookups that were hits since startup.",
+        lambda: _cache_stat("hit_ratio"),
+    ),
+    Gauge(
+        "featureflags_decision_cache_entries",
+        "Decisions currently held in the decision cache.",
+        lambda: _cache_stat("size"),
+    ),
+    Gauge(
+        "featureflags_unknown_flag_evaluations_total",
+        "Evaluations of flag keys that do not exist.",
+        lambda: unknown_flags.total,
+        kind="counter",
+    ),
+    Gauge(
+        "featureflags_config_version",
+        "Latest configuration version this worker has seen.",
+        get_config_version,
+    ),
+)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """Evaluation, request, database, threadpool and cache metrics in the Prometheus text format."""
+    return PlainTextResponse(render(_SCRAPED), media_type=CONTENT_TYPE)
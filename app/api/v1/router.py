@@ -4,15 +4,31 @@ from __future__ import annotations
 
 from fastapi import APIRouter
 
-from app.api.v1.environments import router as environments_router
-from app.api.v1.evaluate import router as evaluate_router
-from app.api.v1.flags import router as flags_router
+from app.api.v1 import environments, evaluate, flags, rules
+from app.api.v1.changes import router as changes_router
+from app.api.v1.export import router as export_router
 from app.api.v1.health import router as health_router
-from app.api.v1.rules import router as rules_router
+from app.api.v1.metrics import router as metrics_router
+from app.api.v1.simulate import router as simulate_router
+from app.api.v1.stats import router as stats_router
+from app.api.v1.targeting import router as targeting_router
 
-router = APIRouter(prefix="/api/v1")
-router.include_router(flags_router)
-router.include_router(environments_router)
-router.include_router(rules_router)
-router.include_router(evaluate_router)
-router.include_router(health_router)
+
+def _build(*, use_async: bool) -> APIRouter:
+    v1 = APIRouter(prefix="/api/v1")
+    for module in (flags, environments, rules):
+        v1.include_router(module.async_router if use_async else module.router)
+    v1.include_router(targeting_router)
+    v1.include_router(changes_router)
+    v1.include_router(evaluate.async_router if use_async else evaluate.router)
+    v1.include_router(export_router)
+    v1.include_router(stats_router)
+    v1.include_router(simulate_router)
+    v1.include_router(health_router)
+    v1.include_router(metrics_router)
+    return v1
+
+
+router = _build(use_async=False)
+# Evaluation and admin endpoints on AsyncSession handlers (ASYNC_DATABASE).
+async_router = _build(use_async=True)
@@ -3,23 +3,28 @@
 from __future__ import annotations
 
 import json
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy import select
 
 from app.core.auth import require_admin
-from app.core.database import get_db
+from app.core.changes import RULE, record_change
+from app.core.database import get_async_db, get_db
+from app.core.snapshot import mark_config_changed
 from app.models.models import Environment, Flag, Rule
 from app.schemas.schemas import Predicate, RuleCreate, RuleResponse
 
 if TYPE_CHECKING:
+    from sqlalchemy import Select
+    from sqlalchemy.ext.asyncio import AsyncSession
     from sqlalchemy.orm import Session
 
 router = APIRouter(prefix="/rules", tags=["rules"])
+async_router = APIRouter(prefix="/rules", tags=["rules"])
 
 
-def _rule_to_response(rule: Rule) -> RuleResponse:
+def rule_to_response(rule: Rule) -> RuleResponse:
     return RuleResponse(
         id=rule.id,
         flag_id=rule.flag_id,
@@ -32,58 +37,61 @@ def _rule_to_response(rule: Rule) -> RuleResponse:
     )
 
 
-@router.post("", response_model=RuleResponse, status_code=status.HTTP_201_CREATED)
-def create_rule(
-    body: RuleCreate,
-    db: Session = Depends(get_db),
-    _key: str = Depends(require_admin),
-) -> RuleResponse:
-    # Resolve flag: accept flag_id or flag_key
-    flag_id = body.flag_id
-    if flag_id:
-        flag = db.execute(select(Flag).where(Flag.id == flag_id)).scalar_one_or_none()
-    elif body.flag_key:
-        flag = db.execute(select(Flag).where(Flag.key == body.flag_key)).scalar_one_or_none()
-        if flag:
-            flag_id = flag.id
-    else:
-        raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
-            detail="Provide either flag_id or flag_key (not both required)",
-        )
+def _flag_query(body: RuleCreate) -> Select[Any]:
+    """Select the rule's flag by ``flag_id`` or ``flag_key``."""
+    if body.flag_id:
+        return select(Flag).where(Flag.id == body.flag_id)
+    if body.flag_key:
+        return select(Flag).where(Flag.key == body.flag_key)
+    raise HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+        detail="Provide either flag_id or flag_key (not both required)",
+    )
+
+
+def _env_query(body: RuleCreate) -> Select[Any]:
+    """Select the rule's environment by ``environment_id`` or ``env_key``."""
+    if body.environment_id:
+        return select(Environment).where(Environment.id == body.environment_id)
+    if body.env_key:
+        return select(Environment).where(Environment.key == body.env_key)
+    raise HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+        detail="Provide either environment_id or env_key (not both required)",
+    )
+
+
+def _new_rule(body: RuleCreate, flag: Flag | None, env: Environment | None) -> Rule:
     if not flag:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Flag not found")
-
-    # Resolve environment: accept environment_id or env_key
-    env_id = body.environment_id
-    if env_id:
-        env = db.execute(select(Environment).where(Environment.id == env_id)).scalar_one_or_none()
-    elif body.env_key:
-        env = db.execute(
-            select(Environment).where(Environment.key == body.env_key)
-        ).scalar_one_or_none()
-        if env:
-            env_id = env.id
-    else:
-        raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
-            detail="Provide either environment_id or env_key (not both required)",
-        )
     if not env:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Environment not found")
-
-    rule = Rule(
-        flag_id=flag_id,
-        environment_id=env_id,
+    return Rule(
+        flag_id=flag.id,
+        environment_id=env.id,
         priority=body.priority,
         conditions=json.dumps([c.model_dump() for c in body.conditions]),
         enabled=body.enabled,
         variant=body.variant,
     )
+
+
+@router.post("", response_model=RuleResponse, status_code=status.HTTP_201_CREATED)
+def create_rule(
+    body: RuleCreate,
+    db: Session = Depends(get_db),
+    _key: str = Depends(require_admin),
+) -> RuleResponse:
+    flag = db.execute(_flag_query(body)).scalar_one_or_none()
+    env = db.execute(_env_query(body)).scalar_one_or_none() if flag else None
+    rule = _new_rule(body, flag, env)
     db.add(rule)
+    db.flush()
+    record_change(db, RULE, rule.id)
     db.commit()
+    mark_config_changed()
     db.refresh(rule)
-    return _rule_to_response(rule)
+    return rule_to_response(rule)
 
 
 @router.get("", response_model=list[RuleResponse])
@@ -104,4 +112,48 @@ def list_rules(
             return []
     stmt = stmt.order_by(Rule.priority.asc())
     rules = db.execute(stmt).scalars().all()
-    return [_rule_to_response(r) for r in rules]
+    return [rule_to_response(r) for r in rules]
+
+
+# ── Async variants ─────────────────────────────────────────────────
+
+
+@async_router.post("", response_model=RuleResponse, status_code=status.HTTP_201_CREATED)
+async def create_rule_async(
+    body: RuleCreate,
+    db: AsyncSession = Depends(get_async_db),
+    _key: str = Depends(require_admin),
+) -> RuleResponse:
+    flag = (await db.execute(_flag_query(body))).scalar_one_or_none()
+    env = (await db.execute(_env_query(body))).scalar_one_or_none() if flag else None
+    rule = _new_rule(body, flag, env)
+    db.add(rule)
+    await db.flush()
+    record_change(db, RULE, rule.id)
+    await db.commit()
+    mark_config_changed()
+    await db.refresh(rule)
+    return rule_to_response(rule)
+
+
+@async_router.get("", response_model=list[RuleResponse])
+async def list_rules_async(
+    flag_id: str | None = Query(None),
+    env: str | None = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+    _key: str = Depends(require_admin),
+) -> list[RuleResponse]:
+    stmt = select(Rule)
+    if flag_id:
+        stmt = stmt.where(Rule.flag_id == flag_id)
+    if env:
+        env_obj = (
+            await db.execute(select(Environment).where(Environment.key == env))
+        ).scalar_one_or_none()
+        if env_obj:
+            stmt = stmt.where(Rule.environment_id == env_obj.id)
+        else:
+            return []
+    stmt = stmt.order_by(Rule.priority.asc())
+    rules = (await db.execute(stmt)).scalars().all()
+    return [rule_to_response(r) for r in rules]
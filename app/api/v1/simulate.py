@@ -0,0 +1,80 @@
+"""Rollout simulation endpoint (admin only)."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.auth import require_admin
+from app.core.bucketing import BUCKETS
+from app.core.database import get_db
+from app.core.simulation import DEFAULT_CHUNK_SIZE, RolloutSimulator
+from app.core.snapshot import get_snapshot
+from app.core.streaming import LineSplitter
+from app.schemas.schemas import RolloutSimulationResponse
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+router = APIRouter(prefix="/simulate", tags=["simulate"])
+
+
+@router.post("/rollout", response_model=RolloutSimulationResponse)
+async def simulate_rollout(
+    request: Request,
+    flag_key: str = Query(...),
+    env_key: str = Query(...),
+    percentage: float = Query(..., ge=0, le=100),
+    bins: int = Query(100, ge=1, le=BUCKETS),
+    changed_limit: int = Query(10_000, ge=0, le=1_000_000),
+    db: Session = Depends(get_db),
+    _key: str = Depends(require_admin),
+) -> RolloutSimulationResponse:
+    """Simulate changing a flag's rollout percentage for a population of users.
+
+    The request body is plain text with one user ID per line. It is read as a
+    stream and bucketed in chunks on a worker thread.
+    """
+    if BUCKETS % bins:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=f"bins must divide {BUCKETS}",
+        )
+    snapshot = await run_in_threadpool(get_snapshot, db)
+    if not snapshot.has_flag(flag_key):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Flag not found")
+    if not snapshot.has_env(env_key):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Environment not found")
+    config = snapshot.configs[(flag_key, env_key)]
+
+    simulator = RolloutSimulator(config, env_key, percentage, changed_limit=changed_limit)
+    splitter = LineSplitter()
+    chunk: list[bytes] = []
+    async for block in request.stream():
+        chunk.extend(splitter.push(block))
+        if len(chunk) >= DEFAULT_CHUNK_SIZE:
+            await run_in_threadpool(simulator.feed, chunk)
+            chunk = []
+    chunk.extend(splitter.finish())
+    if chunk:
+        await run_in_threadpool(simulator.feed, chunk)
+
+    impact = simulator.report(bins)
+    return RolloutSimulationResponse(
+        flag_key=impact.flag_key,
+        env_key=impact.env_key,
+        config_version=snapshot.version,
+        current_percentage=impact.current_percentage,
+        proposed_percentage=impact.proposed_percentage,
+        total=impact.total,
+        targeted=impact.targeted,
+        enabled_before=impact.enabled_before,
+        enabled_after=impact.enabled_after,
+        turned_on=impact.turned_on,
+        turned_off=impact.turned_off,
+        changed=impact.changed,
+        changed_truncated=impact.changed_truncated,
+        histogram=impact.histogram,
+    )
@@ -0,0 +1,77 @@
+"""Runtime statistics endpoints (admin only)."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from fastapi import APIRouter, Depends, Query
+
+from app.core.auth import require_admin
+from app.core.cache import get_decision_cache, unknown_flags
+from app.core.database import get_db
+from app.core.snapshot import get_snapshot
+from app.schemas.schemas import (
+    CacheStatsResponse,
+    TargetingStatsResponse,
+    UnknownFlagCount,
+    UnknownFlagStatsResponse,
+)
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+
+@router.get("/targeting", response_model=TargetingStatsResponse)
+def targeting_stats(
+    db: Session = Depends(get_db),
+    _key: str = Depends(require_admin),
+) -> TargetingStatsResponse:
+    snapshot = get_snapshot(db)
+    stats = snapshot.targeting
+    return TargetingStatsResponse(
+        config_version=snapshot.version,
+        lists=stats.lists,
+        entries=stats.entries,
+        largest=stats.largest,
+        memory_bytes=stats.memory_bytes,
+    )
+
+
+@router.get("/cache", response_model=CacheStatsResponse)
+def cache_stats(_key: str = Depends(require_admin)) -> CacheStatsResponse:
+    cache = get_decision_cache()
+    if cache is None:
+        return CacheStatsResponse(enabled=False)
+    stats = cache.stats()
+    return CacheStatsResponse(
+        enabled=True,
+        size=stats.size,
+        max_size=stats.max_size,
+        ttl_seconds=stats.ttl_seconds,
+        hits=stats.hits,
+        misses=stats.misses,
+        hit_ratio=stats.hit_ratio,
+        evictions=stats.evictions,
+        invalidations=stats.invalidations,
+    )
+
+
+@router.get("/unknown-flags", response_model=UnknownFlagStatsResponse)
+def unknown_flag_stats(
+    limit: int = Query(50, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    _key: str = Depends(require_admin),
+) -> UnknownFlagStatsResponse:
+    snapshot = get_snapshot(db)
+    unknown_flags.prune(snapshot.has_flag)
+    return UnknownFlagStatsResponse(
+        config_version=snapshot.version,
+        total=unknown_flags.total,
+        untracked=unknown_flags.untracked,
+        keys=[
+            UnknownFlagCount(flag_key=key, count=count)
+            for key, count in unknown_flags.most_common(limit)
+        ],
+    )
@@ -0,0 +1,213 @@
+"""Incremental edits, bulk uploads and paged reads of flag targeting lists.
+
+``env`` selects an environment's override lists instead of the flag-level
+ones; the flag must already have an override in that environment.
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import time
+from typing import TYPE_CHECKING, Literal
+
+from anyio import CancelScope
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+
+from app.core.auth import require_admin
+from app.core.changes import FLAG, record_change
+from app.core.database import get_db
+from app.core.snapshot import mark_config_changed
+from app.core.streaming import LineSplitter, NDJSONResponse
+from app.core.targeting import (
+    MAX_UPLOAD_LINE_BYTES,
+    BulkUpload,
+    add_members,
+    count_members,
+    is_member,
+    list_members,
+    parse_user_ids,
+    remove_members,
+)
+from app.models.models import Environment, Flag, FlagEnvironment
+from app.schemas.schemas import (
+    TargetingMembership,
+    TargetingPage,
+    TargetingPatch,
+    TargetingPatchResponse,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from sqlalchemy.orm import Session
+
+router = APIRouter(prefix="/flags/{flag_id}/targeting", tags=["targeting"])
+
+Kind = Literal["allow", "deny"]
+UploadMode = Literal["add", "remove", "replace"]
+
+
+def _scope(db: Session, flag_id: str, env: str | None) -> tuple[Flag, str | None]:
+    """Return the flag and the environment ID of the list (``None`` for flag-level)."""
+    flag = db.get(Flag, flag_id)
+    if not flag:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Flag not found")
+    if env is None:
+        return flag, None
+    env_obj = db.execute(select(Environment).where(Environment.key == env)).scalar_one_or_none()
+    if not env_obj:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Environment not found")
+    override = db.execute(
+        select(FlagEnvironment.id).where(
+            FlagEnvironment.flag_id == flag.id, FlagEnvironment.environment_id == env_obj.id
+        )
+    ).first()
+    if override is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Flag has no override in this environment",
+        )
+    return flag, env_obj.id
+
+
+@router.patch("/{kind}", response_model=TargetingPatchResponse)
+def patch_targeting(
+    flag_id: str,
+    kind: Kind,
+    body: TargetingPatch,
+    env: str | None = Query(None),
+    db: Session = Depends(get_db),
+    _key: str = Depends(require_admin),
+) -> TargetingPatchResponse:
+    """Remove, then add user IDs; only the rows for those IDs are written."""
+    flag, environment_id = _scope(db, flag_id, env)
+    removed = remove_members(db, flag.id, environment_id, kind, body.remove)
+    added = add_members(db, flag.id, environment_id, kind, body.add)
+    size = count_members(db, flag.id, environment_id, kind)
+    if added or removed:
+        flag.updated_at = datetime.datetime.now(datetime.UTC)
+        record_change(db, FLAG, flag.id)
+        db.commit()
+        mark_config_changed()
+    else:
+        db.rollback()
+    return TargetingPatchResponse(added=added, removed=removed, size=size)
+
+
+@router.post("/{kind}/upload", response_class=NDJSONResponse)
+async def upload_targeting(
+    request: Request,
+    flag_id: str,
+    kind: Kind,
+    mode: UploadMode = Query("add"),
+    env: str | None = Query(None),
+    chunk_size: int = Query(10_000, ge=1, le=100_000),
+    header: bool = Query(False),
+    db: Session = Depends(get_db),
+    _key: str = Depends(require_admin),
+) -> NDJSONResponse:
+    """Apply a streamed list of user IDs, one per line, to a targeting list.
+
+    A ``text/csv`` body uses the first column; ``header`` skips the first
+    line. Each chunk is written in its own transaction on a worker thread and
+    reported as an NDJSON progress line; the last line is the summary.
+    """
+    flag, environment_id = await run_in_threadpool(_scope, db, flag_id, env)
+    upload = BulkUpload(db, flag.id, environment_id, kind, mode)
+    csv = request.headers.get("content-type", "").startswith("text/csv")
+    return NDJSONResponse(_run_upload(request, upload, chunk_size, csv=csv, header=header))
+
+
+async def _upload_lines(request: Request, *, header: bool) -> AsyncIterator[list[bytes]]:
+    splitter = LineSplitter(MAX_UPLOAD_LINE_BYTES)
+    skip_header = header
+    async for block in request.stream():
+        lines = splitter.push(block)
+        if skip_header and lines:
+            lines, skip_header = lines[1:], False
+        yield lines
+    lines = splitter.finish()
+    yield lines[1:] if skip_header else lines
+
+
+async def _run_upload(
+    request: Request, upload: BulkUpload, chunk_size: int, *, csv: bool, header: bool
+) -> AsyncIterator[bytes]:
+    start = time.perf_counter()
+    pending: list[str] = []
+    finished = False
+    try:
+        async for lines in _upload_lines(request, header=header):
+            for user_id in parse_user_ids(lines, csv=csv):
+                pending.append(user_id)
+                if len(pending) == chunk_size:
+                    if await run_in_threadpool(upload.feed, pending):
+                        mark_config_changed()
+                    pending = []
+                    yield _progress(upload)
+        if pending:
+            if await run_in_threadpool(upload.feed, pending):
+                mark_config_changed()
+            yield _progress(upload)
+        size = await run_in_threadpool(upload.finish)
+        finished = True
+    except ValueError as exc:
+        yield _progress(upload, error=str(exc))
+    finally:
+        # Shielded so that staged rows are dropped even if the response is
+        # cancelled, e.g. on shutdown.
+        with CancelScope(shield=True):
+            if not finished:
+                await run_in_threadpool(upload.abort)
+        if upload.changed:
+            mark_config_changed()
+    if finished:
+        elapsed = time.perf_counter() - start
+        yield _progress(
+            upload,
+            done=True,
+            size=size,
+            seconds=round(elapsed, 3),
+            ids_per_second=round(upload.received / elapsed) if elapsed else 0,
+        )
+
+
+def _progress(upload: BulkUpload, **extra: object) -> bytes:
+    line = {"received": upload.received, "added": upload.added, "removed": upload.removed}
+    return json.dumps({**line, **extra}).encode() + b"\n"
+
+
+@router.get("/{kind}", response_model=TargetingPage)
+def list_targeting(
+    flag_id: str,
+    kind: Kind,
+    env: str | None = Query(None),
+    after: str | None = Query(None),
+    limit: int = Query(1000, ge=1, le=10_000),
+    db: Session = Depends(get_db),
+    _key: str = Depends(require_admin),
+) -> TargetingPage:
+    """Page through a list in user ID order."""
+    flag, environment_id = _scope(db, flag_id, env)
+    user_ids = list_members(db, flag.id, environment_id, kind, after=after, limit=limit)
+    return TargetingPage(
+        user_ids=user_ids, next_after=user_ids[-1] if len(user_ids) == limit else None
+    )
+
+
+@router.get("/{kind}/{user_id}", response_model=TargetingMembership)
+def get_targeting_membership(
+    flag_id: str,
+    kind: Kind,
+    user_id: str,
+    env: str | None = Query(None),
+    db: Session = Depends(get_db),
+    _key: str = Depends(require_admin),
+) -> TargetingMembership:
+    flag, environment_id = _scope(db, flag_id, env)
+    return TargetingMembership(
+        user_id=user_id, member=is_member(db, flag.id, environment_id, kind, user_id)
+    )
@@ -0,0 +1,278 @@
+"""Evaluate flags offline for every user in a CSV or NDJSON file.
+
+The flag configuration is loaded once from the database in ``DATABASE_URL``
+and shipped to a pool of worker processes. Input is read and written in
+chunks, with a bounded number of chunks in flight, so memory does not grow
+with the file. Each output line is an evaluation result in the same format
+as ``POST /api/v1/evaluate``; throughput is reported on stderr.
+
+Input formats:
+    CSV     a header row with a ``user_id`` column, an optional ``env_key``
+            column, and any other columns as string attributes (empty cells
+            are left out). Cells of the columns named by ``--json-columns``
+            are JSON values instead (a boolean, number, string or array of
+            strings), typed as in an HTTP request body.
+    NDJSON  one ``{"user_id": ..., "env_key": ..., "attributes": {...}}``
+            object per line (``env_key`` optional)
+
+Usage:
+    python -m app.cli.batch_evaluate users.csv --workers 8 --output results.ndjson
+    python -m app.cli.batch_evaluate users.ndjson --flag new_checkout --env staging
+    python -m app.cli.batch_evaluate users.csv --json-columns beta seats
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any
+
+from pydantic import ValidationError
+
+from app.core.database import get_session_factory
+from app.core.evaluation import decide, to_response
+from app.core.snapshot import load_snapshot
+from app.schemas.schemas import EvalAllRequest, EvalStreamError
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Sequence
+    from concurrent.futures import Future
+    from typing import BinaryIO
+
+    from app.core.snapshot import Snapshot
+
+DEFAULT_CHUNK_SIZE = 5000
+
+AttributeValue = str | int | float | bool | list[str]
+
+# Set in each worker process by _init_worker.
+_snapshot: Snapshot | None = None
+_flag_keys: tuple[str, ...] = ()
+_json_columns: frozenset[str] = frozenset()
+
+
+def _init_worker(
+    snapshot: Snapshot, flag_keys: tuple[str, ...], json_columns: frozenset[str]
+) -> None:
+    global _snapshot, _flag_keys, _json_columns  # noqa: PLW0603
+    _snapshot = snapshot
+    _flag_keys = flag_keys
+    _json_columns = json_columns
+
+
+def _parse_record(
+    record: bytes | Sequence[str], header: Sequence[str] | None, env_key: str
+) -> EvalAllRequest:
+    if isinstance(record, bytes):
+        return EvalAllRequest.model_validate({"env_key": env_key, **json.loads(record)})
+    fields = {name: value for name, value in zip(header or (), record, strict=False) if value}
+    return EvalAllRequest(
+        env_key=fields.pop("env_key", env_key),
+        user_id=fields.pop("user_id"),
+        attributes={
+            name: _json_cell(name, value) if name in _json_columns else value
+            for name, value in fields.items()
+        },
+    )
+
+
+def _reject_constant(name: str) -> float:
+    raise ValueError(f"{name} is not an attribute value")
+
+
+def _json_cell(column: str, cell: str) -> AttributeValue:
+    """Decode a cell of a ``--json-columns`` column."""
+    value = json.loads(cell, parse_constant=_reject_constant)
+    if isinstance(value, str | bool | int | float):
+        return value
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return value
+    raise ValueError(f"{column}: {cell} is not a boolean, number, string or array of strings")
+
+
+def evaluate_chunk(
+    records: Sequence[bytes | Sequence[str]],
+    header: Sequence[str] | None,
+    env_key: str,
+    start: int,
+) -> tuple[bytes, int, int]:
+    """Evaluate one chunk of input records in a worker.
+
+    Records are raw NDJSON lines, or CSV rows when ``header`` is given.
+    Returns the NDJSON output, the number of records and of evaluations.
+    """
+    snapshot = _snapshot
+    if snapshot is None:
+        raise RuntimeError("worker not initialised")
+    out = []
+    evaluations = 0
+    for index, record in enumerate(records, start):
+        try:
+            req = _parse_record(record, header, env_key)
+        except (ValidationError, KeyError, ValueError, TypeError) as exc:
+            detail = (
+                exc.errors(include_url=False, include_context=False, include_input=False)
+                if isinstance(exc, ValidationError)
+                else [{"type": "invalid_record", "msg": str(exc)}]
+            )
+            out.append(EvalStreamError(index=index, detail=list(detail)).model_dump_json())
+            continue
+        configs = (
+            [(key, snapshot.lookup(key, req.env_key)) for key in _flag_keys]
+            if _flag_keys
+            else [(config.flag_key, config) for config in snapshot.flags_for_env(req.env_key)]
+        )
+        for flag_key, config in configs:
+            decision = decide(config, req.env_key, req.user_id, req.attributes)
+            out.append(to_response(flag_key, req.env_key, decision).model_dump_json())
+        evaluations += len(configs)
+    return "".join(f"{item}\n" for item in out).encode(), len(records), evaluations
+
+
+def _read_chunks(
+    source: BinaryIO, chunk_size: int, *, is_csv: bool
+) -> tuple[list[str] | None, Iterator[list[bytes]] | Iterator[list[list[str]]]]:
+    if is_csv:
+        reader = csv.reader(io.TextIOWrapper(source, encoding="utf-8", newline=""))
+        header = next(reader, None)
+        if header is None:
+            return [], iter(())
+        return header, _chunked(reader, chunk_size)
+    lines = (line for line in (raw.strip() for raw in source) if line)
+    return None, _chunked(lines, chunk_size)
+
+
+def _chunked(items: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    chunk: list[Any] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _evaluate_chunks(
+    chunks: Iterable[Sequence[bytes | Sequence[str]]],
+    header: Sequence[str] | None,
+    env_key: str,
+    snapshot: Snapshot,
+    flag_keys: tuple[str, ...],
+    json_columns: frozenset[str],
+    workers: int,
+) -> Iterator[tuple[bytes, int, int]]:
+    """Yield the result of every chunk, in input order."""
+    if workers == 1:
+        _init_worker(snapshot, flag_keys, json_columns)
+        start = 0
+        for chunk in chunks:
+            yield evaluate_chunk(chunk, header, env_key, start)
+            start += len(chunk)
+        return
+    with ProcessPoolExecutor(
+        workers, initializer=_init_worker, initargs=(snapshot, flag_keys, json_columns)
+    ) as pool:
+        # A bounded window of chunks in flight keeps memory flat on large inputs.
+        pending: deque[Future[tuple[bytes, int, int]]] = deque()
+        start = 0
+        for chunk in chunks:
+            pending.append(pool.submit(evaluate_chunk, chunk, header, env_key, start))
+            start += len(chunk)
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _parse_args(argv: Sequence[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli.batch_evaluate",
+        description="Evaluate flags for every user in a CSV or NDJSON file.",
+    )
+    parser.add_argument("input", help="CSV or NDJSON file, or - for stdin")
+    parser.add_argument("--format", choices=("csv", "ndjson"), help="default: from extension")
+    parser.add_argument("--env", default="production", help="env_key for rows without one")
+    parser.add_argument(
+        "--flag", action="append", default=[], help="flag key to evaluate (default: all flags)"
+    )
+    parser.add_argument(
+        "--json-columns",
+        nargs="+",
+        default=[],
+        metavar="COLUMN",
+        help="CSV columns whose cells are JSON values (default: all cells are strings)",
+    )
+    parser.add_argument("--output", help="NDJSON output file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    if args.format is None:
+        args.format = "csv" if args.input.endswith(".csv") else "ndjson"
+    if args.workers < 1 or args.chunk_size < 1:
+        parser.error("--workers and --chunk-size must be positive")
+    if args.json_columns and args.format != "csv":
+        parser.error("--json-columns only applies to CSV input")
+    return args
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = _parse_args(argv)
+    with get_session_factory()() as db:
+        snapshot = load_snapshot(db)
+    flag_keys = tuple(args.flag)
+    for flag_key in flag_keys:
+        if not snapshot.has_flag(flag_key):
+            print(f"warning: unknown flag {flag_key!r} evaluates as disabled", file=sys.stderr)
+
+    started = time.perf_counter()
+    records = evaluations = 0
+    with contextlib.ExitStack() as stack:
+        source = (
+            sys.stdin.buffer if args.input == "-" else stack.enter_context(open(args.input, "rb"))
+        )
+        sink = stack.enter_context(open(args.output, "wb")) if args.output else sys.stdout.buffer
+        header, chunks = _read_chunks(source, args.chunk_size, is_csv=args.format == "csv")
+        if header is not None and "user_id" not in header:
+            print("error: CSV input needs a user_id column", file=sys.stderr)
+            return 1
+        missing = [name for name in args.json_columns if name not in (header or ())]
+        if missing:
+            print(
+                f"error: --json-columns not in the CSV header: {', '.join(missing)}",
+                file=sys.stderr,
+            )
+            return 1
+        for output, done, evaluated in _evaluate_chunks(
+            chunks,
+            header,
+            args.env,
+            snapshot,
+            flag_keys,
+            frozenset(args.json_columns),
+            args.workers,
+        ):
+            sink.write(output)
+            records += done
+            evaluations += evaluated
+
+    elapsed = time.perf_counter() - started
+    rate = evaluations / elapsed if elapsed else 0.0
+    print(
+        f"{records} records, {evaluations} evaluations in {elapsed:.2f}s "
+        f"({rate:,.0f} evaluations/s, {args.workers} workers)",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
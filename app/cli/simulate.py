@@ -0,0 +1,100 @@
+"""Simulate a rollout percentage change against a file of user IDs.
+
+Reads the flag configuration from the database in ``DATABASE_URL``, streams the
+user IDs (one per line) in chunks, prints a JSON impact summary and optionally
+writes every user whose decision changes to a file.
+
+Usage:
+    python -m app.cli.simulate FLAG_KEY ENV_KEY PERCENTAGE users.txt
+    python -m app.cli.simulate FLAG_KEY ENV_KEY PERCENTAGE - --changed-output changed.txt
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import dataclasses
+import json
+import sys
+from typing import TYPE_CHECKING, BinaryIO
+
+from app.core.bucketing import BUCKETS
+from app.core.database import get_session_factory
+from app.core.simulation import DEFAULT_CHUNK_SIZE, RolloutSimulator
+from app.core.snapshot import load_snapshot
+from app.core.streaming import LineSplitter
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+_BLOCK_SIZE = 1 << 20
+
+
+def _parse_args(argv: Sequence[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli.simulate",
+        description="Report which users flip when a flag's rollout percentage changes.",
+    )
+    parser.add_argument("flag_key")
+    parser.add_argument("env_key")
+    parser.add_argument("percentage", type=float, help="proposed rollout percentage (0-100)")
+    parser.add_argument("users", help="file with one user ID per line, or - for stdin")
+    parser.add_argument("--bins", type=int, default=100, help="histogram bins (divides 10000)")
+    parser.add_argument("--changed-output", help="write every user whose decision changes here")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    if not 0 <= args.percentage <= 100:
+        parser.error("percentage must be between 0 and 100")
+    if args.bins <= 0 or BUCKETS % args.bins:
+        parser.error(f"--bins must divide {BUCKETS}")
+    return args
+
+
+def _simulate(
+    simulator: RolloutSimulator, source: BinaryIO, sink: BinaryIO | None, chunk_size: int
+) -> None:
+    splitter = LineSplitter()
+    chunk: list[bytes] = []
+
+    def flush() -> None:
+        changed = simulator.feed(chunk)
+        if sink is not None and changed:
+            sink.write(b"\n".join(changed) + b"\n")
+        chunk.clear()
+
+    while block := source.read(_BLOCK_SIZE):
+        chunk.extend(splitter.push(block))
+        if len(chunk) >= chunk_size:
+            flush()
+    chunk.extend(splitter.finish())
+    if chunk:
+        flush()
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = _parse_args(argv)
+    with get_session_factory()() as db:
+        snapshot = load_snapshot(db)
+    config = snapshot.configs.get((args.flag_key, args.env_key))
+    if config is None:
+        print(f"error: no flag {args.flag_key!r} in environment {args.env_key!r}", file=sys.stderr)
+        return 1
+
+    # Changed users go to --changed-output as they are found, not into memory.
+    simulator = RolloutSimulator(config, args.env_key, args.percentage, changed_limit=0)
+    with contextlib.ExitStack() as stack:
+        source = (
+            sys.stdin.buffer if args.users == "-" else stack.enter_context(open(args.users, "rb"))
+        )
+        sink = stack.enter_context(open(args.changed_output, "wb")) if args.changed_output else None
+        _simulate(simulator, source, sink, args.chunk_size)
+
+    summary = dataclasses.asdict(simulator.report(args.bins))
+    del summary["changed"]
+    json.dump(summary, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
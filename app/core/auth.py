@@ -2,25 +2,36 @@
 
 from __future__ import annotations
 
+from time import perf_counter
+
 from fastapi import Depends, HTTPException, Security, status
 from fastapi.security import APIKeyHeader
 
 from app.core.config import Settings, get_settings
+from app.core.timing import record_phase
 
 _api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
 
+def _authenticate(api_key: str | None, valid_keys: tuple[str, ...]) -> str:
+    start = perf_counter()
+    try:
+        if not api_key or api_key not in valid_keys:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid or missing API key",
+            )
+        return api_key
+    finally:
+        record_phase("auth", perf_counter() - start)
+
+
 def require_admin(
     api_key: str | None = Security(_api_key_header),
     settings: Settings = Depends(get_settings),
 ) -> str:
     """Dependency that requires a valid admin API key."""
-    if not api_key or api_key != settings.admin_api_key:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or missing API key",
-        )
-    return api_key
+    return _authenticate(api_key, (settings.admin_api_key,))
 
 
 def require_read(
@@ -28,9 +39,4 @@ def require_read(
     settings: Settings = Depends(get_settings),
 ) -> str:
     """Dependency that requires a valid read or admin API key."""
-    if not api_key or api_key not in (settings.admin_api_key, settings.read_api_key):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or missing API key",
-        )
-    return api_key
+    return _authenticate(api_key, (settings.admin_api_key, settings.read_api_key))
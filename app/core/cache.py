@@ -0,0 +1,182 @@
+"""Caches in front of flag evaluation.
+
+The decision cache is a bounded LRU cache with a TTL, keyed on the evaluation
+inputs (:func:`app.core.evaluation.request_key`). Entries belong to the
+configuration version they were computed for; when the snapshot version moves
+on (every admin write bumps it) the whole cache is dropped. It is disabled
+unless ``DECISION_CACHE_SIZE`` is set above zero.
+
+Unknown flag keys never reach it: the snapshot's key set acts as a negative
+cache for the current version, and :class:`UnknownFlagCounter` records how
+often each unknown key is requested so stale callers can be found.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from app.core.config import get_settings
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Hashable
+
+    from app.core.evaluation import Decision
+
+
+@dataclass(frozen=True, slots=True)
+class CacheStats:
+    size: int
+    max_size: int
+    ttl_seconds: float
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class DecisionCache:
+    """Thread-safe LRU + TTL cache invalidated by configuration version."""
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: float,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[float, Decision]] = OrderedDict()
+        self._version = -1
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_version(self, version: int) -> None:
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+                self._entries.clear()
+            self._version = version
+
+    def get(self, key: Hashable, version: int) -> Decision | None:
+        """Return the cached decision for ``key`` at ``version``, or ``None``."""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, version: int, value: Decision) -> None:
+        """Store a decision for ``key``, evicting the least recently used entry if full."""
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (self._clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                size=len(self._entries),
+                max_size=self.max_size,
+                ttl_seconds=self.ttl_seconds,
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                invalidations=self.invalidations,
+            )
+
+
+class UnknownFlagCounter:
+    """Bounded per-key counter of evaluations for flag keys that do not exist.
+
+    At most ``max_keys`` distinct keys are tracked; requests for further keys
+    are only counted in ``untracked`` so random keys cannot grow memory.
+    """
+
+    def __init__(self, max_keys: int = 1000) -> None:
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._counts: dict[str, int] = {}
+        self.total = 0
+        self.untracked = 0
+
+    def record(self, flag_key: str) -> None:
+        with self._lock:
+            self.total += 1
+            count = self._counts.get(flag_key)
+            if count is not None:
+                self._counts[flag_key] = count + 1
+            elif len(self._counts) < self.max_keys:
+                self._counts[flag_key] = 1
+            else:
+                self.untracked += 1
+
+    def most_common(self, limit: int) -> list[tuple[str, int]]:
+        """Return the ``limit`` most requested unknown keys, highest count first."""
+        with self._lock:
+            items = list(self._counts.items())
+        items.sort(key=lambda item: (-item[1], item[0]))
+        return items[:limit]
+
+    def prune(self, exists: Callable[[str], bool]) -> None:
+        """Stop tracking keys that have since been created."""
+        with self._lock:
+            for flag_key in [k for k in self._counts if exists(k)]:
+                del self._counts[flag_key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts.clear()
+            self.total = 0
+            self.untracked = 0
+
+
+unknown_flags = UnknownFlagCounter()
+
+_decision_cache: DecisionCache | None = None
+_configured = False
+
+
+def get_decision_cache() -> DecisionCache | None:
+    """Return the process-wide decision cache, or ``None`` when disabled."""
+    global _decision_cache, _configured  # noqa: PLW0603
+    if not _configured:
+        settings = get_settings()
+        if settings.decision_cache_size > 0:
+            _decision_cache = DecisionCache(
+                settings.decision_cache_size, settings.decision_cache_ttl_seconds
+            )
+        _configured = True
+    return _decision_cache
+
+
+def reset_decision_cache() -> None:
+    """Drop the decision cache singleton (used in tests)."""
+    global _decision_cache, _configured  # noqa: PLW0603
+    _decision_cache = None
+    _configured = False
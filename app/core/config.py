@@ -2,6 +2,9 @@
 
 from __future__ import annotations
 
+from typing import Literal
+
+from pydantic import Field
 from pydantic_settings import BaseSettings
 
 
@@ -12,6 +15,53 @@ class Settings(BaseSettings):
     read_api_key: str = "change-me-read-key"
     database_url: str = "sqlite:///./feature_flags.db"
 
+    # Connection pool of the main engine (ignored for in-memory SQLite).
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+
+    # SQLite storage profile: "default" only enables foreign keys;
+    # "read_optimized" adds WAL, synchronous=NORMAL, mmap and a larger cache.
+    sqlite_profile: Literal["default", "read_optimized"] = "default"
+    sqlite_mmap_size_bytes: int = 256 * 1024 * 1024
+    sqlite_cache_size_kib: int = 64 * 1024
+    sqlite_busy_timeout_ms: int = 5000
+
+    # Send evaluation and export reads to a separate pool of query_only
+    # connections (SQLite file databases only).
+    read_only_pool: bool = False
+    read_only_pool_size: int = 5
+
+    # Serve evaluation and admin endpoints from async handlers (needs the
+    # "async" extra). Not supported with an in-memory SQLite database.
+    async_database: bool = False
+
+    # Decision cache in front of evaluation; 0 disables it.
+    decision_cache_size: int = 0
+    decision_cache_ttl_seconds: float = 5.0
+
+    # How often each worker checks the change log for writes made by other
+    # processes; its own writes are visible immediately.
+    config_poll_interval_seconds: float = 1.0
+
+    # Publish compiled snapshots to a memory-mapped file in this directory,
+    # shared by every worker process on the host (POSIX only).
+    shared_snapshot_dir: str | None = None
+
+    # How often the change stream checks the change log for new writes.
+    change_poll_interval_seconds: float = 0.5
+
+    # Time one flag evaluation in this many for featureflags_evaluation_seconds;
+    # each timed one is counted this many times. 1 times every evaluation,
+    # 0 none.
+    evaluation_timing_sample: int = Field(10, ge=0)
+
+    # Report per-phase timings of evaluation requests in a Server-Timing
+    # response header.
+    server_timing: bool = False
+    # Log evaluation requests taking at least this long, with their phase
+    # breakdown; 0 disables the log.
+    slow_evaluation_threshold_ms: float = 0.0
+
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8"}
 
 
@@ -1,28 +1,102 @@
-"""Database engine and session setup using SQLAlchemy 2.0."""
+"""Database engine and session setup using SQLAlchemy 2.0.
+
+With ``ASYNC_DATABASE`` enabled the evaluation and admin endpoints use an
+:class:`~sqlalchemy.ext.asyncio.AsyncSession` from :func:`get_async_db`
+instead, on an asyncio driver derived from ``DATABASE_URL`` (aiosqlite for
+SQLite). Both engines point at the same database.
+
+SQLite connections are set up by the ``SQLITE_PROFILE`` storage profile (see
+:func:`sqlite_pragmas`). With ``READ_ONLY_POOL`` enabled, evaluation and
+export reads go through :func:`get_read_db`, a separate pool of
+``query_only`` connections, so they never queue behind the admin pool.
+"""
 
 from __future__ import annotations
 
 from typing import TYPE_CHECKING
 
-from sqlalchemy import create_engine, event
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.config import get_settings
 
 if TYPE_CHECKING:
-    from collections.abc import Generator
+    from collections.abc import AsyncGenerator, Callable, Generator
 
     from sqlalchemy.engine import Engine
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+    from app.core.config import Settings
 
 _engine: Engine | None = None
 _session_factory: sessionmaker[Session] | None = None
-
-
-def _enable_sqlite_fk(dbapi_conn: object, _connection_record: object) -> None:
-    """Enable foreign key enforcement for SQLite connections."""
-    cursor = dbapi_conn.cursor()  # type: ignore[attr-defined]
-    cursor.execute("PRAGMA foreign_keys=ON")
-    cursor.close()
+_read_engine: Engine | None = None
+_read_session_factory: sessionmaker[Session] | None = None
+_async_engine: AsyncEngine | None = None
+_async_session_factory: async_sessionmaker[AsyncSession] | None = None
+
+
+def sqlite_pragmas(settings: Settings, *, read_only: bool = False) -> list[str]:
+    """Return the PRAGMA statements run on every new SQLite connection.
+
+    The ``read_optimized`` profile switches to WAL journaling, so readers
+    and the writer do not block each other, and with ``synchronous=NORMAL``
+    a commit only syncs at checkpoints. It also memory-maps the database
+    file and enlarges the page cache.
+    """
+    pragmas = ["PRAGMA foreign_keys=ON"]
+    if settings.sqlite_profile == "read_optimized":
+        pragmas += [
+            "PRAGMA journal_mode=WAL",
+            "PRAGMA synchronous=NORMAL",
+            f"PRAGMA mmap_size={settings.sqlite_mmap_size_bytes}",
+            f"PRAGMA cache_size=-{settings.sqlite_cache_size_kib}",
+            "PRAGMA temp_store=MEMORY",
+        ]
+    pragmas.append(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+
+def _run_on_connect(pragmas: list[str]) -> Callable[[object, object], None]:
+    def _on_connect(dbapi_conn: object, _connection_record: object) -> None:
+        cursor = dbapi_conn.cursor()  # type: ignore[attr-defined]
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    return _on_connect
+
+
+def _is_sqlite_memory(url: str) -> bool:
+    return make_url(url).database in (None, "", ":memory:")
+
+
+def _pool_args(url: str, pool_size: int, max_overflow: int) -> dict[str, int]:
+    # In-memory SQLite uses a single-connection pool that takes no sizing.
+    if url.startswith("sqlite") and _is_sqlite_memory(url):
+        return {}
+    return {"pool_size": pool_size, "max_overflow": max_overflow}
+
+
+def _create_sync_engine(settings: Settings, *, pool_size: int, read_only: bool) -> Engine:
+    url = settings.database_url
+    connect_args = {}
+    if url.startswith("sqlite"):
+        connect_args["check_same_thread"] = False
+    engine = create_engine(
+        url,
+        connect_args=connect_args,
+        echo=False,
+        **_pool_args(url, pool_size, settings.db_max_overflow),
+    )
+    if url.startswith("sqlite"):
+        event.listen(
+            engine, "connect", _run_on_connect(sqlite_pragmas(settings, read_only=read_only))
+        )
+    return engine
 
 
 def get_engine() -> Engine:
@@ -30,19 +104,29 @@ def get_engine() -> Engine:
     global _engine  # noqa: PLW0603
     if _engine is None:
         settings = get_settings()
-        connect_args = {}
-        if settings.database_url.startswith("sqlite"):
-            connect_args["check_same_thread"] = False
-        _engine = create_engine(
-            settings.database_url,
-            connect_args=connect_args,
-            echo=False,
-        )
-        if settings.database_url.startswith("sqlite"):
-            event.listen(_engine, "connect", _enable_sqlite_fk)
+        _engine = _create_sync_engine(settings, pool_size=settings.db_pool_size, read_only=False)
     return _engine
 
 
+def get_read_engine() -> Engine:
+    """Return the engine for evaluation reads.
+
+    This is a separate pool of ``query_only`` connections when
+    ``READ_ONLY_POOL`` is enabled for a SQLite file database, and the main
+    engine otherwise.
+    """
+    global _read_engine  # noqa: PLW0603
+    settings = get_settings()
+    url = settings.database_url
+    if not settings.read_only_pool or not url.startswith("sqlite") or _is_sqlite_memory(url):
+        return get_engine()
+    if _read_engine is None:
+        _read_engine = _create_sync_engine(
+            settings, pool_size=settings.read_only_pool_size, read_only=True
+        )
+    return _read_engine
+
+
 def get_session_factory() -> sessionmaker[Session]:
     """Return cached session factory singleton."""
     global _session_factory  # noqa: PLW0603
@@ -60,10 +144,82 @@ def get_db() -> Generator[Session, None, None]:
         session.close()
 
 
+def get_read_session_factory() -> sessionmaker[Session]:
+    """Return cached session factory singleton for :func:`get_read_engine`."""
+    global _read_session_factory  # noqa: PLW0603
+    if _read_session_factory is None:
+        _read_session_factory = sessionmaker(bind=get_read_engine(), expire_on_commit=False)
+    return _read_session_factory
+
+
+def get_read_db() -> Generator[Session, None, None]:
+    """FastAPI dependency that yields a session for evaluation reads."""
+    session = get_read_session_factory()()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def async_database_url(url: str) -> str:
+    """Return ``url`` with the SQLite driver swapped for aiosqlite."""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url.removeprefix("sqlite:")
+    return url
+
+
+def get_async_engine() -> AsyncEngine:
+    """Return cached async engine singleton."""
+    global _async_engine  # noqa: PLW0603
+    if _async_engine is None:
+        settings = get_settings()
+        url = settings.database_url
+        _async_engine = create_async_engine(
+            async_database_url(url),
+            echo=False,
+            **_pool_args(url, settings.db_pool_size, settings.db_max_overflow),
+        )
+        if url.startswith("sqlite"):
+            event.listen(
+                _async_engine.sync_engine, "connect", _run_on_connect(sqlite_pragmas(settings))
+            )
+    return _async_engine
+
+
+def get_async_session_factory() -> async_sessionmaker[AsyncSession]:
+    """Return cached async session factory singleton."""
+    global _async_session_factory  # noqa: PLW0603
+    if _async_session_factory is None:
+        _async_session_factory = async_sessionmaker(bind=get_async_engine(), expire_on_commit=False)
+    return _async_session_factory
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """FastAPI dependency that yields an async database session."""
+    async with get_async_session_factory()() as session:
+        yield session
+
+
+async def dispose_async_engine() -> None:
+    """Close the async engine's connections and reset its singletons."""
+    global _async_engine, _async_session_factory  # noqa: PLW0603
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _async_session_factory = None
+
+
 def reset_engine() -> None:
     """Dispose engine and reset singletons (used in tests)."""
-    global _engine, _session_factory  # noqa: PLW0603
-    if _engine is not None:
-        _engine.dispose()
+    global _engine, _session_factory, _read_engine, _read_session_factory  # noqa: PLW0603
+    global _async_engine, _async_session_factory  # noqa: PLW0603
+    for engine in (_engine, _read_engine):
+        if engine is not None:
+            engine.dispose()
     _engine = None
     _session_factory = None
+    _read_engine = None
+    _read_session_factory = None
+    # Async connections are closed by dispose_async_engine() in the app lifespan.
+    _async_engine = None
+    _async_session_factory = None
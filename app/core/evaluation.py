@@ -10,257 +10,265 @@ Rule processing order:
    - Deterministic hash of (flag_key, env_key, user_id) => bucket [0..9999]
    - enabled if bucket < rollout_percentage * 100
 6. Otherwise return default value
+
+Configuration is read from the compiled in-memory snapshot
+(see :mod:`app.core.snapshot`) rather than queried per evaluation, and rule
+conditions are pre-compiled matchers (see :mod:`app.core.matchers`) looked up
+through a per-(flag, env) hash index (see :mod:`app.core.rule_index`).
 """
 
 from __future__ import annotations
 
-import hashlib
 import json
 import uuid
 from datetime import UTC, datetime
-from typing import TYPE_CHECKING
+from time import perf_counter
+from typing import TYPE_CHECKING, NamedTuple
 
-from sqlalchemy import select
+from pydantic import ValidationError
 
-from app.models.models import Environment, Flag, FlagEnvironment, Rule
-from app.schemas.schemas import EvalRequest, EvalResponse, Predicate
+from app.core.bucketing import bucket
+from app.core.cache import get_decision_cache, unknown_flags
+from app.core.metrics import EVALUATION_SAMPLER, EVALUATION_SECONDS, UNKNOWN_FLAG
+from app.core.snapshot import get_snapshot
+from app.schemas.schemas import EvalRequest, EvalResponse, EvalStreamError
 
 if TYPE_CHECKING:
+    from collections.abc import Mapping, Sequence
+
     from sqlalchemy.orm import Session
 
+    from app.core.cache import DecisionCache
+    from app.core.snapshot import FlagConfig, Snapshot
+
 
 def _deterministic_bucket(flag_key: str, env_key: str, user_id: str) -> int:
     """Return an integer in [0, 9999] derived from a deterministic hash."""
-    raw = f"{flag_key}:{env_key}:{user_id}"
-    digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()
-    return int(digest[:8], 16) % 10000
-
-
-def _match_predicate(
-    predicate: Predicate,
-    attributes: dict[str, str | int | float | bool | list[str]],
-) -> bool:
-    """Evaluate a single predicate against the user's attributes."""
-    attr_val = attributes.get(predicate.attribute)
-
-    if predicate.operator == "exists":
-        return predicate.attribute in attributes
-
-    if attr_val is None:
-        return False
-
-    op = predicate.operator
-    val = predicate.value
-
-    if op == "equals":
-        return _coerce_eq(attr_val, val)
-
-    if op == "not_equals":
-        return not _coerce_eq(attr_val, val)
-
-    if op == "contains":
-        return isinstance(attr_val, str) and isinstance(val, str) and val in attr_val
-
-    if op == "in_list":
-        if isinstance(val, list):
-            return any(_coerce_eq(attr_val, v) for v in val)
-        return False
-
-    if op in ("gt", "gte", "lt", "lte"):
-        return _numeric_compare(attr_val, val, op)
-
-    return False
-
-
-def _coerce_eq(a: object, b: object) -> bool:
-    """Compare with coercion for string/number/bool."""
-    if isinstance(a, bool) or isinstance(b, bool):
-        return bool(a) == bool(b)
-    try:
-        return float(a) == float(b)  # type: ignore[arg-type]
-    except (TypeError, ValueError):
-        return str(a) == str(b)
+    return bucket(flag_key, env_key, user_id)
 
 
-def _numeric_compare(a: object, b: object, op: str) -> bool:
-    """Numeric comparison operators."""
-    try:
-        fa, fb = float(a), float(b)  # type: ignore[arg-type]
-    except (TypeError, ValueError):
-        return False
-    if op == "gt":
-        return fa > fb
-    if op == "gte":
-        return fa >= fb
-    if op == "lt":
-        return fa < fb
-    if op == "lte":
-        return fa <= fb
-    return False
+class Decision(NamedTuple):
+    """Outcome of evaluating one flag, without the per-response envelope."""
 
+    enabled: bool
+    variant: str
+    reason: str
+    rule_id: str | None = None
 
-def _match_all_conditions(
-    conditions: list[Predicate],
-    attributes: dict[str, str | int | float | bool | list[str]],
-) -> bool:
-    """All conditions must match (AND logic)."""
-    return all(_match_predicate(c, attributes) for c in conditions)
 
+_DISABLED = Decision(enabled=False, variant="off", reason="disabled")
+_TARGETED_DENY = Decision(enabled=False, variant="off", reason="targeted_deny")
+_ROLLOUT_OFF = Decision(enabled=False, variant="off", reason="rollout")
 
-def evaluate_flag(req: EvalRequest, db: Session) -> EvalResponse:
-    """Evaluate a single flag for a user and return the result."""
-    now = datetime.now(UTC)
-    eval_id = str(uuid.uuid4())
-
-    # Look up the flag
-    flag = db.execute(select(Flag).where(Flag.key == req.flag_key)).scalar_one_or_none()
-    if flag is None:
-        return EvalResponse(
-            flag_key=req.flag_key,
-            env_key=req.env_key,
-            enabled=False,
-            variant="off",
-            reason="disabled",
-            eval_id=eval_id,
-            timestamp=now,
-        )
 
-    # Step 1: archived or globally disabled
-    if flag.archived or not flag.enabled:
-        return EvalResponse(
-            flag_key=req.flag_key,
-            env_key=req.env_key,
-            enabled=False,
-            variant="off",
-            reason="disabled",
-            eval_id=eval_id,
-            timestamp=now,
-        )
+def decide(
+    config: FlagConfig | None,
+    env_key: str,
+    user_id: str,
+    attributes: Mapping[str, str | int | float | bool | list[str]],
+) -> Decision:
+    """Apply the evaluation order to an already-resolved flag configuration."""
+    # Step 1: unknown, archived or disabled (globally or per-environment)
+    if config is None or config.disabled:
+        return _DISABLED
 
-    # Look up environment
-    env = db.execute(select(Environment).where(Environment.key == req.env_key)).scalar_one_or_none()
-
-    # Determine per-env config (fall back to flag-level)
-    targeted_deny: list[str] = json.loads(flag.targeted_deny)
-    targeted_allow: list[str] = json.loads(flag.targeted_allow)
-    rollout_percentage = flag.rollout_percentage
-    default_variant = flag.default_variant
-    env_enabled: bool = flag.enabled
-
-    if env is not None:
-        flag_env = db.execute(
-            select(FlagEnvironment).where(
-                FlagEnvironment.flag_id == flag.id,
-                FlagEnvironment.environment_id == env.id,
-            )
-        ).scalar_one_or_none()
-        if flag_env is not None:
-            env_enabled = flag_env.enabled
-            targeted_deny = json.loads(flag_env.targeted_deny)
-            targeted_allow = json.loads(flag_env.targeted_allow)
-            if flag_env.rollout_percentage is not None:
-                rollout_percentage = flag_env.rollout_percentage
-            default_variant = flag_env.default_variant
-
-            # If env-level is disabled, return disabled
-            if not env_enabled:
-                return EvalResponse(
-                    flag_key=req.flag_key,
-                    env_key=req.env_key,
-                    enabled=False,
-                    variant="off",
-                    reason="disabled",
-                    eval_id=eval_id,
-                    timestamp=now,
-                )
+    default_variant = config.default_variant
 
     # Step 2: targeted deny
-    if req.user_id in targeted_deny:
-        return EvalResponse(
-            flag_key=req.flag_key,
-            env_key=req.env_key,
-            enabled=False,
-            variant="off",
-            reason="targeted_deny",
-            eval_id=eval_id,
-            timestamp=now,
-        )
+    if user_id in config.targeted_deny:
+        return _TARGETED_DENY
 
     # Step 3: targeted allow
-    if req.user_id in targeted_allow:
-        return EvalResponse(
-            flag_key=req.flag_key,
-            env_key=req.env_key,
+    if user_id in config.targeted_allow:
+        return Decision(
             enabled=True,
             variant=default_variant if default_variant != "off" else "on",
             reason="targeted_allow",
-            eval_id=eval_id,
-            timestamp=now,
         )
 
     # Step 4: rule evaluation
-    if env is not None:
-        rules = (
-            db.execute(
-                select(Rule)
-                .where(
-                    Rule.flag_id == flag.id,
-                    Rule.environment_id == env.id,
-                    Rule.enabled == True,  # noqa: E712
-                )
-                .order_by(Rule.priority.asc())
-            )
-            .scalars()
-            .all()
-        )
+    if config.rule_index is not None:
         # Include user_id in the attributes for rule matching
-        eval_attrs = {**req.attributes, "user_id": req.user_id}
-        for rule in rules:
-            conditions = [Predicate(**c) for c in json.loads(rule.conditions)]
-            if _match_all_conditions(conditions, eval_attrs):
-                return EvalResponse(
-                    flag_key=req.flag_key,
-                    env_key=req.env_key,
-                    enabled=True,
-                    variant=rule.variant,
-                    reason="rule_match",
-                    rule_id=rule.id,
-                    eval_id=eval_id,
-                    timestamp=now,
-                )
+        eval_attrs = {**attributes, "user_id": user_id}
+        rule = config.rule_index.first_match(eval_attrs)
+        if rule is not None:
+            return Decision(
+                enabled=True, variant=rule.variant, reason="rule_match", rule_id=rule.id
+            )
 
     # Step 5: rollout percentage
-    if rollout_percentage is not None:
-        bucket = _deterministic_bucket(req.flag_key, req.env_key, req.user_id)
-        threshold = int(rollout_percentage * 100)
-        if bucket < threshold:
-            return EvalResponse(
-                flag_key=req.flag_key,
-                env_key=req.env_key,
+    if config.rollout_threshold is not None:
+        bucketer = config.bucketer
+        if bucketer is not None and bucketer.env_key == env_key:
+            user_bucket = bucketer.bucket(user_id)
+        else:
+            user_bucket = _deterministic_bucket(config.flag_key, env_key, user_id)
+        if user_bucket < config.rollout_threshold:
+            return Decision(
                 enabled=True,
                 variant=default_variant if default_variant != "off" else "on",
                 reason="rollout",
-                eval_id=eval_id,
-                timestamp=now,
             )
-        return EvalResponse(
-            flag_key=req.flag_key,
-            env_key=req.env_key,
-            enabled=False,
-            variant="off",
-            reason="rollout",
-            eval_id=eval_id,
-            timestamp=now,
-        )
+        return _ROLLOUT_OFF
 
     # Step 6: default
-    is_enabled = default_variant != "off"
+    return Decision(enabled=default_variant != "off", variant=default_variant, reason="default")
+
+
+def to_response(flag_key: str, env_key: str, decision: Decision) -> EvalResponse:
+    """Wrap a decision in a response with a fresh eval id and timestamp."""
     return EvalResponse(
-        flag_key=req.flag_key,
-        env_key=req.env_key,
-        enabled=is_enabled,
-        variant=default_variant,
-        reason="default",
-        eval_id=eval_id,
-        timestamp=now,
+        flag_key=flag_key,
+        env_key=env_key,
+        enabled=decision.enabled,
+        variant=decision.variant,
+        reason=decision.reason,
+        rule_id=decision.rule_id,
+        eval_id=str(uuid.uuid4()),
+        timestamp=datetime.now(UTC),
     )
+
+
+def decide_request(
+    req: EvalRequest, snapshot: Snapshot, cache: DecisionCache | None = None
+) -> Decision:
+    """Decide one request against a snapshot, going through the decision cache if given.
+
+    Unknown flag keys are answered from the snapshot's key set (the negative
+    cache for this config version) and counted, without touching the cache.
+    The time taken by sampled calls is recorded in
+    ``featureflags_evaluation_seconds``.
+    """
+    timed = EVALUATION_SAMPLER.take()
+    start = perf_counter() if timed else 0.0
+    if not snapshot.has_flag(req.flag_key):
+        unknown_flags.record(req.flag_key)
+        if timed:
+            _observe(start, UNKNOWN_FLAG, _DISABLED.reason)
+        return _DISABLED
+    if cache is None:
+        config = snapshot.lookup(req.flag_key, req.env_key)
+        decision = decide(config, req.env_key, req.user_id, req.attributes)
+    else:
+        key = request_key(req)
+        cached = cache.get(key, snapshot.version)
+        if cached is None:
+            config = snapshot.lookup(req.flag_key, req.env_key)
+            decision = decide(config, req.env_key, req.user_id, req.attributes)
+            cache.put(key, snapshot.version, decision)
+        else:
+            decision = cached
+    if timed:
+        _observe(start, req.flag_key, decision.reason)
+    return decision
+
+
+def _observe(start: float, flag_key: str, reason: str) -> None:
+    EVALUATION_SECONDS.observe(perf_counter() - start, (flag_key, reason), EVALUATION_SAMPLER.every)
+
+
+def evaluate_with_snapshot(
+    req: EvalRequest, snapshot: Snapshot, cache: DecisionCache | None = None
+) -> EvalResponse:
+    """Evaluate a single flag against an in-memory snapshot."""
+    return to_response(req.flag_key, req.env_key, decide_request(req, snapshot, cache))
+
+
+def request_key(req: EvalRequest) -> tuple[str, str, str, str]:
+    """Return a hashable key identifying the inputs of an evaluation."""
+    attributes = json.dumps(req.attributes, sort_keys=True) if req.attributes else ""
+    return req.flag_key, req.env_key, req.user_id, attributes
+
+
+def evaluate_flag(req: EvalRequest, db: Session) -> EvalResponse:
+    """Evaluate a single flag for a user and return the result.
+
+    The database is only touched when the process-wide snapshot has to be
+    rebuilt after a configuration change. When the decision cache is enabled,
+    repeated identical requests skip evaluation entirely.
+    """
+    return evaluate_with_snapshot(req, get_snapshot(db), get_decision_cache())
+
+
+def evaluate_bulk(reqs: Sequence[EvalRequest], db: Session) -> list[EvalResponse]:
+    """Evaluate many flags against one snapshot.
+
+    The configuration is fetched at most once for the whole batch (a constant
+    number of queries, or none when the snapshot is warm), and identical
+    requests are decided once. Every result still gets its own eval id.
+    """
+    return evaluate_bulk_with_snapshot(reqs, get_snapshot(db), get_decision_cache())
+
+
+def evaluate_bulk_with_snapshot(
+    reqs: Sequence[EvalRequest], snapshot: Snapshot, cache: DecisionCache | None = None
+) -> list[EvalResponse]:
+    """Evaluate many flags against an in-memory snapshot, deciding identical requests once."""
+    decisions: dict[tuple[str, str, str, str], Decision] = {}
+    results = []
+    for req in reqs:
+        if not snapshot.has_flag(req.flag_key):
+            # Recorded as an unknown flag and a disabled decision.
+            results.append(to_response(req.flag_key, req.env_key, decide_request(req, snapshot)))
+            continue
+        key = request_key(req)
+        decision = decisions.get(key)
+        if decision is None:
+            decision = decide_request(req, snapshot, cache)
+            decisions[key] = decision
+        results.append(to_response(req.flag_key, req.env_key, decision))
+    return results
+
+
+def evaluate_ndjson(
+    lines: Sequence[bytes],
+    snapshot: Snapshot,
+    cache: DecisionCache | None = None,
+    *,
+    start: int = 0,
+) -> bytes:
+    """Evaluate a chunk of NDJSON request lines and return the NDJSON results.
+
+    Each line yields one result line in order. A line that is not a valid
+    request yields an error line carrying its index in the stream (counted
+    from ``start``) instead of failing the whole stream.
+    """
+    out = []
+    for index, line in enumerate(lines, start):
+        try:
+            req = EvalRequest.model_validate_json(line)
+        except ValidationError as exc:
+            detail = exc.errors(include_url=False, include_context=False, include_input=False)
+            out.append(EvalStreamError(index=index, detail=list(detail)).model_dump_json())
+            continue
+        out.append(evaluate_with_snapshot(req, snapshot, cache).model_dump_json())
+    return "".join(f"{item}\n" for item in out).encode()
+
+
+def evaluate_all(
+    env_key: str,
+    user_id: str,
+    attributes: Mapping[str, str | int | float | bool | list[str]],
+    db: Session,
+) -> list[EvalResponse]:
+    """Evaluate every non-archived flag for one user in one environment."""
+    return evaluate_all_with_snapshot(env_key, user_id, attributes, get_snapshot(db))
+
+
+def evaluate_all_with_snapshot(
+    env_key: str,
+    user_id: str,
+    attributes: Mapping[str, str | int | float | bool | list[str]],
+    snapshot: Snapshot,
+) -> list[EvalResponse]:
+    """Evaluate every non-archived flag for one user against an in-memory snapshot."""
+    results = []
+    take = EVALUATION_SAMPLER.take
+    for config in snapshot.flags_for_env(env_key):
+        timed = take()
+        start = perf_counter() if timed else 0.0
+        decision = decide(config, env_key, user_id, attributes)
+        if timed:
+            _observe(start, config.flag_key, decision.reason)
+        results.append(to_response(config.flag_key, env_key, decision))
+    return results
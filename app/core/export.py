@@ -0,0 +1,96 @@
+"""Compact export of the effective configuration of one environment.
+
+SDKs and sidecars fetch this to evaluate locally. The body holds, for every
+non-archived flag, the configuration with per-environment overrides already
+merged and the enabled rules in priority order, so a client applies the same
+evaluation order as :func:`app.core.evaluation.decide`. Flags missing from it
+evaluate as disabled. For an environment that does not exist the flag-level
+configuration without rules is exported, as evaluation does.
+
+The ETag is a hash of the body, so it is identical across processes serving
+the same configuration. Serialized bodies are kept per environment for the
+current snapshot.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from app.schemas.schemas import ExportedFlag, ExportedRule, SnapshotExport
+
+if TYPE_CHECKING:
+    from app.core.snapshot import FlagConfig, Snapshot
+
+
+@dataclass(frozen=True, slots=True)
+class ExportedSnapshot:
+    body: bytes
+    etag: str
+    config_version: int
+
+
+def _export_flag(config: FlagConfig) -> ExportedFlag:
+    return ExportedFlag(
+        enabled=not config.disabled,
+        default_variant=config.default_variant,
+        rollout_percentage=config.rollout_percentage,
+        targeted_allow=sorted(config.targeted_allow),
+        targeted_deny=sorted(config.targeted_deny),
+        rules=[
+            ExportedRule(
+                id=rule.id,
+                priority=rule.priority,
+                variant=rule.variant,
+                conditions=list(rule.conditions),
+            )
+            for rule in config.rules
+        ],
+    )
+
+
+def build_export(snapshot: Snapshot, env_key: str) -> SnapshotExport:
+    """Build the export document of one environment."""
+    return SnapshotExport(
+        env_key=env_key,
+        flags={config.flag_key: _export_flag(config) for config in snapshot.flags_for_env(env_key)},
+    )
+
+
+_lock = threading.Lock()
+_exports_for: Snapshot | None = None
+_exports: dict[str, ExportedSnapshot] = {}
+
+
+def export_snapshot(snapshot: Snapshot, env_key: str) -> ExportedSnapshot:
+    """Return the serialized export and its ETag, reusing it while the snapshot is current."""
+    global _exports_for  # noqa: PLW0603
+    with _lock:
+        if _exports_for is not snapshot:
+            _exports.clear()
+            _exports_for = snapshot
+        exported = _exports.get(env_key)
+    if exported is not None:
+        return exported
+    body = build_export(snapshot, env_key).model_dump_json().encode()
+    exported = ExportedSnapshot(
+        body=body,
+        etag=f'"{hashlib.sha256(body).hexdigest()}"',
+        config_version=snapshot.version,
+    )
+    # Only existing environments are kept, so arbitrary env keys cannot grow it.
+    if snapshot.has_env(env_key):
+        with _lock:
+            if _exports_for is snapshot:
+                _exports[env_key] = exported
+    return exported
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Return whether an ``If-None-Match`` header matches ``etag`` (weak comparison)."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
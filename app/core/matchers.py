@@ -0,0 +1,42 @@
+"""Compiled predicate matchers for rule conditions.
+
+The matchers live in :mod:`featureflags.matchers`, which has no dependencies,
+so the service and the embeddable client evaluate conditions with the same
+code. This module adds compiling from a validated :class:`Predicate`.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from featureflags.matchers import (
+    CompareMatcher,
+    ContainsMatcher,
+    EqualsMatcher,
+    ExistsMatcher,
+    InListMatcher,
+    Matcher,
+    NotEqualsMatcher,
+    compile_condition,
+    match_all,
+)
+
+if TYPE_CHECKING:
+    from app.schemas.schemas import Predicate
+
+__all__ = [
+    "CompareMatcher",
+    "ContainsMatcher",
+    "EqualsMatcher",
+    "ExistsMatcher",
+    "InListMatcher",
+    "Matcher",
+    "NotEqualsMatcher",
+    "compile_predicate",
+    "match_all",
+]
+
+
+def compile_predicate(predicate: Predicate) -> Matcher:
+    """Compile a validated predicate into a matcher."""
+    return compile_condition(predicate.attribute, predicate.operator, predicate.value)
@@ -0,0 +1,397 @@
+"""Process-wide metrics in the Prometheus text exposition format.
+
+Counters and histograms keep one list of numbers per label set and are
+updated without a lock, so recording a sample on the evaluation path costs a
+dict lookup, a bisect and two list increments. The GIL keeps each update
+consistent, but two threads incrementing the same cell at once can lose one
+of the increments; that is accepted for monitoring data. Evaluations are
+only timed on a sample (``EVALUATION_TIMING_SAMPLE``), since the clock reads
+and the histogram update take about 1 µs per timed evaluation.
+
+Gauges are read from callbacks when ``/metrics`` is scraped, so threadpool and
+cache figures cost nothing between scrapes. Each worker process exposes its
+own figures; Prometheus aggregates across the scraped targets.
+"""
+
+from __future__ import annotations
+
+import math
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from itertools import cycle
+from random import Random
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+
+    from sqlalchemy.engine import Connection, ExceptionContext
+    from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Label value for evaluations of flag keys that do not exist, so random keys
+# cannot create series. It can never be a flag key.
+UNKNOWN_FLAG = "(unknown)"
+# Label value for requests that did not match any route.
+UNMATCHED_ROUTE = "(unmatched)"
+
+Labels = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    """Base class of the registered metrics."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+
+    @abstractmethod
+    def samples(self) -> Iterator[str]:
+        """Yield the sample lines of the metric."""
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(f"{line}\n" for line in self.samples())
+
+
+class Counter(Metric):
+    """Monotonic count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, label_names)
+        self._series: dict[Labels, list[float]] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series.setdefault(labels, [0])
+        series[0] += amount
+
+    def value(self, labels: Labels = ()) -> float:
+        series = self._series.get(labels)
+        return series[0] if series else 0
+
+    def samples(self) -> Iterator[str]:
+        # list() copies the dict in one step, so concurrent inserts are safe.
+        for labels, series in sorted(list(self._series.items())):
+            yield f"{self.name}{_format_labels(self.label_names, labels)} {series[0]}"
+
+    def clear(self) -> None:
+        self._series.clear()
+
+
+class Histogram(Metric):
+    """Distribution of observed values per label set.
+
+    Each series is a list of the non-cumulative count of every bucket, the
+    overflow (``+Inf``) count, then the sum of all observed values.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        *,
+        buckets: Sequence[float],
+    ) -> None:
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(map(float, buckets)))
+        self._series: dict[Labels, list[float]] = {}
+
+    def observe(self, value: float, labels: Labels = (), weight: int = 1) -> None:
+        """Record ``value``; a ``weight`` above 1 stands for that many sampled observations."""
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series.setdefault(labels, [0] * (len(self.buckets) + 2))
+        series[bisect_left(self.buckets, value)] += weight
+        series[-1] += value * weight
+
+    def count(self, labels: Labels = ()) -> int:
+        series = self._series.get(labels)
+        return int(sum(series[:-1])) if series else 0
+
+    def total(self, labels: Labels = ()) -> float:
+        series = self._series.get(labels)
+        return series[-1] if series else 0.0
+
+    def series(self) -> list[Labels]:
+        return sorted(list(self._series))
+
+    def samples(self) -> Iterator[str]:
+        names = (*self.label_names, "le")
+        for labels, series in sorted(list(self._series.items())):
+            counts = list(series)
+            cumulative = 0
+            for upper, bucket_count in zip((*self.buckets, math.inf), counts):
+                cumulative += int(bucket_count)
+                bucket_labels = _format_labels(names, (*labels, _format_value(upper)))
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            formatted = _format_labels(self.label_names, labels)
+            yield f"{self.name}_sum{formatted} {_format_value(counts[-1])}"
+            yield f"{self.name}_count{formatted} {cumulative}"
+
+    def clear(self) -> None:
+        self._series.clear()
+
+
+class Gauge(Metric):
+    """Value read from a callback at scrape time.
+
+    The callback returns a number, or a mapping of label values to numbers.
+    ``kind`` may be set to ``counter`` for totals kept elsewhere.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        read: Callable[[], float | Mapping[Labels, float]],
+        label_names: Sequence[str] = (),
+        *,
+        kind: str = "gauge",
+    ) -> None:
+        super().__init__(name, documentation, label_names)
+        self.kind = kind
+        self._read = read
+
+    def samples(self) -> Iterator[str]:
+        value = self._read()
+        values = value if not isinstance(value, int | float) else {(): value}
+        for labels, number in sorted(values.items()):
+            formatted = _format_labels(self.label_names, labels)
+            yield f"{self.name}{formatted} {_format_value(number)}"
+
+
+class Sampler:
+    """Picks about one call in every ``every`` to record; ``every=0`` picks none.
+
+    Calls are picked by a fixed random pattern rather than a strict rotation,
+    so a caller evaluating the same flags in the same order each time (a bulk
+    request, evaluate-all) does not always have the same flag timed.
+    :attr:`take` is a bound builtin, so asking costs tens of nanoseconds.
+    """
+
+    __slots__ = ("every", "take")
+
+    PATTERN_LENGTH = 65_536
+
+    every: int
+    take: Callable[[], int]
+
+    def __init__(self, every: int = 1) -> None:
+        self.configure(every)
+
+    def configure(self, every: int) -> None:
+        if every < 0:
+            raise ValueError("every must not be negative")
+        self.every = every
+        if every <= 1:
+            pattern = bytes([every])
+        else:
+            rng = Random(every)
+            pattern = bytes(rng.randrange(every) == 0 for _ in range(self.PATTERN_LENGTH))
+        self.take = cycle(pattern).__next__
+
+
+class Registry:
+    """Ordered collection of metrics rendered together."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name!r} is already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self._metrics.values())
+
+    def __iter__(self) -> Iterator[Metric]:
+        return iter(self._metrics.values())
+
+
+registry = Registry()
+
+
+# ── Metrics recorded by the service ──────────────────────────────
+
+EVALUATION_SECONDS = Histogram(
+    "featureflags_evaluation_seconds",
+    "Time to decide one flag evaluation, by flag and decision reason.",
+    ("flag", "reason"),
+    buckets=(1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3, 1e-2),
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "featureflags_http_request_seconds",
+    "Time to serve an HTTP request, by method, route template and status code.",
+    ("method", "route", "status"),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 10),
+)
+
+DB_QUERY_SECONDS = Histogram(
+    "featureflags_db_query_seconds",
+    "Time to execute one SQL statement, by statement type.",
+    ("statement",),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1, 1),
+)
+
+DB_QUERY_ERRORS = Counter(
+    "featureflags_db_query_errors_total",
+    "SQL statements that raised an error, by statement type.",
+    ("statement",),
+)
+
+# Which evaluations are timed; the others skip the clock and the histogram.
+EVALUATION_SAMPLER = Sampler()
+
+for _metric in (EVALUATION_SECONDS, HTTP_REQUEST_SECONDS, DB_QUERY_SECONDS, DB_QUERY_ERRORS):
+    registry.register(_metric)
+
+
+# ── HTTP requests ────────────────────────────────────────────────
+
+
+def _route_template(scope: Scope) -> str:
+    route = scope.get("route")
+    path: str | None = getattr(route, "path", None)
+    if route is None or path is None:
+        return UNMATCHED_ROUTE
+    # A route only knows its path below the prefixes of the routers it was
+    # included through. Those prefixes are static, so they are the part of the
+    # requested path in front of what the route matches.
+    requested: str = scope["path"]
+    for start, char in enumerate(requested):
+        if char == "/" and route.path_regex.match(requested[start:]):
+            return requested[:start] + path
+    return path
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware timing every HTTP request by route template.
+
+    The route is the path template of the matched route (``/api/v1/flags/{key}``),
+    not the requested path, so flag keys and IDs do not create series. Streaming
+    responses are timed until their last chunk is sent.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_SECONDS.observe(
+                perf_counter() - start, (scope["method"], _route_template(scope), str(status))
+            )
+
+
+# ── SQL statements ───────────────────────────────────────────────
+
+_QUERY_STARTS = "metrics_query_starts"
+
+
+def _statement_type(statement: str) -> str:
+    verb = statement.lstrip().split(None, 1)[:1]
+    return verb[0].upper() if verb else "OTHER"
+
+
+def _before_cursor_execute(
+    conn: Connection,
+    _cursor: object,
+    _statement: str,
+    _parameters: object,
+    _context: object,
+    _executemany: bool,
+) -> None:
+    conn.info.setdefault(_QUERY_STARTS, []).append(perf_counter())
+
+
+def _after_cursor_execute(
+    conn: Connection,
+    _cursor: object,
+    statement: str,
+    _parameters: object,
+    _context: object,
+    _executemany: bool,
+) -> None:
+    starts = conn.info.get(_QUERY_STARTS)
+    if starts:
+        DB_QUERY_SECONDS.observe(perf_counter() - starts.pop(), (_statement_type(statement),))
+
+
+def _handle_error(context: ExceptionContext) -> None:
+    conn = context.connection
+    starts = conn.info.get(_QUERY_STARTS) if conn is not None else None
+    if starts:
+        starts.pop()
+    if context.statement is not None:
+        DB_QUERY_ERRORS.inc((_statement_type(context.statement),))
+
+
+def install_query_metrics() -> None:
+    """Time every SQL statement executed by any engine in this process."""
+    if event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+
+
+# ── Exposition ───────────────────────────────────────────────────
+
+
+def render(extra: Iterable[Metric] = ()) -> str:
+    """Render the registered metrics, then ``extra``, in the text format."""
+    return registry.render() + "".join(metric.render() for metric in extra)
+
+
+def reset_metrics() -> None:
+    """Clear every recorded series (used in tests)."""
+    for metric in registry:
+        if isinstance(metric, Counter | Histogram):
+            metric.clear()
@@ -0,0 +1,129 @@
+"""Hash index over a (flag, environment) rule list.
+
+Each rule is indexed under at most one of its ``equals``/``in_list``
+conditions. Because every condition must match, a rule can only match when
+the user's value for that attribute hits one of the indexed keys, so only
+those rules plus the rules without an indexable condition need checking.
+Candidates are visited in priority order, so the first match is the same one
+a linear scan would return.
+
+Keys follow the matcher coercion rules: constants that parse as numbers are
+keyed by their float value and everything else by ``str()``. Boolean
+constants compare by truthiness against any value and are never indexed; a
+boolean attribute value likewise falls back to every rule indexed on that
+attribute.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+from typing import TYPE_CHECKING
+
+from app.core.matchers import EqualsMatcher, InListMatcher, match_all
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Mapping
+
+    from app.core.snapshot import CompiledRule
+
+# Below this many rules a linear scan is cheaper than merging candidate lists.
+INDEX_MIN_RULES = 8
+
+
+class _AttributeIndex:
+    __slots__ = ("every", "numbers", "texts")
+
+    def __init__(self) -> None:
+        self.numbers: dict[float, list[int]] = {}
+        self.texts: dict[str, list[int]] = {}
+        self.every: list[int] = []
+
+    def add(self, position: int, numbers: Iterable[float], texts: Iterable[str]) -> None:
+        for number in numbers:
+            self.numbers.setdefault(number, []).append(position)
+        for text in texts:
+            self.texts.setdefault(text, []).append(position)
+        self.every.append(position)
+
+    def lookup(self, value: object) -> list[list[int]]:
+        if isinstance(value, bool):
+            return [self.every]
+        hits = []
+        text_hit = self.texts.get(str(value))
+        if text_hit is not None:
+            hits.append(text_hit)
+        if self.numbers:
+            try:
+                number = float(value)  # type: ignore[arg-type]
+            except (TypeError, ValueError):
+                pass
+            else:
+                number_hit = self.numbers.get(number)
+                if number_hit is not None:
+                    hits.append(number_hit)
+        return hits
+
+
+def _index_keys(rule: CompiledRule) -> tuple[str, list[float], list[str]] | None:
+    """Pick the first indexable condition and return (attribute, numbers, texts)."""
+    for matcher in rule.matchers:
+        if type(matcher) is EqualsMatcher:
+            if matcher.is_bool:
+                continue
+            if matcher.number is None:
+                return matcher.attribute, [], [matcher.text]
+            if math.isnan(matcher.number):
+                continue
+            return matcher.attribute, [matcher.number], []
+        if isinstance(matcher, InListMatcher):
+            if matcher.truthy_from_bools or any(math.isnan(n) for n in matcher.numbers):
+                continue
+            return matcher.attribute, list(matcher.numbers), list(matcher.non_numeric_texts)
+    return None
+
+
+class RuleIndex:
+    """Priority-ordered rules with an attribute-value index for fast candidate lookup."""
+
+    __slots__ = ("by_attribute", "rules", "unindexed")
+
+    def __init__(self, rules: tuple[CompiledRule, ...]) -> None:
+        self.rules = rules
+        self.by_attribute: dict[str, _AttributeIndex] = {}
+        self.unindexed: list[int] = []
+        if len(rules) < INDEX_MIN_RULES:
+            return
+        for position, rule in enumerate(rules):
+            keys = _index_keys(rule)
+            if keys is None:
+                self.unindexed.append(position)
+                continue
+            attribute, numbers, texts = keys
+            self.by_attribute.setdefault(attribute, _AttributeIndex()).add(position, numbers, texts)
+
+    def _candidates(self, attributes: Mapping[str, object]) -> Iterator[int]:
+        lists = [self.unindexed]
+        for attribute, index in self.by_attribute.items():
+            value = attributes.get(attribute)
+            if value is not None:
+                lists.extend(index.lookup(value))
+        last = -1
+        for position in heapq.merge(*lists):
+            if position != last:
+                last = position
+                yield position
+
+    def first_match(self, attributes: Mapping[str, object]) -> CompiledRule | None:
+        """Return the lowest-priority-number rule whose conditions all match."""
+        if not self.by_attribute:
+            for rule in self.rules:
+                if match_all(rule.matchers, attributes):
+                    return rule
+            return None
+        rules = self.rules
+        for position in self._candidates(attributes):
+            rule = rules[position]
+            if match_all(rule.matchers, attributes):
+                return rule
+        return None
@@ -0,0 +1,267 @@
+"""Snapshot file shared by the worker processes of one host.
+
+With ``SHARED_SNAPSHOT_DIR`` set, the configuration a snapshot is compiled
+from is published to ``snapshot.bin`` in that directory and every worker maps
+the file read-only. Targeting lists, the bulk of the configuration, are stored
+as open-addressing hash tables that are probed in place, so N workers share a
+single copy of them in the page cache; each worker only compiles the flag and
+rule definitions itself.
+
+A new file is written next to the current one and renamed over it, so readers
+map either the old or the new snapshot, never a partial one. ``version`` holds
+the latest configuration version any worker has seen; the first worker to see
+it move past the file rebuilds the file under an exclusive lock while the
+others wait, then map the result.
+
+Files use the host's native byte order and are not meant to be copied between
+machines. Locking uses ``fcntl.flock``, so this is POSIX only.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import itertools
+import json
+import mmap
+import os
+import struct
+import threading
+from array import array
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+from zlib import crc32
+
+from app.core.targeting import TargetingStats
+
+if TYPE_CHECKING:
+    from collections.abc import Collection, Iterator, Mapping
+    from contextlib import AbstractContextManager
+    from pathlib import Path
+
+    from app.core.targeting import ListKey
+
+_MAGIC = b"FFSNAP01"
+# Magic, configuration version, config payload length, number of lists.
+_HEADER = struct.Struct("=8sQQQ")
+# Offset, number of IDs and number of hash slots of one list.
+_LIST = struct.Struct("=QQQ")
+_ALIGN = 8
+
+
+def _aligned(position: int) -> int:
+    return -(-position // _ALIGN) * _ALIGN
+
+
+class MappedTargetingList:
+    """Read-only membership set probed in place in a mapped snapshot file.
+
+    The list is a table of ``(crc32, index + 1)`` slots at most half full,
+    followed by the end offset of every ID and the UTF-8 IDs in sorted order.
+    CRC-32 is used because, unlike ``hash()``, it is the same in every process.
+    """
+
+    __slots__ = ("_blob", "_count", "_map", "_mask", "_offsets", "_slots")
+
+    def __init__(self, data: mmap.mmap, offset: int, count: int, slot_count: int) -> None:
+        offsets_start = offset + 8 * slot_count
+        self._blob = offsets_start + 4 * (count + 1)
+        view = memoryview(data)
+        self._slots = view[offset:offsets_start].cast("I")
+        self._offsets = view[offsets_start : self._blob].cast("I")
+        # Slicing the mmap itself is cheaper than slicing a memoryview of it.
+        self._map = data
+        self._mask = slot_count - 1
+        self._count = count
+
+    def __contains__(self, user_id: object) -> bool:
+        try:
+            key = user_id.encode()  # type: ignore[attr-defined]
+        except (AttributeError, UnicodeEncodeError):
+            # Not a string, or one that cannot have been stored.
+            return False
+        digest = crc32(key)
+        slots, offsets, blob, mask = self._slots, self._offsets, self._blob, self._mask
+        slot = digest & mask
+        while True:
+            index = slots[2 * slot + 1]
+            if not index:
+                return False
+            if (
+                slots[2 * slot] == digest
+                and self._map[blob + offsets[index - 1] : blob + offsets[index]] == key
+            ):
+                return True
+            slot = (slot + 1) & mask
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        offsets, blob = self._offsets, self._blob
+        for index in range(self._count):
+            yield self._map[blob + offsets[index] : blob + offsets[index + 1]].decode()
+
+    def __repr__(self) -> str:
+        return f"MappedTargetingList({self._count} ids)"
+
+    def mapped_bytes(self) -> int:
+        """Bytes of the file the list occupies (shared, not per process)."""
+        return self._slots.nbytes + self._offsets.nbytes + self._offsets[self._count]
+
+
+def _hash_table(user_ids: Collection[str]) -> tuple[int, int, list[bytes]]:
+    """Encode one list; return its ID count, slot count and the sections to write."""
+    encoded = [u.encode() for u in sorted(user_ids)]
+    slot_count = 1 << max(1, 2 * len(encoded) - 1).bit_length()
+    mask = slot_count - 1
+    slots = array("I", bytes(8 * slot_count))
+    for index, key in enumerate(encoded, 1):
+        digest = crc32(key)
+        slot = digest & mask
+        while slots[2 * slot + 1]:
+            slot = (slot + 1) & mask
+        slots[2 * slot] = digest
+        slots[2 * slot + 1] = index
+    offsets = array("I", itertools.accumulate(map(len, encoded), initial=0))
+    return len(encoded), slot_count, [slots.tobytes(), offsets.tobytes(), b"".join(encoded)]
+
+
+@dataclass(frozen=True, slots=True)
+class MappedSnapshot:
+    """Contents of a mapped snapshot file."""
+
+    version: int
+    # Modification time of the file, as seconds since the epoch.
+    published_at: float
+    config: Any
+    lists: dict[ListKey, MappedTargetingList]
+    stats: TargetingStats
+
+
+class SharedSnapshotFile:
+    """The shared version counter and snapshot file in one directory."""
+
+    def __init__(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / "snapshot.bin"
+        self._version_fd = os.open(directory / "version", os.O_RDWR | os.O_CREAT, 0o644)
+        self._build_fd = os.open(directory / "build.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        # flock() does not exclude threads sharing a descriptor; these do.
+        self._version_lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        with self._locked(self._version_fd, self._version_lock):
+            if os.fstat(self._version_fd).st_size < 8:
+                os.ftruncate(self._version_fd, 8)
+        self._version_map = mmap.mmap(self._version_fd, 8)
+        self._version = memoryview(self._version_map).cast("Q")
+
+    @staticmethod
+    @contextmanager
+    def _locked(fd: int, lock: threading.Lock) -> Iterator[None]:
+        with lock:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def version(self) -> int:
+        """Return the configuration version shared by every worker."""
+        return self._version[0]
+
+    def advance(self, version: int) -> int:
+        """Raise the shared version to ``version`` if it is behind; return the result."""
+        if version <= self._version[0]:
+            return self.version()
+        with self._locked(self._version_fd, self._version_lock):
+            latest: int = max(self._version[0], version)
+            self._version[0] = latest
+            return latest
+
+    def building(self) -> AbstractContextManager[None]:
+        """Hold the exclusive lock under which the snapshot file is rebuilt."""
+        return self._locked(self._build_fd, self._build_lock)
+
+    def read(self) -> MappedSnapshot | None:
+        """Map the current snapshot file; ``None`` if there is none in this format."""
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            published_at = os.fstat(fd).st_mtime
+            data = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+        magic, version, config_length, list_count = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            return None
+        payload = json.loads(data[_HEADER.size : _HEADER.size + config_length])
+        directory = _aligned(_HEADER.size + config_length)
+        tables = [
+            MappedTargetingList(data, *_LIST.unpack_from(data, directory + i * _LIST.size))
+            for i in range(list_count)
+        ]
+        lists = {
+            (flag_id, environment_id, kind): tables[index]
+            for flag_id, environment_id, kind, index in payload["lists"]
+        }
+        stats = TargetingStats(
+            lists=len(tables),
+            entries=sum(len(t) for t in tables),
+            largest=max((len(t) for t in tables), default=0),
+            memory_bytes=sum(t.mapped_bytes() for t in tables),
+        )
+        return MappedSnapshot(
+            version=version,
+            published_at=published_at,
+            config=payload["config"],
+            lists=lists,
+            stats=stats,
+        )
+
+    def publish(
+        self, version: int, config: Any, members: Mapping[ListKey, Collection[str]]
+    ) -> MappedSnapshot:
+        """Write a snapshot file, swap it in and map it; call while holding :meth:`building`.
+
+        ``config`` must be JSON-serializable. Identical lists are stored once.
+        """
+        distinct: dict[frozenset[str], int] = {}
+        keys: list[list[str | int | None]] = []
+        for key, user_ids in members.items():
+            ids = frozenset(user_ids)
+            if ids:
+                keys.append([*key, distinct.setdefault(ids, len(distinct))])
+        tables = [_hash_table(ids) for ids in distinct]
+        payload = json.dumps({"config": config, "lists": keys}, separators=(",", ":")).encode()
+
+        position = _aligned(_HEADER.size + len(payload)) + _LIST.size * len(tables)
+        entries = []
+        for count, slot_count, sections in tables:
+            entries.append(_LIST.pack(position, count, slot_count))
+            position = _aligned(position + sum(map(len, sections)))
+
+        # The file is a cache rebuilt from the database, so it is not fsynced.
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with tmp.open("wb") as out:
+            out.write(_HEADER.pack(_MAGIC, version, len(payload), len(tables)))
+            out.write(payload)
+            out.write(bytes(_aligned(out.tell()) - out.tell()))
+            out.writelines(entries)
+            for _count, _slot_count, sections in tables:
+                out.writelines(sections)
+                out.write(bytes(_aligned(out.tell()) - out.tell()))
+        os.replace(tmp, self.path)
+        mapped = self.read()
+        if mapped is None:
+            raise OSError(f"{self.path} was not readable after publishing")
+        return mapped
+
+    def close(self) -> None:
+        """Unmap the version counter and close the lock files."""
+        self._version.release()
+        self._version_map.close()
+        os.close(self._version_fd)
+        os.close(self._build_fd)
@@ -0,0 +1,160 @@
+"""Rollout impact simulation.
+
+Given a population of user IDs, a flag/environment and a proposed
+``rollout_percentage``, report how the population is spread over the 10,000
+rollout buckets and exactly which users' decisions would flip.
+
+IDs are consumed in chunks of raw UTF-8 ``bytes`` (one per line), so a large
+file is never held in memory as Python strings; only the IDs that change are
+kept, up to a limit. Users on a targeting list are skipped, since their
+decision does not depend on the rollout. Rules are not evaluated: the
+population has IDs but no attributes.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from app.core.bucketing import BUCKETS, Bucketer
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without the extra
+    np = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from app.core.snapshot import FlagConfig
+
+DEFAULT_CHUNK_SIZE = 65536
+
+
+def _enabled_below(config: FlagConfig, threshold: int | None) -> int:
+    """Return the bucket below which users are enabled for a rollout threshold."""
+    if config.disabled:
+        return 0
+    if threshold is None:
+        # No rollout: everyone gets the default variant.
+        return BUCKETS if config.default_variant != "off" else 0
+    return threshold
+
+
+@dataclass(frozen=True, slots=True)
+class RolloutImpact:
+    flag_key: str
+    env_key: str
+    current_percentage: float | None
+    proposed_percentage: float
+    total: int
+    targeted: int
+    enabled_before: int
+    enabled_after: int
+    turned_on: int
+    turned_off: int
+    changed: list[str]
+    histogram: list[int]
+
+    @property
+    def changed_truncated(self) -> bool:
+        return len(self.changed) < self.turned_on + self.turned_off
+
+
+class RolloutSimulator:
+    """Accumulates the rollout impact of a percentage change over chunks of user IDs."""
+
+    def __init__(
+        self,
+        config: FlagConfig,
+        env_key: str,
+        proposed_percentage: float,
+        *,
+        changed_limit: int | None = None,
+    ) -> None:
+        self.config = config
+        self.env_key = env_key
+        self.proposed_percentage = proposed_percentage
+        self.changed_limit = changed_limit
+        self.before = _enabled_below(config, config.rollout_threshold)
+        self.after = _enabled_below(config, int(proposed_percentage * 100))
+        # Users in [low, high) flip; on when the threshold rises, off when it falls.
+        self.low, self.high = sorted((self.before, self.after))
+        self._bucketer = Bucketer(config.flag_key, env_key)
+        self._targeted = {
+            user_id.encode() for user_id in (*config.targeted_allow, *config.targeted_deny)
+        }
+        self._histogram = [0] * BUCKETS if np is None else np.zeros(BUCKETS, dtype=np.int64)
+        self._changed: list[bytes] = []
+        self.total = 0
+        self.targeted = 0
+
+    def feed(self, user_ids: Sequence[bytes]) -> list[bytes]:
+        """Bucket one chunk of UTF-8 user IDs and return those whose decision changes."""
+        self.total += len(user_ids)
+        changed = self._feed_python(user_ids) if np is None else self._feed_numpy(user_ids)
+        if self.changed_limit is None:
+            self._changed.extend(changed)
+        elif len(self._changed) < self.changed_limit:
+            self._changed.extend(changed[: self.changed_limit - len(self._changed)])
+        return changed
+
+    def _feed_python(self, user_ids: Sequence[bytes]) -> list[bytes]:
+        histogram = self._histogram
+        targeted = self._targeted
+        low, high = self.low, self.high
+        changed = []
+        for user_id, bucket in zip(user_ids, self._bucketer.bucket_batch(user_ids), strict=True):
+            if user_id in targeted:
+                self.targeted += 1
+                continue
+            histogram[bucket] += 1
+            if low <= bucket < high:
+                changed.append(user_id)
+        return changed
+
+    def _feed_numpy(self, user_ids: Sequence[bytes]) -> list[bytes]:
+        buckets = np.frombuffer(self._bucketer.bucket_batch(user_ids), dtype=np.uint16)
+        positions = None
+        if self._targeted:
+            keep = np.fromiter(
+                (user_id not in self._targeted for user_id in user_ids),
+                dtype=bool,
+                count=len(user_ids),
+            )
+            positions = np.flatnonzero(keep)
+            self.targeted += len(user_ids) - len(positions)
+            buckets = buckets[positions]
+        self._histogram += np.bincount(buckets, minlength=BUCKETS)
+        hits = np.flatnonzero((buckets >= self.low) & (buckets < self.high))
+        if positions is not None:
+            hits = positions[hits]
+        return [user_ids[i] for i in hits.tolist()]
+
+    def histogram(self, bins: int = BUCKETS) -> list[int]:
+        """Return user counts per bucket range; ``bins`` must divide 10,000."""
+        if bins <= 0 or BUCKETS % bins:
+            raise ValueError(f"bins must divide {BUCKETS}")
+        width = BUCKETS // bins
+        counts = [int(count) for count in self._histogram]
+        return [sum(counts[i : i + width]) for i in range(0, BUCKETS, width)]
+
+    def report(self, bins: int = 100) -> RolloutImpact:
+        counts = self.histogram()
+        enabled_before = sum(counts[: self.before])
+        enabled_after = sum(counts[: self.after])
+        flipped = sum(counts[self.low : self.high])
+        return RolloutImpact(
+            flag_key=self.config.flag_key,
+            env_key=self.env_key,
+            current_percentage=self.config.rollout_percentage,
+            proposed_percentage=self.proposed_percentage,
+            total=self.total,
+            targeted=self.targeted,
+            enabled_before=enabled_before,
+            enabled_after=enabled_after,
+            turned_on=flipped if self.after > self.before else 0,
+            turned_off=flipped if self.after < self.before else 0,
+            changed=[user_id.decode("utf-8", "replace") for user_id in self._changed],
+            histogram=self.histogram(bins),
+        )
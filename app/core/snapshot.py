@@ -0,0 +1,490 @@
+"""Process-wide compiled snapshot of the flag configuration.
+
+Evaluation reads flags, environments, per-environment overrides and rules from
+an immutable in-memory snapshot instead of querying the database. The snapshot
+is loaded in a fixed number of queries and tagged with the configuration
+version it was built for: the version of the last change-log row, which every
+admin write inserts in its own transaction (see :mod:`app.core.changes`).
+
+Readers check that version at most every ``CONFIG_POLL_INTERVAL_SECONDS``, a
+single index lookup, and rebuild when it moved on, so writes made by other
+worker processes are picked up within that interval. Admin routers call
+:func:`mark_config_changed` after committing so their own writes are visible
+on the next read.
+
+With ``SHARED_SNAPSHOT_DIR`` set, the latest version seen and the
+configuration are shared by the worker processes of the host through a
+memory-mapped file (see :mod:`app.core.shared_snapshot`), and each worker
+compiles its snapshot from that file instead of the database.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from sqlalchemy import select
+
+from app.core.bucketing import Bucketer
+from app.core.changes import latest_version
+from app.core.config import get_settings
+from app.core.matchers import compile_predicate
+from app.core.rule_index import RuleIndex
+from app.core.shared_snapshot import SharedSnapshotFile
+from app.core.targeting import ALLOW, DENY, EMPTY, TargetingStats, TargetingStore
+from app.models.models import Environment, Flag, FlagEnvironment, Rule, TargetingEntry
+from app.schemas.schemas import Predicate
+
+if TYPE_CHECKING:
+    from collections.abc import Collection, Mapping
+
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import Session
+
+    from app.core.matchers import Matcher
+    from app.core.targeting import ListKey
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledRule:
+    """An enabled rule with its conditions compiled once at load time."""
+
+    id: str
+    priority: int
+    variant: str
+    matchers: tuple[Matcher, ...]
+    # The source predicates, kept for exporting the configuration.
+    conditions: tuple[Predicate, ...] = ()
+
+
+@dataclass(frozen=True, slots=True)
+class FlagConfig:
+    """Effective configuration of one flag in one environment.
+
+    Per-environment overrides have already been merged over the flag-level
+    values, so evaluation never needs to look at more than one object.
+    """
+
+    flag_key: str
+    disabled: bool
+    archived: bool
+    targeted_deny: Collection[str]
+    targeted_allow: Collection[str]
+    rollout_percentage: float | None
+    default_variant: str
+    rules: tuple[CompiledRule, ...] = ()
+    rule_index: RuleIndex | None = None
+    # Rollout as a bucket threshold, and a bucketer with the hashed key prefix
+    # (only for known environments; fallbacks hash the full key per request).
+    rollout_threshold: int | None = None
+    bucketer: Bucketer | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class Snapshot:
+    """Immutable view of the whole configuration at a given version.
+
+    ``configs`` is keyed by ``(flag_key, env_key)`` for every existing
+    environment. ``fallbacks`` holds the flag-level configuration used when the
+    requested environment does not exist (no overrides and no rules).
+    ``by_env`` lists the non-archived flag configs of each environment, for
+    evaluating every flag for one user in a single pass.
+    ``targeting`` reports the size of the distinct targeting lists held.
+    """
+
+    version: int
+    configs: dict[tuple[str, str], FlagConfig] = field(default_factory=dict)
+    fallbacks: dict[str, FlagConfig] = field(default_factory=dict)
+    by_env: dict[str, tuple[FlagConfig, ...]] = field(default_factory=dict)
+    targeting: TargetingStats = field(default_factory=lambda: TargetingStore().stats())
+
+    def lookup(self, flag_key: str, env_key: str) -> FlagConfig | None:
+        """Return the effective config, or ``None`` if the flag does not exist."""
+        config = self.configs.get((flag_key, env_key))
+        if config is None:
+            return self.fallbacks.get(flag_key)
+        return config
+
+    def has_flag(self, flag_key: str) -> bool:
+        """Return whether a flag with this key exists (archived or not)."""
+        return flag_key in self.fallbacks
+
+    def has_env(self, env_key: str) -> bool:
+        """Return whether an environment with this key exists."""
+        return bool(env_key) and env_key in self.by_env
+
+    def flags_for_env(self, env_key: str) -> tuple[FlagConfig, ...]:
+        """Return the configs of every non-archived flag in an environment."""
+        flags = self.by_env.get(env_key)
+        if flags is None:
+            return self.by_env.get("", ())
+        return flags
+
+
+def _threshold(rollout_percentage: float | None) -> int | None:
+    return None if rollout_percentage is None else int(rollout_percentage * 100)
+
+
+def _bucketer(flag_key: str, env_key: str, rollout_percentage: float | None) -> Bucketer | None:
+    return None if rollout_percentage is None else Bucketer(flag_key, env_key)
+
+
+class FlagRow(NamedTuple):
+    id: str
+    key: str
+    enabled: bool
+    archived: bool
+    rollout_percentage: float | None
+    default_variant: str
+
+
+class EnvironmentRow(NamedTuple):
+    id: str
+    key: str
+
+
+class OverrideRow(NamedTuple):
+    flag_id: str
+    environment_id: str
+    enabled: bool
+    rollout_percentage: float | None
+    default_variant: str
+
+
+class RuleRow(NamedTuple):
+    id: str
+    flag_id: str
+    environment_id: str
+    priority: int
+    variant: str
+    conditions: str
+
+
+@dataclass(frozen=True, slots=True)
+class ConfigRows:
+    """The rows a snapshot is compiled from; enabled rules only, in priority order."""
+
+    flags: list[FlagRow]
+    environments: list[EnvironmentRow]
+    overrides: list[OverrideRow]
+    rules: list[RuleRow]
+    members: dict[ListKey, list[str]] = field(default_factory=dict)
+
+    def to_json(self) -> dict[str, object]:
+        """Everything but the targeting lists, as JSON-serializable lists."""
+        return {
+            "flags": self.flags,
+            "environments": self.environments,
+            "overrides": self.overrides,
+            "rules": self.rules,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict[str, list[list[Any]]]) -> ConfigRows:
+        return cls(
+            flags=[FlagRow._make(row) for row in data["flags"]],
+            environments=[EnvironmentRow._make(row) for row in data["environments"]],
+            overrides=[OverrideRow._make(row) for row in data["overrides"]],
+            rules=[RuleRow._make(row) for row in data["rules"]],
+        )
+
+
+def read_config(db: Session) -> ConfigRows:
+    """Read everything a snapshot needs in five queries."""
+    flags = db.execute(
+        select(
+            Flag.id,
+            Flag.key,
+            Flag.enabled,
+            Flag.archived,
+            Flag.rollout_percentage,
+            Flag.default_variant,
+        )
+    ).all()
+    envs = db.execute(select(Environment.id, Environment.key)).all()
+    flag_envs = db.execute(
+        select(
+            FlagEnvironment.flag_id,
+            FlagEnvironment.environment_id,
+            FlagEnvironment.enabled,
+            FlagEnvironment.rollout_percentage,
+            FlagEnvironment.default_variant,
+        )
+    ).all()
+    rules = db.execute(
+        select(
+            Rule.id, Rule.flag_id, Rule.environment_id, Rule.priority, Rule.variant, Rule.conditions
+        )
+        .where(Rule.enabled == True)  # noqa: E712
+        .order_by(Rule.priority.asc())
+    ).all()
+    rows = ConfigRows(
+        flags=[FlagRow._make(row) for row in flags],
+        environments=[EnvironmentRow._make(row) for row in envs],
+        overrides=[OverrideRow._make(row) for row in flag_envs],
+        rules=[RuleRow._make(row) for row in rules],
+        members=defaultdict(list),
+    )
+    for flag_id, environment_id, kind, user_id in db.execute(
+        select(
+            TargetingEntry.flag_id,
+            TargetingEntry.environment_id,
+            TargetingEntry.kind,
+            TargetingEntry.user_id,
+        )
+    ):
+        rows.members[(flag_id, environment_id, kind)].append(user_id)
+    return rows
+
+
+def load_snapshot(db: Session, *, version: int = 0) -> Snapshot:
+    """Build a snapshot from the database in five queries."""
+    rows = read_config(db)
+    targeting = TargetingStore()
+    lists = {key: targeting.get(user_ids) for key, user_ids in rows.members.items()}
+    return compile_snapshot(rows, version=version, lists=lists, targeting=targeting.stats())
+
+
+def compile_snapshot(
+    rows: ConfigRows,
+    *,
+    version: int,
+    lists: Mapping[ListKey, Collection[str]],
+    targeting: TargetingStats,
+) -> Snapshot:
+    """Compile configuration rows into a snapshot whose targeting lists are ``lists``."""
+    overrides = {(fe.flag_id, fe.environment_id): fe for fe in rows.overrides}
+    rules_by_scope: dict[tuple[str, str], list[CompiledRule]] = defaultdict(list)
+    for rule in rows.rules:
+        conditions = tuple(Predicate(**c) for c in json.loads(rule.conditions))
+        rules_by_scope[(rule.flag_id, rule.environment_id)].append(
+            CompiledRule(
+                id=rule.id,
+                priority=rule.priority,
+                variant=rule.variant,
+                matchers=tuple(compile_predicate(p) for p in conditions),
+                conditions=conditions,
+            )
+        )
+
+    envs = rows.environments
+    configs: dict[tuple[str, str], FlagConfig] = {}
+    fallbacks: dict[str, FlagConfig] = {}
+    for flag in rows.flags:
+        base = FlagConfig(
+            flag_key=flag.key,
+            disabled=flag.archived or not flag.enabled,
+            archived=flag.archived,
+            targeted_deny=lists.get((flag.id, None, DENY), EMPTY),
+            targeted_allow=lists.get((flag.id, None, ALLOW), EMPTY),
+            rollout_percentage=flag.rollout_percentage,
+            default_variant=flag.default_variant,
+            rollout_threshold=_threshold(flag.rollout_percentage),
+        )
+        fallbacks[flag.key] = base
+        for env in envs:
+            rules_for_env = tuple(rules_by_scope.get((flag.id, env.id), ()))
+            rule_index = RuleIndex(rules_for_env) if rules_for_env else None
+            flag_env = overrides.get((flag.id, env.id))
+            if flag_env is None:
+                config = FlagConfig(
+                    flag_key=flag.key,
+                    disabled=base.disabled,
+                    archived=flag.archived,
+                    targeted_deny=base.targeted_deny,
+                    targeted_allow=base.targeted_allow,
+                    rollout_percentage=base.rollout_percentage,
+                    default_variant=base.default_variant,
+                    rules=rules_for_env,
+                    rule_index=rule_index,
+                    rollout_threshold=base.rollout_threshold,
+                    bucketer=_bucketer(flag.key, env.key, base.rollout_percentage),
+                )
+            else:
+                rollout = (
+                    flag_env.rollout_percentage
+                    if flag_env.rollout_percentage is not None
+                    else base.rollout_percentage
+                )
+                config = FlagConfig(
+                    flag_key=flag.key,
+                    disabled=base.disabled or not flag_env.enabled,
+                    archived=flag.archived,
+                    targeted_deny=lists.get((flag.id, env.id, DENY), EMPTY),
+                    targeted_allow=lists.get((flag.id, env.id, ALLOW), EMPTY),
+                    rollout_percentage=rollout,
+                    default_variant=flag_env.default_variant,
+                    rules=rules_for_env,
+                    rule_index=rule_index,
+                    rollout_threshold=_threshold(rollout),
+                    bucketer=_bucketer(flag.key, env.key, rollout),
+                )
+            configs[(flag.key, env.key)] = config
+    # "" collects the fallback configs, used for environments that do not exist.
+    by_env: dict[str, list[FlagConfig]] = {"": [], **{env.key: [] for env in envs}}
+    for config in fallbacks.values():
+        if not config.archived:
+            by_env[""].append(config)
+    for (_flag_key, env_key), config in configs.items():
+        if not config.archived:
+            by_env[env_key].append(config)
+    return Snapshot(
+        version=version,
+        configs=configs,
+        fallbacks=fallbacks,
+        by_env={
+            key: tuple(sorted(flags, key=lambda c: c.flag_key)) for key, flags in by_env.items()
+        },
+        targeting=targeting,
+    )
+
+
+# ── Process-wide cache ─────────────────────────────────────────────
+
+_version_lock = threading.Lock()
+_build_lock = threading.Lock()
+# Async handlers must not block the event loop on _build_lock while another
+# coroutine is awaiting the database, so they serialize rebuilds on this.
+_async_build_lock = asyncio.Lock()
+# Latest change-log version seen, and when the change log was last checked.
+_config_version = 0
+_checked_at = -math.inf
+# Bumped by mark_config_changed, so a poll that overlaps it does not push the
+# next check back out.
+_marks = 0
+_snapshot: Snapshot | None = None
+# The shared snapshot file, once SHARED_SNAPSHOT_DIR has been looked up.
+_shared: SharedSnapshotFile | None = None
+_shared_resolved = False
+# Shared snapshot files published before this process started may predate
+# changes made without the change log (migrations), so they are rebuilt once.
+_started_at = time.time()
+
+
+def _shared_file() -> SharedSnapshotFile | None:
+    global _shared, _shared_resolved  # noqa: PLW0603
+    if not _shared_resolved:
+        with _version_lock:
+            if not _shared_resolved:
+                directory = get_settings().shared_snapshot_dir
+                _shared = SharedSnapshotFile(Path(directory)) if directory else None
+                _shared_resolved = True
+    return _shared
+
+
+def get_config_version() -> int:
+    """Return the latest configuration version this process (or host) has seen."""
+    shared = _shared_file()
+    return _config_version if shared is None else shared.version()
+
+
+def _observe(version: int) -> int:
+    """Record a version read from the change log; return the latest one seen."""
+    global _config_version  # noqa: PLW0603
+    shared = _shared_file()
+    if shared is not None:
+        return shared.advance(version)
+    with _version_lock:
+        _config_version = max(_config_version, version)
+        return _config_version
+
+
+def _poll_due() -> bool:
+    interval: float = get_settings().config_poll_interval_seconds
+    return time.monotonic() - _checked_at >= interval
+
+
+def mark_config_changed() -> None:
+    """Check the change log on the next read; call after committing an admin write."""
+    global _checked_at, _marks  # noqa: PLW0603
+    with _version_lock:
+        _marks += 1
+        _checked_at = -math.inf
+
+
+def _is_current(snapshot: Snapshot) -> bool:
+    return not _poll_due() and snapshot.version == get_config_version()
+
+
+def load_shared_snapshot(db: Session, shared: SharedSnapshotFile, version: int) -> Snapshot:
+    """Compile the shared snapshot file, first rebuilding it if it is older than ``version``."""
+    mapped = shared.read()
+    if mapped is None or mapped.version < version or mapped.published_at < _started_at:
+        with shared.building():
+            mapped = shared.read()
+            if mapped is None or mapped.version < version or mapped.published_at < _started_at:
+                # Read the version before the rows, so the file is never
+                # labelled with a version newer than its contents.
+                current = shared.advance(latest_version(db))
+                rows = read_config(db)
+                mapped = shared.publish(current, rows.to_json(), rows.members)
+    return compile_snapshot(
+        ConfigRows.from_json(mapped.config),
+        version=mapped.version,
+        lists=mapped.lists,
+        targeting=mapped.stats,
+    )
+
+
+def _refresh(db: Session, snapshot: Snapshot | None) -> Snapshot:
+    """Poll the change log if due and rebuild ``snapshot`` if it is outdated."""
+    global _checked_at  # noqa: PLW0603
+    if _poll_due():
+        # Taken before the query: a write committed after it started may not
+        # be in the result, and its mark_config_changed must stand.
+        marks, started = _marks, time.monotonic()
+        version = _observe(latest_version(db))
+        with _version_lock:
+            if _marks == marks:
+                _checked_at = started
+    else:
+        version = get_config_version()
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    shared = _shared_file()
+    if shared is None:
+        return load_snapshot(db, version=version)
+    return load_shared_snapshot(db, shared, version)
+
+
+def get_snapshot(db: Session) -> Snapshot:
+    """Return the current snapshot, rebuilding it if the config version moved on."""
+    global _snapshot  # noqa: PLW0603
+    snapshot = _snapshot
+    if snapshot is not None and _is_current(snapshot):
+        return snapshot
+    with _build_lock:
+        _snapshot = _refresh(db, _snapshot)
+        return _snapshot
+
+
+async def get_snapshot_async(db: AsyncSession) -> Snapshot:
+    """Async :func:`get_snapshot`: rebuilds over the async session without blocking the loop."""
+    global _snapshot  # noqa: PLW0603
+    snapshot = _snapshot
+    if snapshot is not None and _is_current(snapshot):
+        return snapshot
+    async with _async_build_lock:
+        _snapshot = await db.run_sync(_refresh, _snapshot)
+        return _snapshot
+
+
+def reset_snapshot() -> None:
+    """Drop the cached snapshot and version state (used in tests)."""
+    global _snapshot, _config_version, _checked_at, _async_build_lock, _shared, _shared_resolved  # noqa: PLW0603
+    with _build_lock, _version_lock:
+        _snapshot = None
+        _config_version = 0
+        _checked_at = -math.inf
+        _async_build_lock = asyncio.Lock()
+        if _shared is not None:
+            _shared.close()
+        _shared = None
+        _shared_resolved = False
@@ -0,0 +1,67 @@
+"""Helpers for consuming line-delimited request bodies in chunks."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from fastapi.responses import StreamingResponse
+
+if TYPE_CHECKING:
+    from starlette.types import Receive, Scope, Send
+
+
+class LineSplitter:
+    """Splits a stream of byte blocks into stripped, non-empty lines.
+
+    With ``max_line_length``, a line longer than that many bytes raises
+    ``ValueError`` as soon as it is seen, so a body without newlines is never
+    buffered whole.
+    """
+
+    def __init__(self, max_line_length: int | None = None) -> None:
+        self._pending: list[bytes] = []
+        self._pending_size = 0
+        self._max_line_length = max_line_length
+
+    def push(self, block: bytes) -> list[bytes]:
+        if b"\n" not in block:
+            self._hold(block)
+            return []
+        first, *rest = block.split(b"\n")
+        last = rest.pop()
+        lines = [b"".join([*self._pending, first]) if self._pending else first, *rest]
+        self._pending = []
+        self._pending_size = 0
+        if self._max_line_length is not None:
+            self._check(max(map(len, lines)))
+        self._hold(last)
+        return [line for line in (raw.strip() for raw in lines) if line]
+
+    def finish(self) -> list[bytes]:
+        line = b"".join(self._pending).strip()
+        self._pending = []
+        self._pending_size = 0
+        return [line] if line else []
+
+    def _hold(self, piece: bytes) -> None:
+        if piece:
+            self._pending.append(piece)
+            self._pending_size += len(piece)
+            self._check(self._pending_size)
+
+    def _check(self, size: int) -> None:
+        if self._max_line_length is not None and size > self._max_line_length:
+            raise ValueError(f"line longer than {self._max_line_length} bytes")
+
+
+class NDJSONResponse(StreamingResponse):
+    """Streams NDJSON lines while the request body is still being read.
+
+    Starlette's disconnect listener would consume request body messages, so it
+    is not started; reading the body already raises if the client goes away.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
@@ -0,0 +1,435 @@
+"""Targeting allow/deny list membership.
+
+Targeting lists are stored one user ID per :class:`TargetingEntry` row, so
+admin edits add or delete only the IDs that change, and membership checks
+against the database are indexed point lookups. Evaluation does not query
+them: each snapshot build loads every list once into hashed sets, so
+deny/allow checks are O(1) regardless of list size. Identical lists (for
+example a flag-level list shared by every environment without an override)
+are held only once.
+"""
+
+from __future__ import annotations
+
+import datetime
+import sys
+import uuid
+from csv import reader as csv_reader
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, cast
+
+from sqlalchemy import bindparam, delete, func, insert, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.core.changes import FLAG, record_change
+from app.models.models import Flag, TargetingEntry, TargetingUpload
+
+if TYPE_CHECKING:
+    from collections.abc import Collection, Iterable, Iterator, Sequence
+
+    from sqlalchemy import ColumnElement, Table
+    from sqlalchemy.orm import Session
+    from sqlalchemy.sql import Executable
+
+ALLOW = "allow"
+DENY = "deny"
+
+# Bulk upload modes.
+ADD = "add"
+REMOVE = "remove"
+REPLACE = "replace"
+
+MAX_USER_ID_LENGTH = 255
+# Longest upload line buffered while waiting for its newline: a user ID of
+# up to four UTF-8 bytes per character plus room for the other CSV columns.
+MAX_UPLOAD_LINE_BYTES = 4 * MAX_USER_ID_LENGTH + 16 * 1024
+
+# Flag responses carry at most this many IDs of each flag-level list: the
+# first page of GET /flags/{id}/targeting/{kind}.
+FLAG_LIST_PREVIEW = 1000
+
+# A list is identified by (flag_id, environment_id or None for flag-level, kind).
+ListKey = tuple[str, str | None, str]
+
+# Core tables for bulk statements; the ORM bulk path costs more per row.
+_ENTRIES = cast("Table", TargetingEntry.__table__)
+_UPLOADS = cast("Table", TargetingUpload.__table__)
+
+# Keeps IN (...) lists well below the database's bound-parameter limit.
+_CHUNK_SIZE = 500
+
+
+class TargetingList:
+    """Immutable set of user IDs with O(1) membership checks."""
+
+    __slots__ = ("_members",)
+
+    def __init__(self, user_ids: Iterable[str] = ()) -> None:
+        self._members = frozenset(user_ids)
+
+    def __contains__(self, user_id: object) -> bool:
+        return user_id in self._members
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._members)
+
+    def __repr__(self) -> str:
+        return f"TargetingList({len(self._members)} ids)"
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the set and its ID strings."""
+        return sys.getsizeof(self._members) + sum(sys.getsizeof(m) for m in self._members)
+
+
+EMPTY = TargetingList()
+
+
+class TargetingStore:
+    """Builds membership sets for a snapshot, sharing one set per distinct list."""
+
+    def __init__(self) -> None:
+        self._lists: dict[frozenset[str], TargetingList] = {}
+
+    def get(self, user_ids: Iterable[str]) -> TargetingList:
+        """Return the membership set for a list of user IDs."""
+        members = frozenset(user_ids)
+        if not members:
+            return EMPTY
+        cached = self._lists.get(members)
+        if cached is None:
+            cached = TargetingList(members)
+            self._lists[members] = cached
+        return cached
+
+    def stats(self) -> TargetingStats:
+        lists = [t for t in self._lists.values() if t is not EMPTY]
+        return TargetingStats(
+            lists=len(lists),
+            entries=sum(len(t) for t in lists),
+            largest=max((len(t) for t in lists), default=0),
+            memory_bytes=sum(t.memory_bytes() for t in lists),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class TargetingStats:
+    """Size of the distinct targeting lists held by a snapshot."""
+
+    lists: int
+    entries: int
+    largest: int
+    memory_bytes: int
+
+
+# ── Storage ────────────────────────────────────────────────────────
+
+
+def _scope(flag_id: str, environment_id: str | None, kind: str) -> tuple[ColumnElement[bool], ...]:
+    env = (
+        TargetingEntry.environment_id.is_(None)
+        if environment_id is None
+        else TargetingEntry.environment_id == environment_id
+    )
+    return TargetingEntry.flag_id == flag_id, env, TargetingEntry.kind == kind
+
+
+def _chunks(user_ids: Sequence[str]) -> Iterator[Sequence[str]]:
+    for start in range(0, len(user_ids), _CHUNK_SIZE):
+        yield user_ids[start : start + _CHUNK_SIZE]
+
+
+def _rows(
+    flag_id: str, environment_id: str | None, kind: str, user_ids: Iterable[str]
+) -> list[dict[str, str | None]]:
+    return [
+        {"flag_id": flag_id, "environment_id": environment_id, "kind": kind, "user_id": user_id}
+        for user_id in user_ids
+    ]
+
+
+def _insert(
+    db: Session, flag_id: str, environment_id: str | None, kind: str, user_ids: Iterable[str]
+) -> None:
+    rows = _rows(flag_id, environment_id, kind, user_ids)
+    if rows:
+        db.execute(insert(_ENTRIES), rows)
+
+
+def add_members(
+    db: Session, flag_id: str, environment_id: str | None, kind: str, user_ids: Iterable[str]
+) -> int:
+    """Add user IDs to a list, skipping those already on it; return how many were added."""
+    rows = _rows(flag_id, environment_id, kind, dict.fromkeys(user_ids))
+    if not rows:
+        return 0
+    # Where the dialect supports it, the unique indexes skip IDs already on the list.
+    stmt: Executable | None = None
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        stmt = sqlite.insert(_ENTRIES).on_conflict_do_nothing()
+    elif dialect == "postgresql":
+        stmt = postgresql.insert(_ENTRIES).on_conflict_do_nothing()
+    if stmt is not None:
+        return db.execute(stmt, rows).rowcount  # type: ignore[attr-defined, no-any-return]
+    scope = _scope(flag_id, environment_id, kind)
+    new: list[str] = []
+    for chunk in _chunks([str(row["user_id"]) for row in rows]):
+        present = set(
+            db.scalars(
+                select(TargetingEntry.user_id).where(*scope, TargetingEntry.user_id.in_(chunk))
+            )
+        )
+        new.extend(user_id for user_id in chunk if user_id not in present)
+    _insert(db, flag_id, environment_id, kind, new)
+    return len(new)
+
+
+def remove_members(
+    db: Session, flag_id: str, environment_id: str | None, kind: str, user_ids: Iterable[str]
+) -> int:
+    """Remove user IDs from a list; return how many were on it."""
+    params = [{"target": user_id} for user_id in dict.fromkeys(user_ids)]
+    if not params:
+        return 0
+    # One index lookup per ID, executed as a batch.
+    stmt = delete(_ENTRIES).where(
+        *_scope(flag_id, environment_id, kind), TargetingEntry.user_id == bindparam("target")
+    )
+    return db.execute(stmt, params).rowcount  # type: ignore[attr-defined, no-any-return]
+
+
+def replace_members(
+    db: Session, flag_id: str, environment_id: str | None, kind: str, user_ids: Iterable[str]
+) -> None:
+    """Make a list hold exactly ``user_ids``, writing only the difference.
+
+    The IDs are staged in ``targeting_uploads`` and diffed against the list in
+    SQL, so the current list is never loaded.
+    """
+    upload_id = str(uuid.uuid4())
+    rows = [{"upload_id": upload_id, "user_id": u} for u in dict.fromkeys(user_ids)]
+    if rows:
+        db.execute(insert(_UPLOADS), rows)
+    _swap_staged(db, flag_id, environment_id, kind, upload_id)
+
+
+def _swap_staged(
+    db: Session, flag_id: str, environment_id: str | None, kind: str, upload_id: str
+) -> tuple[int, int]:
+    """Replace a list with the IDs staged under ``upload_id``; return (added, removed).
+
+    Rows on both keep their IDs. The staged rows are deleted.
+    """
+    scope = _scope(flag_id, environment_id, kind)
+    staged = select(TargetingUpload.user_id).where(TargetingUpload.upload_id == upload_id)
+    removed = db.execute(
+        delete(TargetingEntry).where(*scope, TargetingEntry.user_id.not_in(staged))
+    )
+    current = select(TargetingEntry.user_id).where(*scope)
+    added = db.execute(
+        insert(TargetingEntry).from_select(
+            ["flag_id", "environment_id", "kind", "user_id"],
+            select(
+                literal(flag_id),
+                literal(environment_id),
+                literal(kind),
+                TargetingUpload.user_id,
+            )
+            .where(
+                TargetingUpload.upload_id == upload_id,
+                TargetingUpload.user_id.not_in(current),
+            )
+            .distinct(),
+        )
+    )
+    db.execute(delete(TargetingUpload).where(TargetingUpload.upload_id == upload_id))
+    return added.rowcount, removed.rowcount  # type: ignore[attr-defined]
+
+
+def is_member(
+    db: Session, flag_id: str, environment_id: str | None, kind: str, user_id: str
+) -> bool:
+    """Return whether a user ID is on a list (one index lookup)."""
+    stmt = select(TargetingEntry.id).where(
+        *_scope(flag_id, environment_id, kind), TargetingEntry.user_id == user_id
+    )
+    return db.execute(stmt).first() is not None
+
+
+def count_members(db: Session, flag_id: str, environment_id: str | None, kind: str) -> int:
+    """Return the number of user IDs on a list."""
+    stmt = select(func.count()).where(*_scope(flag_id, environment_id, kind))
+    return db.execute(stmt).scalar_one()
+
+
+def list_members(
+    db: Session,
+    flag_id: str,
+    environment_id: str | None,
+    kind: str,
+    *,
+    after: str | None = None,
+    limit: int,
+) -> list[str]:
+    """Return up to ``limit`` user IDs of a list in ID order, starting after ``after``."""
+    stmt = select(TargetingEntry.user_id).where(*_scope(flag_id, environment_id, kind))
+    if after is not None:
+        stmt = stmt.where(TargetingEntry.user_id > after)
+    return list(db.scalars(stmt.order_by(TargetingEntry.user_id).limit(limit)))
+
+
+@dataclass(frozen=True, slots=True)
+class FlagLevelList:
+    """The first IDs of a flag-level list, in user ID order, and its full size."""
+
+    user_ids: list[str]
+    size: int
+
+
+def flag_level_lists(
+    db: Session, flag_ids: Collection[str] | None = None, limit: int = FLAG_LIST_PREVIEW
+) -> dict[tuple[str, str], FlagLevelList]:
+    """Return the flag-level lists keyed by ``(flag_id, kind)``, at most ``limit`` IDs each.
+
+    ``flag_ids`` limits the result to those flags; ``None`` returns every flag.
+    Empty lists are absent. The sizes come from one grouped query and each
+    list's IDs from an index range scan, so long lists are never read in full.
+    """
+    stmt = (
+        select(TargetingEntry.flag_id, TargetingEntry.kind, func.count())
+        .where(TargetingEntry.environment_id.is_(None))
+        .group_by(TargetingEntry.flag_id, TargetingEntry.kind)
+    )
+    sizes: dict[tuple[str, str], int] = {}
+    if flag_ids is None:
+        batches: Iterable[Sequence[str] | None] = [None]
+    else:
+        batches = _chunks(list(flag_ids))
+    for batch in batches:
+        batch_stmt = stmt if batch is None else stmt.where(TargetingEntry.flag_id.in_(batch))
+        for flag_id, kind, size in db.execute(batch_stmt):
+            sizes[flag_id, kind] = size
+    return {
+        (flag_id, kind): FlagLevelList(list_members(db, flag_id, None, kind, limit=limit), size)
+        for (flag_id, kind), size in sizes.items()
+    }
+
+
+# ── Bulk upload ────────────────────────────────────────────────────
+
+
+class BulkUpload:
+    """Applies a stream of user IDs to one targeting list, chunk by chunk.
+
+    ``add`` and ``remove`` commit each chunk as it arrives. ``replace`` stages
+    the chunks in ``targeting_uploads`` and swaps the list in one transaction
+    in :meth:`finish`, so readers never see half a replacement. Memory is
+    bounded by the chunk size in every mode. Each transaction that changes
+    the list also logs the flag in the change feed. The caller marks the
+    config changed after a :meth:`feed` that returns ``True`` and after a
+    :meth:`finish` that leaves :attr:`changed` set.
+    """
+
+    def __init__(
+        self, db: Session, flag_id: str, environment_id: str | None, kind: str, mode: str
+    ) -> None:
+        if mode not in (ADD, REMOVE, REPLACE):
+            raise ValueError(f"unknown upload mode {mode!r}")
+        self._db = db
+        self._flag_id = flag_id
+        self._environment_id = environment_id
+        self._kind = kind
+        self._mode = mode
+        self._upload_id = str(uuid.uuid4())
+        self.received = 0
+        self.added = 0
+        self.removed = 0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.removed)
+
+    def feed(self, user_ids: Sequence[str]) -> bool:
+        """Apply one chunk of user IDs in its own transaction.
+
+        Returns whether the chunk changed the list, in which case the caller
+        bumps the config version: add and remove chunks are logged in the
+        change feed as they commit.
+        """
+        self.received += len(user_ids)
+        args = (self._db, self._flag_id, self._environment_id, self._kind, user_ids)
+        changed = 0
+        if self._mode == ADD:
+            changed = add_members(*args)
+            self.added += changed
+        elif self._mode == REMOVE:
+            changed = remove_members(*args)
+            self.removed += changed
+        else:
+            self._db.execute(
+                insert(_UPLOADS),
+                [{"upload_id": self._upload_id, "user_id": u} for u in dict.fromkeys(user_ids)],
+            )
+        if changed:
+            self._announce()
+        self._db.commit()
+        return bool(changed)
+
+    def finish(self) -> int:
+        """Complete the upload and return the size of the list."""
+        if self._mode == REPLACE:
+            self._swap()
+            if self.changed:
+                self._announce()
+        size = count_members(self._db, self._flag_id, self._environment_id, self._kind)
+        self._db.commit()
+        return size
+
+    def abort(self) -> None:
+        """Drop staged IDs; chunks already committed by add/remove stay applied."""
+        self._db.rollback()
+        self._db.execute(
+            delete(TargetingUpload).where(TargetingUpload.upload_id == self._upload_id)
+        )
+        self._db.commit()
+
+    def _swap(self) -> None:
+        added, removed = _swap_staged(
+            self._db, self._flag_id, self._environment_id, self._kind, self._upload_id
+        )
+        self.added += added
+        self.removed += removed
+
+    def _announce(self) -> None:
+        # Log the flag in the transaction that changes its list.
+        self._db.execute(
+            update(Flag)
+            .where(Flag.id == self._flag_id)
+            .values(updated_at=datetime.datetime.now(datetime.UTC))
+        )
+        record_change(self._db, FLAG, self._flag_id)
+
+
+def parse_user_ids(lines: Iterable[bytes], *, csv: bool = False) -> Iterator[str]:
+    """Decode upload lines into user IDs; with ``csv`` the first column is used.
+
+    CSV fields may be quoted, including ones containing commas, but not ones
+    spanning lines. Raises ``ValueError`` for lines that are not UTF-8 or IDs
+    that are too long.
+    """
+    for line in lines:
+        text = line.decode("utf-8")
+        if csv:
+            row = next(csv_reader([text], skipinitialspace=True), [])
+            text = row[0] if row else ""
+        user_id = text.strip()
+        if not user_id:
+            continue
+        if len(user_id) > MAX_USER_ID_LENGTH:
+            raise ValueError(
+                f"user ID longer than {MAX_USER_ID_LENGTH} characters: {user_id[:32]}..."
+            )
+        yield user_id
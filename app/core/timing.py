@@ -0,0 +1,214 @@
+"""Per-request phase timing: the ``Server-Timing`` header and the slow-evaluation log.
+
+With ``SERVER_TIMING`` enabled, or ``SLOW_EVALUATION_THRESHOLD_MS`` above
+zero, :class:`ServerTimingMiddleware` gives each request a
+:class:`RequestTiming` in a context variable. The auth dependencies and the
+evaluation handlers record their phases in it:
+
+- ``auth``: checking the API key;
+- ``parse``: everything between the request arriving and the handler starting
+  except ``auth``, i.e. reading, decoding and validating the JSON body, plus
+  routing and the hop to a worker thread for sync handlers;
+- ``db``: getting the configuration snapshot, which only queries the database
+  when it has to be rebuilt or the change log is polled;
+- ``match``: evaluating the flags and building the results;
+- ``serialize``: from the end of the handler until the response headers are
+  sent, i.e. validating and encoding the response;
+- ``total``: the whole request up to the response headers.
+
+Requests that evaluate flags and take at least the threshold are logged with
+the breakdown and the rule count and targeting list sizes of each flag.
+Streaming evaluation is not broken down, since its headers go out before the
+first line is evaluated.
+"""
+
+from __future__ import annotations
+
+import logging
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+from starlette.datastructures import MutableHeaders
+
+from app.core.config import get_settings
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from contextlib import AbstractContextManager
+
+    from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+    from app.core.snapshot import Snapshot
+
+logger = logging.getLogger(__name__)
+
+# At most this many flags are described in one slow-evaluation log record.
+SLOW_LOG_MAX_FLAGS = 20
+
+
+class RequestTiming:
+    """Phase durations of one request."""
+
+    __slots__ = (
+        "_handler_finished",
+        "_handler_started",
+        "evaluations",
+        "phases",
+        "snapshot",
+        "started",
+    )
+
+    def __init__(self) -> None:
+        self.started = perf_counter()
+        self.phases: dict[str, float] = {}
+        self._handler_started: float | None = None
+        self._handler_finished: float | None = None
+        self.snapshot: Snapshot | None = None
+        self.evaluations: Iterable[tuple[str, str]] = ()
+
+    def record(self, name: str, seconds: float) -> None:
+        """Add ``seconds`` to a phase measured outside the handler."""
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a phase of the handler."""
+        start = perf_counter()
+        if self._handler_started is None:
+            self._handler_started = start
+        try:
+            yield
+        finally:
+            end = perf_counter()
+            self.phases[name] = self.phases.get(name, 0.0) + end - start
+            self._handler_finished = end
+
+    def breakdown(self) -> dict[str, float]:
+        """Return the phase durations so far in milliseconds, in request order."""
+        now = perf_counter()
+        seconds: dict[str, float] = {}
+        if "auth" in self.phases:
+            seconds["auth"] = self.phases["auth"]
+        if self._handler_started is not None:
+            auth = self.phases.get("auth", 0.0)
+            seconds["parse"] = max(0.0, self._handler_started - self.started - auth)
+        seconds.update((name, value) for name, value in self.phases.items() if name != "auth")
+        if self._handler_finished is not None:
+            seconds["serialize"] = now - self._handler_finished
+        seconds["total"] = now - self.started
+        return {name: value * 1000 for name, value in seconds.items()}
+
+
+_current: ContextVar[RequestTiming | None] = ContextVar("request_timing", default=None)
+
+
+def current_timing() -> RequestTiming | None:
+    """Return the timing of the current request, or ``None`` when timing is off."""
+    return _current.get()
+
+
+def phase(name: str) -> AbstractContextManager[None]:
+    """Time a handler phase of the current request, if it is being timed."""
+    timing = _current.get()
+    return nullcontext() if timing is None else timing.phase(name)
+
+
+def record_phase(name: str, seconds: float) -> None:
+    """Add to a phase of the current request measured outside the handler."""
+    timing = _current.get()
+    if timing is not None:
+        timing.record(name, seconds)
+
+
+def record_evaluations(snapshot: Snapshot, evaluations: Iterable[tuple[str, str]]) -> None:
+    """Note the ``(flag_key, env_key)`` pairs a request evaluates, for the slow log.
+
+    ``evaluations`` is only iterated if the request turns out to be slow.
+    """
+    timing = _current.get()
+    if timing is not None:
+        timing.snapshot = snapshot
+        timing.evaluations = evaluations
+
+
+def server_timing_header(breakdown: dict[str, float]) -> str:
+    return ", ".join(f"{name};dur={value:.3f}" for name, value in breakdown.items())
+
+
+def describe_flags(
+    snapshot: Snapshot, evaluations: Iterable[tuple[str, str]], limit: int
+) -> list[dict[str, str | int]]:
+    """Return the rule count and targeting list sizes of up to ``limit`` evaluated flags."""
+    described: dict[tuple[str, str], dict[str, str | int]] = {}
+    for flag_key, env_key in evaluations:
+        if (flag_key, env_key) in described:
+            continue
+        if len(described) == limit:
+            break
+        config = snapshot.lookup(flag_key, env_key)
+        described[flag_key, env_key] = {
+            "flag": flag_key,
+            "env": env_key,
+            "rules": len(config.rules) if config else 0,
+            "allow": len(config.targeted_allow) if config else 0,
+            "deny": len(config.targeted_deny) if config else 0,
+        }
+    return list(described.values())
+
+
+def _log_slow_evaluation(scope: Scope, timing: RequestTiming, breakdown: dict[str, float]) -> None:
+    if timing.snapshot is None:
+        return
+    flags = describe_flags(timing.snapshot, timing.evaluations, SLOW_LOG_MAX_FLAGS)
+    logger.warning(
+        "Slow evaluation: %s %s took %.1f ms (%s); flags: %s",
+        scope["method"],
+        scope["path"],
+        breakdown["total"],
+        " ".join(f"{name}={value:.3f}" for name, value in breakdown.items() if name != "total"),
+        "; ".join(
+            f"{f['flag']}@{f['env']} rules={f['rules']} allow={f['allow']} deny={f['deny']}"
+            for f in flags
+        ),
+        extra={"server_timing": breakdown, "flags": flags},
+    )
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware timing request phases when enabled in the settings."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        settings = get_settings()
+        add_header = settings.server_timing
+        threshold = settings.slow_evaluation_threshold_ms
+        if not add_header and threshold <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        breakdown: dict[str, float] | None = None
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal breakdown
+            if message["type"] == "http.response.start":
+                breakdown = timing.breakdown()
+                if add_header:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", server_timing_header(breakdown))
+            await send(message)
+
+        token = _current.set(timing)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+        if breakdown is not None and 0 < threshold <= breakdown["total"]:
+            _log_slow_evaluation(scope, timing, breakdown)
@@ -7,8 +7,12 @@ from typing import TYPE_CHECKING
 
 from fastapi import FastAPI
 
+from app.api.v1.router import async_router as async_v1_router
 from app.api.v1.router import router as v1_router
-from app.core.database import get_engine
+from app.core.config import get_settings
+from app.core.database import dispose_async_engine, get_engine
+from app.core.metrics import EVALUATION_SAMPLER, RequestMetricsMiddleware, install_query_metrics
+from app.core.timing import ServerTimingMiddleware
 from app.models.models import Base
 
 if TYPE_CHECKING:
@@ -20,17 +24,27 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """Create database tables on startup if they don't exist."""
     Base.metadata.create_all(bind=get_engine())
     yield
+    await dispose_async_engine()
 
 
-def create_app(*, run_startup: bool = True) -> FastAPI:
-    """Create and configure the FastAPI application."""
+def create_app(*, run_startup: bool = True, async_database: bool | None = None) -> FastAPI:
+    """Create and configure the FastAPI application.
+
+    ``async_database`` defaults to the ``ASYNC_DATABASE`` setting.
+    """
+    if async_database is None:
+        async_database = get_settings().async_database
     app = FastAPI(
         title="Feature Flag Service",
         description="A minimal but serious feature flag platform",
         version="0.1.0",
         lifespan=lifespan if run_startup else None,
     )
-    app.include_router(v1_router)
+    app.include_router(async_v1_router if async_database else v1_router)
+    app.add_middleware(ServerTimingMiddleware)
+    app.add_middleware(RequestMetricsMiddleware)
+    install_query_metrics()
+    EVALUATION_SAMPLER.configure(get_settings().evaluation_timing_sample)
     return app
 
 
@@ -10,10 +10,12 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
     UniqueConstraint,
+    text,
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -33,10 +35,8 @@ class Flag(Base):
     archived: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
     default_variant: Mapped[str] = mapped_column(String(100), nullable=False, default="off")
     rollout_percentage: Mapped[float | None] = mapped_column(Float, nullable=True, default=None)
-    targeted_allow: Mapped[str] = mapped_column(Text, nullable=False, default="[]")
-    targeted_deny: Mapped[str] = mapped_column(Text, nullable=False, default="[]")
     created_at: Mapped[datetime.datetime] = mapped_column(
-        DateTime, nullable=False, default=lambda: datetime.datetime.now(datetime.UTC)
+        DateTime, nullable=False, default=lambda: datetime.datetime.now(datetime.UTC), index=True
     )
     updated_at: Mapped[datetime.datetime] = mapped_column(
         DateTime,
@@ -61,7 +61,7 @@ class Environment(Base):
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     description: Mapped[str] = mapped_column(Text, nullable=False, default="")
     created_at: Mapped[datetime.datetime] = mapped_column(
-        DateTime, nullable=False, default=lambda: datetime.datetime.now(datetime.UTC)
+        DateTime, nullable=False, default=lambda: datetime.datetime.now(datetime.UTC), index=True
     )
 
     flag_environments: Mapped[list[FlagEnvironment]] = relationship(
@@ -70,10 +70,18 @@ class Environment(Base):
 
 
 class FlagEnvironment(Base):
-    """Per-environment overrides for a flag (enabled state, rollout, targeting)."""
+    """Per-environment overrides for a flag (enabled state, rollout, targeting).
+
+    The override's targeting lists are the :class:`TargetingEntry` rows of
+    the same flag and environment.
+    """
 
     __tablename__ = "flag_environments"
-    __table_args__ = (UniqueConstraint("flag_id", "environment_id", name="uq_flag_env"),)
+    __table_args__ = (
+        UniqueConstraint("flag_id", "environment_id", name="uq_flag_env"),
+        # uq_flag_env covers lookups by flag; this one serves environment deletes.
+        Index("ix_flag_environments_environment_id", "environment_id"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     flag_id: Mapped[str] = mapped_column(
@@ -84,8 +92,6 @@ class FlagEnvironment(Base):
     )
     enabled: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
     rollout_percentage: Mapped[float | None] = mapped_column(Float, nullable=True, default=None)
-    targeted_allow: Mapped[str] = mapped_column(Text, nullable=False, default="[]")
-    targeted_deny: Mapped[str] = mapped_column(Text, nullable=False, default="[]")
     default_variant: Mapped[str] = mapped_column(String(100), nullable=False, default="off")
 
     flag: Mapped[Flag] = relationship("Flag", back_populates="flag_environments")
@@ -98,6 +104,11 @@ class Rule(Base):
     __tablename__ = "rules"
     __table_args__ = (
         UniqueConstraint("flag_id", "environment_id", "priority", name="uq_rule_priority"),
+        # The per-scope rule lookup: enabled rules of one flag in one environment,
+        # by priority, without visiting disabled rows.
+        Index("ix_rules_scope_enabled", "flag_id", "environment_id", "enabled", "priority"),
+        # GET /rules?env=... and environment deletes.
+        Index("ix_rules_environment_priority", "environment_id", "priority"),
     )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -116,3 +127,75 @@ class Rule(Base):
     )
 
     flag: Mapped[Flag] = relationship("Flag", back_populates="rules")
+
+
+class TargetingEntry(Base):
+    """One user ID on a flag's targeted allow or deny list.
+
+    ``environment_id`` is NULL for the flag-level lists. Rows for an
+    environment are that environment's override lists and only apply when a
+    :class:`FlagEnvironment` row exists; like the override's other fields,
+    they replace the flag-level lists there.
+    """
+
+    __tablename__ = "targeting_entries"
+    __table_args__ = (
+        # Point lookups and keyset pagination of one list, and flag deletes.
+        # NULLs are distinct here, hence the partial index for flag-level rows.
+        Index("uq_targeting_entry", "flag_id", "environment_id", "kind", "user_id", unique=True),
+        Index(
+            "uq_targeting_flag_level",
+            "flag_id",
+            "kind",
+            "user_id",
+            unique=True,
+            sqlite_where=text("environment_id IS NULL"),
+            postgresql_where=text("environment_id IS NULL"),
+        ),
+        Index("ix_targeting_entries_environment_id", "environment_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    flag_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("flags.id", ondelete="CASCADE"), nullable=False
+    )
+    environment_id: Mapped[str | None] = mapped_column(
+        String(36), ForeignKey("environments.id", ondelete="CASCADE"), nullable=True
+    )
+    # "allow" or "deny".
+    kind: Mapped[str] = mapped_column(String(8), nullable=False)
+    user_id: Mapped[str] = mapped_column(String(255), nullable=False)
+
+
+class TargetingUpload(Base):
+    """User IDs staged by a replace-mode bulk upload until it completes.
+
+    Rows are deleted when the upload finishes or fails; duplicates are
+    allowed here and collapse when the list is swapped.
+    """
+
+    __tablename__ = "targeting_uploads"
+    __table_args__ = (Index("ix_targeting_uploads_upload_user", "upload_id", "user_id"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    upload_id: Mapped[str] = mapped_column(String(36), nullable=False)
+    user_id: Mapped[str] = mapped_column(String(255), nullable=False)
+
+
+class ConfigChange(Base):
+    """Append-only log of configuration writes, ordered by ``version``.
+
+    Every admin write adds one row per affected entity in the same transaction,
+    so ``version`` is a monotonically increasing configuration version.
+    """
+
+    __tablename__ = "config_changes"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    version: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    entity_type: Mapped[str] = mapped_column(String(32), nullable=False)
+    entity_id: Mapped[str] = mapped_column(String(36), nullable=False)
+    action: Mapped[str] = mapped_column(String(16), nullable=False)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime, nullable=False, default=lambda: datetime.datetime.now(datetime.UTC)
+    )
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import datetime
 import uuid
+from typing import Any
 
 from pydantic import BaseModel, Field
 
@@ -41,14 +42,43 @@ class FlagResponse(BaseModel):
     archived: bool
     default_variant: str
     rollout_percentage: float | None
+    # The first FLAG_LIST_PREVIEW IDs of each list in user ID order; the counts
+    # are the full sizes. Page through longer lists with GET /flags/{id}/targeting/{kind}.
     targeted_allow: list[str]
     targeted_deny: list[str]
+    targeted_allow_count: int
+    targeted_deny_count: int
     created_at: datetime.datetime
     updated_at: datetime.datetime
 
     model_config = {"from_attributes": True}
 
 
+# ── Targeting ──────────────────────────────────────────────────────
+
+
+class TargetingPatch(BaseModel):
+    add: list[str] = Field(default_factory=list)
+    remove: list[str] = Field(default_factory=list)
+
+
+class TargetingPatchResponse(BaseModel):
+    added: int
+    removed: int
+    size: int
+
+
+class TargetingPage(BaseModel):
+    user_ids: list[str]
+    # Pass as ``after`` to fetch the next page; null on the last page.
+    next_after: str | None
+
+
+class TargetingMembership(BaseModel):
+    user_id: str
+    member: bool
+
+
 # ── Environments ───────────────────────────────────────────────────
 
 
@@ -118,6 +148,12 @@ class BulkEvalRequest(BaseModel):
     evaluations: list[EvalRequest]
 
 
+class EvalAllRequest(BaseModel):
+    env_key: str = "production"
+    user_id: str
+    attributes: dict[str, str | int | float | bool | list[str]] = Field(default_factory=dict)
+
+
 class EvalResponse(BaseModel):
     flag_key: str
     env_key: str
@@ -135,6 +171,108 @@ class BulkEvalResponse(BaseModel):
     results: list[EvalResponse]
 
 
+class EvalStreamError(BaseModel):
+    """An NDJSON stream line that could not be parsed as an evaluation request."""
+
+    index: int
+    detail: list[dict[str, Any]]
+
+
+# ── Snapshot export ────────────────────────────────────────────────
+
+
+class ExportedRule(BaseModel):
+    id: str
+    priority: int
+    variant: str
+    conditions: list[Predicate]
+
+
+class ExportedFlag(BaseModel):
+    enabled: bool
+    default_variant: str
+    rollout_percentage: float | None
+    targeted_allow: list[str]
+    targeted_deny: list[str]
+    rules: list[ExportedRule]
+
+
+class SnapshotExport(BaseModel):
+    env_key: str
+    flags: dict[str, ExportedFlag]
+
+
+# ── Changes ────────────────────────────────────────────────────────
+
+
+class ConfigChangeEntry(BaseModel):
+    version: int
+    entity_type: str
+    entity_id: str
+    action: str
+    entity: FlagResponse | EnvironmentResponse | RuleResponse | None = None
+
+
+class ChangesResponse(BaseModel):
+    version: int
+    changes: list[ConfigChangeEntry]
+
+
+# ── Stats ──────────────────────────────────────────────────────────
+
+
+class TargetingStatsResponse(BaseModel):
+    config_version: int
+    lists: int
+    entries: int
+    largest: int
+    memory_bytes: int
+
+
+class CacheStatsResponse(BaseModel):
+    enabled: bool
+    size: int = 0
+    max_size: int = 0
+    ttl_seconds: float = 0.0
+    hits: int = 0
+    misses: int = 0
+    hit_ratio: float = 0.0
+    evictions: int = 0
+    invalidations: int = 0
+
+
+class UnknownFlagCount(BaseModel):
+    flag_key: str
+    count: int
+
+
+class UnknownFlagStatsResponse(BaseModel):
+    config_version: int
+    total: int
+    untracked: int
+    keys: list[UnknownFlagCount]
+
+
+# ── Simulation ─────────────────────────────────────────────────────
+
+
+class RolloutSimulationResponse(BaseModel):
+    flag_key: str
+    env_key: str
+    config_version: int
+    current_percentage: float | None
+    proposed_percentage: float
+    total: int
+    targeted: int
+    enabled_before: int
+    enabled_after: int
+    turned_on: int
+    turned_off: int
+    changed: list[str]
+    changed_truncated: bool
+    histogram: list[int]
+
+
 # ── Health ─────────────────────────────────────────────────────────
 
 
@@ -0,0 +1,4 @@
+"""Benchmarks for the evaluation engine and admin endpoints.
+
+Run with ``python -m benchmarks.run``; see :mod:`benchmarks.run`.
+"""
@@ -0,0 +1,399 @@
+"""Run the benchmark suite and compare the results against a stored baseline.
+
+Builds a synthetic configuration (see :mod:`benchmarks.synthetic`) in a fresh
+SQLite file and times:
+
+- ``evaluate_flag``: one evaluation against the warm snapshot;
+- ``evaluate_bulk_100``: a bulk evaluation of 100 requests;
+- ``evaluate_all``: every flag of one environment for one user;
+- ``snapshot_build``: compiling the snapshot from the database;
+- ``admin_list_flags``, ``admin_list_environments``, ``admin_list_rules``: the
+  admin list endpoints, in-process through the ASGI app;
+- ``targeting_upload``: a replace-mode bulk upload of ``targeting_list_size``
+  user IDs, alternating between two disjoint lists so every upload rewrites
+  the whole list.
+
+Each benchmark runs ``--repeat`` rounds of enough calls to take about
+``--min-time`` seconds, and reports the median and best time per call. The
+decision cache is off so that evaluation itself is measured.
+
+Results are written as JSON. With a baseline from an earlier run at the same
+scale, every benchmark whose median is more than ``--tolerance`` slower is
+reported as a regression and the exit status is 1. Baselines only compare
+like with like: record them on the machine that runs the comparison.
+
+Usage:
+    python -m benchmarks.run
+    python -m benchmarks.run --scale medium --output results.json --baseline base.json
+    python -m benchmarks.run --only evaluate_flag evaluate_bulk_100
+    python -m benchmarks.run --save-baseline
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, replace
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.core.cache import reset_decision_cache
+from app.core.config import reset_settings
+from app.core.database import get_engine, get_session_factory, reset_engine
+from app.core.evaluation import evaluate_all, evaluate_bulk, evaluate_flag
+from app.core.snapshot import get_snapshot, load_snapshot, reset_snapshot
+from app.main import create_app
+from app.models.models import Base, Flag
+from benchmarks.synthetic import SCALES, Scale, eval_requests, populate
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator, Mapping, Sequence
+
+    from sqlalchemy.orm import Session
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+ADMIN = {"X-API-Key": "benchmark-admin"}
+BULK_SIZE = 100
+# Distinct requests cycled through by the evaluation benchmarks.
+REQUEST_POOL = 10_000
+
+
+@dataclass(frozen=True)
+class Result:
+    """Timing of one benchmark, per call."""
+
+    iterations: int
+    median_us: float
+    min_us: float
+
+    @property
+    def ops_per_sec(self) -> float:
+        return 1e6 / self.median_us if self.median_us else 0.0
+
+    def to_json(self) -> dict[str, float]:
+        return {
+            "iterations": self.iterations,
+            "median_us": round(self.median_us, 3),
+            "min_us": round(self.min_us, 3),
+            "ops_per_sec": round(self.ops_per_sec, 1),
+        }
+
+
+class Comparison(NamedTuple):
+    name: str
+    baseline_us: float
+    current_us: float
+    regressed: bool
+
+    @property
+    def change(self) -> float:
+        """Relative change of the median; positive is slower."""
+        return self.current_us / self.baseline_us - 1
+
+
+def measure(fn: Callable[[], object], *, min_time: float, repeat: int) -> Result:
+    """Time ``fn`` over ``repeat`` rounds of at least ``min_time`` seconds each."""
+    fn()  # Warm-up, e.g. building the snapshot.
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    rounds = [elapsed]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append(time.perf_counter() - start)
+    per_call = [seconds / number * 1e6 for seconds in rounds]
+    return Result(
+        iterations=number * repeat, median_us=statistics.median(per_call), min_us=min(per_call)
+    )
+
+
+# ── Benchmarks ─────────────────────────────────────────────────────
+# Each factory does its setup and returns the call to time.
+
+
+@dataclass
+class Context:
+    scale: Scale
+    db: Session
+    client: TestClient
+
+
+def _evaluate_flag(ctx: Context) -> Callable[[], object]:
+    requests = itertools.cycle(eval_requests(ctx.scale, REQUEST_POOL))
+    return lambda: evaluate_flag(next(requests), ctx.db)
+
+
+def _evaluate_bulk(ctx: Context) -> Callable[[], object]:
+    pool = eval_requests(ctx.scale, REQUEST_POOL)
+    batches = itertools.cycle(
+        [pool[i : i + BULK_SIZE] for i in range(0, len(pool) - BULK_SIZE + 1, BULK_SIZE)]
+    )
+    return lambda: evaluate_bulk(next(batches), ctx.db)
+
+
+def _evaluate_all(ctx: Context) -> Callable[[], object]:
+    requests = itertools.cycle(eval_requests(ctx.scale, REQUEST_POOL))
+
+    def run() -> object:
+        req = next(requests)
+        return evaluate_all(req.env_key, req.user_id, req.attributes, ctx.db)
+
+    return run
+
+
+def _snapshot_build(ctx: Context) -> Callable[[], object]:
+    return lambda: load_snapshot(ctx.db)
+
+
+def _get(ctx: Context, url: str) -> Callable[[], object]:
+    def run() -> object:
+        resp = ctx.client.get(url, headers=ADMIN)
+        resp.raise_for_status()
+        return resp
+
+    return run
+
+
+def _list_rules(ctx: Context) -> Callable[[], object]:
+    flag_id = ctx.db.scalar(select(Flag.id).where(Flag.key == "flag-00000"))
+    return _get(ctx, f"/api/v1/rules?flag_id={flag_id}")
+
+
+def _targeting_upload(ctx: Context) -> Callable[[], object]:
+    flag_id = ctx.db.scalar(select(Flag.id).where(Flag.key == "flag-00001"))
+    size = ctx.scale.targeting_list_size
+    bodies = itertools.cycle(
+        [
+            "".join(f"{prefix}-{i}\n" for i in range(size)).encode()
+            for prefix in ("upload-a", "upload-b")
+        ]
+    )
+    url = f"/api/v1/flags/{flag_id}/targeting/allow/upload?mode=replace"
+
+    def run() -> object:
+        resp = ctx.client.post(url, content=next(bodies), headers=ADMIN)
+        resp.raise_for_status()
+        if '"done": true' not in resp.text.rsplit("\n", 2)[-2]:
+            raise RuntimeError(f"upload failed: {resp.text[-200:]}")
+        return resp
+
+    return run
+
+
+BENCHMARKS: dict[str, Callable[[Context], Callable[[], object]]] = {
+    "evaluate_flag": _evaluate_flag,
+    f"evaluate_bulk_{BULK_SIZE}": _evaluate_bulk,
+    "evaluate_all": _evaluate_all,
+    "snapshot_build": _snapshot_build,
+    "admin_list_flags": lambda ctx: _get(ctx, "/api/v1/flags"),
+    "admin_list_environments": lambda ctx: _get(ctx, "/api/v1/environments"),
+    "admin_list_rules": _list_rules,
+    "targeting_upload": _targeting_upload,
+}
+
+
+@contextmanager
+def _environ(values: Mapping[str, str]) -> Iterator[None]:
+    saved = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _reset() -> None:
+    reset_settings()
+    reset_engine()
+    reset_snapshot()
+    reset_decision_cache()
+
+
+def run_suite(
+    scale: Scale,
+    names: Sequence[str] = tuple(BENCHMARKS),
+    *,
+    min_time: float = 0.5,
+    repeat: int = 5,
+    progress: Callable[[str, Result], None] | None = None,
+) -> dict[str, Any]:
+    """Build the configuration for ``scale``, run the benchmarks and return the report."""
+    results: dict[str, Result] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = {
+            "DATABASE_URL": f"sqlite:///{tmp}/benchmark.db",
+            "ADMIN_API_KEY": ADMIN["X-API-Key"],
+            "ASYNC_DATABASE": "false",
+            "DECISION_CACHE_SIZE": "0",
+            "SERVER_TIMING": "false",
+            "SLOW_EVALUATION_THRESHOLD_MS": "0",
+        }
+        with _environ(settings):
+            _reset()
+            try:
+                Base.metadata.create_all(bind=get_engine())
+                with (
+                    get_session_factory()() as db,
+                    TestClient(create_app(run_startup=False)) as client,
+                ):
+                    populate(db, scale)
+                    get_snapshot(db)
+                    ctx = Context(scale=scale, db=db, client=client)
+                    for name in names:
+                        result = measure(BENCHMARKS[name](ctx), min_time=min_time, repeat=repeat)
+                        results[name] = result
+                        if progress is not None:
+                            progress(name, result)
+            finally:
+                _reset()
+    return {
+        "scale": asdict(scale),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created_at": datetime.now(UTC).isoformat(timespec="seconds"),
+        "results": {name: result.to_json() for name, result in results.items()},
+    }
+
+
+def compare(
+    report: Mapping[str, Any], baseline: Mapping[str, Any], tolerance: float
+) -> list[Comparison]:
+    """Compare the benchmarks present in both reports by median time per call.
+
+    Raises ``ValueError`` if the reports were made at different scales.
+    """
+    if report["scale"] != baseline["scale"]:
+        raise ValueError(
+            f"Baseline scale {baseline['scale']} does not match this run's {report['scale']}"
+        )
+    comparisons = []
+    for name, current in report["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+        before, after = previous["median_us"], current["median_us"]
+        comparisons.append(
+            Comparison(name, before, after, regressed=after > before * (1 + tolerance))
+        )
+    return comparisons
+
+
+# ── Command line ───────────────────────────────────────────────────
+
+
+def _parse_args(argv: Sequence[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Benchmark the evaluation engine and admin endpoints on synthetic data.",
+    )
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    for field in ("flags", "environments", "rules_per_flag", "targeting_list_size"):
+        parser.add_argument(f"--{field.replace('_', '-')}", type=int, help="override the scale")
+    parser.add_argument("--attribute-cardinality", type=int, help="override the scale")
+    parser.add_argument("--seed", type=int, help="override the scale")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), metavar="NAME")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds per round")
+    parser.add_argument("--repeat", type=int, default=5, help="rounds per benchmark")
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="allowed slowdown, e.g. 0.25 for 25%%"
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="write the report to --baseline"
+    )
+    args = parser.parse_args(argv)
+    if args.repeat < 1 or args.min_time <= 0:
+        parser.error("--repeat must be at least 1 and --min-time positive")
+    return args
+
+
+def _scale(args: argparse.Namespace) -> Scale:
+    overrides = {
+        field: getattr(args, field)
+        for field in (
+            "flags",
+            "environments",
+            "rules_per_flag",
+            "targeting_list_size",
+            "attribute_cardinality",
+            "seed",
+        )
+        if getattr(args, field) is not None
+    }
+    scale = SCALES[args.scale]
+    return replace(scale, name="custom", **overrides) if overrides else scale
+
+
+def _print_result(name: str, result: Result) -> None:
+    print(
+        f"{name:<26} {result.median_us:>12.2f} us/call  {result.ops_per_sec:>12.1f} calls/s",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = _parse_args(argv)
+    scale = _scale(args)
+    print(f"Scale: {asdict(scale)}", file=sys.stderr)
+    report = run_suite(
+        scale,
+        args.only or tuple(BENCHMARKS),
+        min_time=args.min_time,
+        repeat=args.repeat,
+        progress=_print_result,
+    )
+    text = json.dumps(report, indent=2) + "\n"
+    if args.output:
+        args.output.write_text(text)
+    else:
+        sys.stdout.write(text)
+    if args.save_baseline:
+        args.baseline.write_text(text)
+        print(f"Saved baseline to {args.baseline}", file=sys.stderr)
+        return 0
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; nothing to compare.", file=sys.stderr)
+        return 0
+    try:
+        comparisons = compare(report, json.loads(args.baseline.read_text()), args.tolerance)
+    except ValueError as exc:
+        print(f"Not compared: {exc}", file=sys.stderr)
+        return 0
+    for item in comparisons:
+        flag = "  REGRESSION" if item.regressed else ""
+        print(
+            f"{item.name:<26} {item.baseline_us:>12.2f} -> {item.current_us:>12.2f} us"
+            f"  {item.change:+7.1%}{flag}",
+            file=sys.stderr,
+        )
+    return 1 if any(item.regressed for item in comparisons) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
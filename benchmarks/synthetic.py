@@ -0,0 +1,210 @@
+"""Synthetic flag configurations and evaluation requests at a chosen scale.
+
+Everything is derived from ``Scale.seed``, so the same scale always produces
+the same database and the same request stream. Rows are bulk-inserted with
+executemany instead of going through the admin API, which would take minutes
+at the larger scales.
+
+Each flag gets ``rules_per_flag`` rules in every environment, built from
+``equals``, ``in_list`` and ``gt`` conditions over a fixed set of attributes
+that take ``attribute_cardinality`` distinct values. One flag in ten has a
+flag-level allow list of ``targeting_list_size`` users and a deny list a tenth
+of that size. Half the flags roll out to a percentage and one in five has an
+override in the first environment.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import uuid
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import insert
+
+from app.core.changes import FLAG, record_change
+from app.core.targeting import ALLOW, DENY
+from app.models.models import Environment, Flag, FlagEnvironment, Rule, TargetingEntry
+from app.schemas.schemas import EvalRequest
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+# String attributes take values "<name>-<n>"; "age" takes the integers below
+# the cardinality.
+STRING_ATTRIBUTES = ("country", "plan", "device", "segment")
+NUMBER_ATTRIBUTE = "age"
+# One flag in this many has targeting lists.
+TARGETED_FLAG_EVERY = 10
+_BATCH = 5_000
+
+
+@dataclass(frozen=True)
+class Scale:
+    """Size of a synthetic configuration."""
+
+    name: str
+    flags: int
+    environments: int
+    rules_per_flag: int
+    targeting_list_size: int
+    attribute_cardinality: int
+    seed: int = 0
+
+
+SCALES = {
+    scale.name: scale
+    for scale in (
+        Scale("tiny", flags=10, environments=2, rules_per_flag=2, targeting_list_size=20,
+              attribute_cardinality=5),
+        Scale("small", flags=100, environments=3, rules_per_flag=5, targeting_list_size=1_000,
+              attribute_cardinality=50),
+        Scale("medium", flags=1_000, environments=5, rules_per_flag=10,
+              targeting_list_size=10_000, attribute_cardinality=500),
+        Scale("large", flags=5_000, environments=5, rules_per_flag=25,
+              targeting_list_size=100_000, attribute_cardinality=5_000),
+    )
+}  # fmt: skip
+
+
+def flag_key(index: int) -> str:
+    return f"flag-{index:05d}"
+
+
+def env_key(index: int) -> str:
+    return f"env-{index}"
+
+
+def user_id(index: int) -> str:
+    return f"user-{index}"
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _value(rng: random.Random, attribute: str, cardinality: int) -> str | int:
+    number = rng.randrange(cardinality)
+    return number if attribute == NUMBER_ATTRIBUTE else f"{attribute}-{number}"
+
+
+def _condition(rng: random.Random, cardinality: int) -> dict[str, Any]:
+    kind = rng.random()
+    if kind < 0.2:
+        return {
+            "attribute": NUMBER_ATTRIBUTE,
+            "operator": "gt",
+            "value": rng.randrange(cardinality),
+        }
+    attribute = rng.choice(STRING_ATTRIBUTES)
+    if kind < 0.6:
+        return {
+            "attribute": attribute,
+            "operator": "equals",
+            "value": _value(rng, attribute, cardinality),
+        }
+    values = {_value(rng, attribute, cardinality) for _ in range(rng.randint(2, 8))}
+    return {"attribute": attribute, "operator": "in_list", "value": sorted(map(str, values))}
+
+
+def _insert(db: Session, model: type[Any], rows: list[dict[str, Any]]) -> None:
+    for start in range(0, len(rows), _BATCH):
+        db.execute(insert(model), rows[start : start + _BATCH])
+
+
+def populate(db: Session, scale: Scale) -> None:
+    """Fill an empty database with the configuration for ``scale`` and commit."""
+    rng = random.Random(scale.seed)
+    environments = [
+        {"id": _uuid(rng), "key": env_key(i), "name": f"Environment {i}"}
+        for i in range(scale.environments)
+    ]
+    flags: list[dict[str, Any]] = []
+    overrides: list[dict[str, Any]] = []
+    rules: list[dict[str, Any]] = []
+    entries: list[dict[str, Any]] = []
+    for i in range(scale.flags):
+        flag_id = _uuid(rng)
+        flags.append(
+            {
+                "id": flag_id,
+                "key": flag_key(i),
+                "name": f"Flag {i}",
+                "enabled": rng.random() < 0.9,
+                "default_variant": "on" if i % 2 else "off",
+                "rollout_percentage": rng.choice((10.0, 25.0, 50.0, 90.0)) if i % 2 else None,
+            }
+        )
+        if i % 5 == 0 and environments:
+            overrides.append(
+                {
+                    "id": _uuid(rng),
+                    "flag_id": flag_id,
+                    "environment_id": environments[0]["id"],
+                    "enabled": True,
+                    "rollout_percentage": 50.0,
+                    "default_variant": "on",
+                }
+            )
+        for environment in environments:
+            for priority in range(scale.rules_per_flag):
+                conditions = [
+                    _condition(rng, scale.attribute_cardinality) for _ in range(rng.randint(1, 2))
+                ]
+                rules.append(
+                    {
+                        "id": _uuid(rng),
+                        "flag_id": flag_id,
+                        "environment_id": environment["id"],
+                        "priority": priority,
+                        "conditions": json.dumps(conditions),
+                        "variant": f"variant-{priority % 3}",
+                    }
+                )
+        if i % TARGETED_FLAG_EVERY == 0:
+            size = scale.targeting_list_size
+            entries.extend(
+                {"flag_id": flag_id, "environment_id": None, "kind": ALLOW, "user_id": user_id(u)}
+                for u in range(size)
+            )
+            entries.extend(
+                {"flag_id": flag_id, "environment_id": None, "kind": DENY, "user_id": user_id(u)}
+                for u in range(size, size + size // 10)
+            )
+    _insert(db, Environment, environments)
+    _insert(db, Flag, flags)
+    _insert(db, FlagEnvironment, overrides)
+    _insert(db, Rule, rules)
+    _insert(db, TargetingEntry, entries)
+    # Give the configuration a version, as the admin API would.
+    record_change(db, FLAG, flags[0]["id"] if flags else "")
+    db.commit()
+
+
+def attributes(rng: random.Random, scale: Scale) -> dict[str, str | int | float | bool | list[str]]:
+    """Return a random value for every attribute the rules look at."""
+    values: dict[str, str | int | float | bool | list[str]] = {
+        name: f"{name}-{rng.randrange(scale.attribute_cardinality)}" for name in STRING_ATTRIBUTES
+    }
+    values[NUMBER_ATTRIBUTE] = rng.randrange(scale.attribute_cardinality)
+    return values
+
+
+def eval_requests(scale: Scale, count: int, *, seed: int = 1) -> list[EvalRequest]:
+    """Return ``count`` evaluation requests over the flags and environments of ``scale``.
+
+    User IDs are drawn from twice the targeting list size, so about half of the
+    requests for a targeted flag hit one of its lists.
+    """
+    rng = random.Random(seed)
+    users = max(2 * scale.targeting_list_size, 1_000)
+    return [
+        EvalRequest(
+            flag_key=flag_key(rng.randrange(scale.flags)),
+            env_key=env_key(rng.randrange(scale.environments)),
+            user_id=user_id(rng.randrange(users)),
+            attributes=attributes(rng, scale),
+        )
+        for _ in range(count)
+    ]
@@ -0,0 +1,10 @@
+"""Embeddable client that evaluates feature flags in-process.
+
+Standard library only: it does not import the service, FastAPI or
+SQLAlchemy, so it can be installed into any Python application.
+"""
+
+from featureflags.client import FlagClient, SnapshotError
+from featureflags.engine import Decision
+
+__all__ = ["Decision", "FlagClient", "SnapshotError"]
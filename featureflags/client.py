@@ -0,0 +1,206 @@
+"""In-process flag client.
+
+:class:`FlagClient` loads the exported configuration of one environment from
+the service (``GET /api/v1/snapshot``) or from a file holding that export,
+then evaluates flags locally without a network hop. A daemon thread refreshes
+the configuration in the background: against the service it sends the last
+ETag in ``If-None-Match``, so an unchanged configuration costs a 304; for a
+file it reloads when the file's size or modification time changes.
+
+Compiled configurations are swapped in by replacing a single dict reference,
+so evaluation never takes a lock. If a refresh fails the last good
+configuration stays in use and the error is kept in :attr:`last_error`.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import TYPE_CHECKING, Any
+
+from featureflags.engine import DISABLED, Decision, LocalFlag, compile_document
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+    from types import TracebackType
+
+SNAPSHOT_PATH = "/api/v1/snapshot"
+
+
+class SnapshotError(Exception):
+    """The configuration could not be loaded."""
+
+
+class FlagClient:
+    """Evaluates flags of one environment locally from an exported snapshot.
+
+    ``source`` is either the service's base URL (``http://`` or ``https://``)
+    or the path of a JSON file saved from the snapshot endpoint. The first
+    load happens in the constructor and raises :class:`SnapshotError` on
+    failure; pass ``refresh_interval=0`` to disable background refreshes.
+    """
+
+    def __init__(
+        self,
+        source: str | os.PathLike[str],
+        *,
+        env_key: str = "production",
+        api_key: str | None = None,
+        refresh_interval: float = 30.0,
+        timeout: float = 5.0,
+    ) -> None:
+        self.env_key = env_key
+        self.api_key = api_key
+        self.refresh_interval = refresh_interval
+        self.timeout = timeout
+        self.etag: str | None = None
+        self.config_version: int | None = None
+        self.last_error: Exception | None = None
+        self._flags: dict[str, LocalFlag] = {}
+        self._file_stamp: tuple[int, int] | None = None
+        text = os.fspath(source)
+        if text.startswith(("http://", "https://")):
+            query = urllib.parse.urlencode({"env_key": env_key})
+            self._url: str | None = f"{text.rstrip('/')}{SNAPSHOT_PATH}?{query}"
+            self._path: str | None = None
+        else:
+            self._url = None
+            self._path = text
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self.refresh()
+        if refresh_interval > 0:
+            self._thread = threading.Thread(
+                target=self._run, name="featureflags-refresh", daemon=True
+            )
+            self._thread.start()
+
+    # ── Evaluation ─────────────────────────────────────────────────
+
+    def evaluate(
+        self, flag_key: str, user_id: str, attributes: Mapping[str, object] | None = None
+    ) -> Decision:
+        """Evaluate one flag; unknown and archived flags are disabled."""
+        flag = self._flags.get(flag_key)
+        if flag is None:
+            return DISABLED
+        return flag.decide(user_id, attributes)
+
+    def is_enabled(
+        self, flag_key: str, user_id: str, attributes: Mapping[str, object] | None = None
+    ) -> bool:
+        return self.evaluate(flag_key, user_id, attributes).enabled
+
+    def variant(
+        self, flag_key: str, user_id: str, attributes: Mapping[str, object] | None = None
+    ) -> str:
+        return self.evaluate(flag_key, user_id, attributes).variant
+
+    @property
+    def flag_keys(self) -> frozenset[str]:
+        """Keys of the flags in the current configuration."""
+        return frozenset(self._flags)
+
+    # ── Loading ────────────────────────────────────────────────────
+
+    def load(self, document: Mapping[str, Any]) -> None:
+        """Compile and swap in an exported snapshot document."""
+        if document.get("env_key") != self.env_key:
+            raise SnapshotError(
+                f"snapshot is for environment {document.get('env_key')!r}, not {self.env_key!r}"
+            )
+        try:
+            self._flags = compile_document(document)
+        except (KeyError, TypeError, ValueError) as exc:
+            raise SnapshotError(f"malformed snapshot document: {exc!r}") from exc
+
+    def refresh(self) -> bool:
+        """Reload the configuration if it changed; return whether it did."""
+        try:
+            if self._url is not None:
+                changed = self._refresh_url(self._url)
+            else:
+                changed = self._refresh_file(self._path or "")
+        except SnapshotError as exc:
+            self.last_error = exc
+            raise
+        self.last_error = None
+        return changed
+
+    def _refresh_url(self, url: str) -> bool:
+        request = urllib.request.Request(url)
+        if self.api_key is not None:
+            request.add_header("X-API-Key", self.api_key)
+        if self.etag is not None:
+            request.add_header("If-None-Match", self.etag)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+                etag = response.headers.get("ETag")
+                version = response.headers.get("X-Config-Version")
+        except urllib.error.HTTPError as exc:
+            if exc.code == 304:
+                return False
+            raise SnapshotError(f"snapshot request failed with HTTP {exc.code}") from exc
+        except (urllib.error.URLError, OSError) as exc:
+            raise SnapshotError(f"snapshot request failed: {exc}") from exc
+        self.load(_parse(body))
+        self.etag = etag
+        self.config_version = int(version) if version and version.isdigit() else None
+        return True
+
+    def _refresh_file(self, path: str) -> bool:
+        try:
+            stat = os.stat(path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            if stamp == self._file_stamp:
+                return False
+            with open(path, "rb") as f:
+                body = f.read()
+        except OSError as exc:
+            raise SnapshotError(f"cannot read snapshot file: {exc}") from exc
+        self.load(_parse(body))
+        self._file_stamp = stamp
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            # On failure keep serving the last good configuration.
+            with contextlib.suppress(SnapshotError):
+                self.refresh()
+
+    # ── Lifecycle ──────────────────────────────────────────────────
+
+    def close(self) -> None:
+        """Stop the background refresh thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> FlagClient:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+def _parse(body: bytes) -> dict[str, Any]:
+    try:
+        document = json.loads(body)
+    except ValueError as exc:
+        raise SnapshotError(f"snapshot is not valid JSON: {exc}") from exc
+    if not isinstance(document, dict) or not isinstance(document.get("flags"), dict):
+        raise SnapshotError("snapshot document has no flags")
+    return document
@@ -0,0 +1,142 @@
+"""Local evaluation engine for the exported configuration.
+
+This is a dependency-free port of :func:`app.core.evaluation.decide`, working
+on the document served by ``GET /api/v1/snapshot``; conditions are compiled
+with the matchers in :mod:`featureflags.matchers`, which the server uses too.
+The conformance tests in ``tests/test_sdk.py`` run both engines over the same
+configuration, so any change to the server's evaluation order or bucketing
+must be mirrored here.
+
+Everything that does not depend on the user is resolved when a document is
+compiled: targeting lists become sets, rollout percentages become bucket
+thresholds with the ``"{flag_key}:{env_key}:"`` hash prefix pre-computed, and
+predicate constants are coerced once.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from featureflags.matchers import compile_condition
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from featureflags.matchers import Matcher
+
+BUCKETS = 10000
+
+
+class Decision(NamedTuple):
+    """Outcome of evaluating one flag for one user."""
+
+    enabled: bool
+    variant: str
+    reason: str
+    rule_id: str | None = None
+
+
+DISABLED = Decision(enabled=False, variant="off", reason="disabled")
+_TARGETED_DENY = Decision(enabled=False, variant="off", reason="targeted_deny")
+_ROLLOUT_OFF = Decision(enabled=False, variant="off", reason="rollout")
+_NO_ATTRIBUTES: Mapping[str, object] = MappingProxyType({})
+
+
+def compile_predicate(predicate: Mapping[str, Any]) -> Matcher:
+    """Compile one exported condition (``attribute``/``operator``/``value``)."""
+    return compile_condition(
+        str(predicate["attribute"]), predicate["operator"], predicate.get("value")
+    )
+
+
+# ── Flags ──────────────────────────────────────────────────────────
+
+
+class LocalRule(NamedTuple):
+    id: str
+    matchers: tuple[Matcher, ...]
+    decision: Decision
+
+
+class LocalFlag:
+    """One flag of the exported environment, compiled for evaluation."""
+
+    __slots__ = (
+        "allow",
+        "allowed",
+        "default",
+        "deny",
+        "disabled",
+        "on",
+        "prefix",
+        "rules",
+        "threshold",
+        "uses_user_id",
+    )
+
+    def __init__(self, flag_key: str, env_key: str, data: Mapping[str, Any]) -> None:
+        self.disabled = not data["enabled"]
+        self.deny = frozenset(data["targeted_deny"])
+        self.allow = frozenset(data["targeted_allow"])
+        default_variant = str(data["default_variant"])
+        on_variant = default_variant if default_variant != "off" else "on"
+        self.allowed = Decision(enabled=True, variant=on_variant, reason="targeted_allow")
+        self.on = Decision(enabled=True, variant=on_variant, reason="rollout")
+        self.default = Decision(
+            enabled=default_variant != "off", variant=default_variant, reason="default"
+        )
+        rules = sorted(data["rules"], key=lambda r: r["priority"])
+        self.rules = tuple(
+            LocalRule(
+                id=r["id"],
+                matchers=tuple(compile_predicate(c) for c in r["conditions"]),
+                decision=Decision(
+                    enabled=True, variant=r["variant"], reason="rule_match", rule_id=r["id"]
+                ),
+            )
+            for r in rules
+        )
+        # The user ID is only merged into the attributes when a rule reads it.
+        self.uses_user_id = any(
+            m.attribute == "user_id" for rule in self.rules for m in rule.matchers
+        )
+        rollout = data["rollout_percentage"]
+        self.threshold: int | None = None if rollout is None else int(rollout * 100)
+        self.prefix = hashlib.sha256(f"{flag_key}:{env_key}:".encode())
+
+    def decide(self, user_id: str, attributes: Mapping[str, object] | None) -> Decision:
+        """Apply the server's evaluation order to one user."""
+        if self.disabled:
+            return DISABLED
+        if user_id in self.deny:
+            return _TARGETED_DENY
+        if user_id in self.allow:
+            return self.allowed
+        if self.rules:
+            eval_attrs: Mapping[str, object] = attributes or _NO_ATTRIBUTES
+            if self.uses_user_id:
+                eval_attrs = {**eval_attrs, "user_id": user_id}
+            for rule in self.rules:
+                for matcher in rule.matchers:
+                    if not matcher.match(eval_attrs):
+                        break
+                else:
+                    return rule.decision
+        threshold = self.threshold
+        if threshold is not None:
+            state = self.prefix.copy()
+            state.update(user_id.encode())
+            if int.from_bytes(state.digest()[:4], "big") % BUCKETS < threshold:
+                return self.on
+            return _ROLLOUT_OFF
+        return self.default
+
+
+def compile_document(document: Mapping[str, Any]) -> dict[str, LocalFlag]:
+    """Compile an exported snapshot document into flags keyed by flag key."""
+    env_key = str(document["env_key"])
+    return {
+        flag_key: LocalFlag(flag_key, env_key, data) for flag_key, data in document["flags"].items()
+    }
@@ -0,0 +1,204 @@
+"""Compiled predicate matchers, shared by the service and the embedded client.
+
+Rule conditions are compiled once, when a configuration is loaded, into small
+matcher objects: the operator dispatch is resolved by picking the matcher
+class, and the predicate value is pre-coerced (floats parsed, ``in_list``
+values turned into sets). At evaluation time only the attribute side still
+needs coercing.
+
+Equality keeps the original coercion semantics: if either side is a boolean
+both compare by truthiness, otherwise both sides compare as floats when both
+parse as numbers, and by their ``str()`` form when either does not.
+
+Standard library only, like the rest of this package; the service imports
+these matchers from here, so both engines share one implementation.
+"""
+
+from __future__ import annotations
+
+import operator
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+_COMPARISONS: dict[str, Callable[[float, float], bool]] = {
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+}
+
+
+def _try_float(value: object) -> float | None:
+    try:
+        return float(value)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return None
+
+
+class Matcher:
+    """Base class: matches nothing."""
+
+    __slots__ = ("attribute",)
+
+    def __init__(self, attribute: str) -> None:
+        self.attribute = attribute
+
+    def match(self, attributes: Mapping[str, object]) -> bool:
+        return False
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.attribute!r})"
+
+
+class ExistsMatcher(Matcher):
+    __slots__ = ()
+
+    def match(self, attributes: Mapping[str, object]) -> bool:
+        return self.attribute in attributes
+
+
+class EqualsMatcher(Matcher):
+    """``equals`` with the constant side coerced up front."""
+
+    __slots__ = ("is_bool", "truthy", "number", "text")
+
+    def __init__(self, attribute: str, value: object) -> None:
+        super().__init__(attribute)
+        self.is_bool = isinstance(value, bool)
+        self.truthy = bool(value)
+        self.number = None if self.is_bool else _try_float(value)
+        self.text = str(value)
+
+    def _equals(self, value: object) -> bool:
+        if self.is_bool or isinstance(value, bool):
+            return bool(value) == self.truthy
+        if self.number is None:
+            # float(value) may still succeed, but the comparison would have
+            # fallen back to strings because the constant side is not numeric.
+            return str(value) == self.text
+        try:
+            return float(value) == self.number  # type: ignore[arg-type]
+        except (TypeError, ValueError):
+            return str(value) == self.text
+
+    def match(self, attributes: Mapping[str, object]) -> bool:
+        value = attributes.get(self.attribute)
+        if value is None:
+            return False
+        return self._equals(value)
+
+
+class NotEqualsMatcher(EqualsMatcher):
+    __slots__ = ()
+
+    def match(self, attributes: Mapping[str, object]) -> bool:
+        value = attributes.get(self.attribute)
+        if value is None:
+            return False
+        return not self._equals(value)
+
+
+class ContainsMatcher(Matcher):
+    __slots__ = ("needle",)
+
+    def __init__(self, attribute: str, needle: str) -> None:
+        super().__init__(attribute)
+        self.needle = needle
+
+    def match(self, attributes: Mapping[str, object]) -> bool:
+        value = attributes.get(self.attribute)
+        return isinstance(value, str) and self.needle in value
+
+
+class InListMatcher(Matcher):
+    """``in_list`` with the list split into pre-coerced lookup sets."""
+
+    __slots__ = ("bools", "truthy_from_bools", "numbers", "texts", "non_numeric_texts")
+
+    def __init__(self, attribute: str, values: list[object]) -> None:
+        super().__init__(attribute)
+        # A boolean attribute compares by truthiness against every entry.
+        self.bools = frozenset(bool(v) for v in values)
+        # Boolean entries compare by truthiness against any attribute.
+        self.truthy_from_bools = frozenset(bool(v) for v in values if isinstance(v, bool))
+        plain = [v for v in values if not isinstance(v, bool)]
+        numbers: set[float] = set()
+        non_numeric: set[str] = set()
+        for v in plain:
+            number = _try_float(v)
+            if number is None:
+                non_numeric.add(str(v))
+            else:
+                numbers.add(number)
+        self.numbers = frozenset(numbers)
+        self.texts = frozenset(str(v) for v in plain)
+        self.non_numeric_texts = frozenset(non_numeric)
+
+    def match(self, attributes: Mapping[str, object]) -> bool:
+        value = attributes.get(self.attribute)
+        if value is None:
+            return False
+        if isinstance(value, bool):
+            return value in self.bools
+        if self.truthy_from_bools and bool(value) in self.truthy_from_bools:
+            return True
+        try:
+            number = float(value)  # type: ignore[arg-type]
+        except (TypeError, ValueError):
+            return str(value) in self.texts
+        return number in self.numbers or (
+            bool(self.non_numeric_texts) and str(value) in self.non_numeric_texts
+        )
+
+
+class CompareMatcher(Matcher):
+    """``gt``/``gte``/``lt``/``lte`` against a pre-parsed float."""
+
+    __slots__ = ("compare", "number")
+
+    def __init__(self, attribute: str, op: str, number: float) -> None:
+        super().__init__(attribute)
+        self.compare = _COMPARISONS[op]
+        self.number = number
+
+    def match(self, attributes: Mapping[str, object]) -> bool:
+        value = attributes.get(self.attribute)
+        if value is None:
+            return False
+        try:
+            number = float(value)  # type: ignore[arg-type]
+        except (TypeError, ValueError):
+            return False
+        return self.compare(number, self.number)
+
+
+def compile_condition(attribute: str, op: str, value: object) -> Matcher:
+    """Compile one condition into a matcher; unknown operators match nothing."""
+    if op == "exists":
+        return ExistsMatcher(attribute)
+    if op == "equals":
+        return EqualsMatcher(attribute, value)
+    if op == "not_equals":
+        return NotEqualsMatcher(attribute, value)
+    if op == "contains":
+        if isinstance(value, str):
+            return ContainsMatcher(attribute, value)
+        return Matcher(attribute)
+    if op == "in_list":
+        if isinstance(value, list):
+            return InListMatcher(attribute, list(value))
+        return Matcher(attribute)
+    if op in _COMPARISONS:
+        number = _try_float(value)
+        if number is None:
+            return Matcher(attribute)
+        return CompareMatcher(attribute, op, number)
+    return Matcher(attribute)
+
+
+def match_all(matchers: tuple[Matcher, ...], attributes: Mapping[str, object]) -> bool:
+    """All matchers must match (AND logic)."""
+    return all(matcher.match(attributes) for matcher in matchers)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Compare the sync and async database modes under concurrent load.
+
+Runs the app in-process for each mode (``ASYNC_DATABASE`` off and on) against
+a fresh SQLite file, drives it through ``httpx.ASGITransport`` at several
+concurrency levels, and prints throughput and latency percentiles per
+endpoint. Sync handlers run on the threadpool (40 threads by default), so at
+concurrency levels above that requests queue for a thread; async handlers do
+not take a threadpool hop.
+
+Usage:
+    python scripts/loadtest_async.py
+    python scripts/loadtest_async.py --concurrency 10 50 200 --requests 4000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import reset_settings  # noqa: E402
+from app.core.database import dispose_async_engine, get_engine, reset_engine  # noqa: E402
+from app.core.snapshot import reset_snapshot  # noqa: E402
+from app.main import create_app  # noqa: E402
+from app.models.models import Base  # noqa: E402
+
+ADMIN = {"X-API-Key": "loadtest-admin"}
+READ = {"X-API-Key": "loadtest-read"}
+
+
+async def _drive(
+    client: httpx.AsyncClient,
+    method: str,
+    path: str,
+    body: object,
+    headers: dict[str, str],
+    requests: int,
+    concurrency: int,
+) -> tuple[list[float], int]:
+    latencies: list[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            resp = await client.request(method, path, json=body, headers=headers)
+            if resp.is_success:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors
+
+
+async def _run_mode(async_database: bool, levels: list[int], requests: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/loadtest.db"
+        reset_settings()
+        reset_engine()
+        reset_snapshot()
+        Base.metadata.create_all(bind=get_engine())
+        app = create_app(run_startup=False, async_database=async_database)
+        # Failed requests (e.g. connection pool timeouts) are counted, not raised.
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            await client.post(
+                "/api/v1/environments", json={"key": "production", "name": "P"}, headers=ADMIN
+            )
+            for i in range(20):
+                await client.post(
+                    "/api/v1/flags",
+                    json={
+                        "key": f"flag-{i}",
+                        "name": f"Flag {i}",
+                        "enabled": True,
+                        "rollout_percentage": 50,
+                    },
+                    headers=ADMIN,
+                )
+            scenarios = [
+                (
+                    "POST /evaluate",
+                    "POST",
+                    "/api/v1/evaluate",
+                    {"flag_key": "flag-1", "user_id": "user-1"},
+                    READ,
+                ),
+                ("GET /flags", "GET", "/api/v1/flags", None, ADMIN),
+            ]
+            mode = "async" if async_database else "sync"
+            for name, method, path, body, headers in scenarios:
+                for concurrency in levels:
+                    start = time.perf_counter()
+                    latencies, errors = await _drive(
+                        client, method, path, body, headers, requests, concurrency
+                    )
+                    elapsed = time.perf_counter() - start
+                    latencies.sort()
+                    line = f"{mode:<5}  {name:<15} c={concurrency:<4} "
+                    if latencies:
+                        p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+                        line += (
+                            f"{len(latencies) / elapsed:>8.0f} req/s  "
+                            f"p50={statistics.median(latencies) * 1000:7.2f} ms  "
+                            f"p99={p99 * 1000:7.2f} ms"
+                        )
+                    if errors:
+                        line += f"  errors={errors}"
+                    print(line, flush=True)
+        await dispose_async_engine()
+        reset_engine()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per level")
+    args = parser.parse_args(argv)
+    os.environ["ADMIN_API_KEY"] = ADMIN["X-API-Key"]
+    os.environ["READ_API_KEY"] = READ["X-API-Key"]
+    for async_database in (False, True):
+        asyncio.run(_run_mode(async_database, args.concurrency, args.requests))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
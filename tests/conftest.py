@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+from contextlib import contextmanager
 from typing import TYPE_CHECKING
 
 import pytest
@@ -10,13 +11,23 @@ from sqlalchemy import create_engine, event
 from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.pool import StaticPool
 
+from app.core.cache import reset_decision_cache, unknown_flags
 from app.core.config import Settings, get_settings, reset_settings
-from app.core.database import get_db, reset_engine
+from app.core.database import (
+    get_db,
+    get_engine,
+    get_read_db,
+    get_session_factory,
+    reset_engine,
+)
+from app.core.snapshot import reset_snapshot
 from app.main import create_app
 from app.models.models import Base
 
 if TYPE_CHECKING:
-    from collections.abc import Generator
+    from collections.abc import Callable, Generator, Iterator
+    from contextlib import AbstractContextManager
+    from pathlib import Path
 
 ADMIN_KEY = "test-admin-key"
 READ_KEY = "test-read-key"
@@ -55,6 +66,45 @@ def db_session() -> Generator[Session, None, None]:
         engine.dispose()
 
 
+@pytest.fixture()
+def file_db(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Generator[Session, None, None]:
+    """Point the app's own engine at a fresh SQLite file, as the CLIs use it."""
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'cli.db'}")
+    reset_settings()
+    reset_engine()
+    Base.metadata.create_all(bind=get_engine())
+    session = get_session_factory()()
+    try:
+        yield session
+    finally:
+        session.close()
+        reset_engine()
+        reset_settings()
+
+
+@pytest.fixture()
+def count_queries(
+    db_session: Session,
+) -> Callable[[], AbstractContextManager[list[str]]]:
+    """Return a context manager collecting every SQL statement run on the test DB."""
+
+    @contextmanager
+    def _count() -> Iterator[list[str]]:
+        statements: list[str] = []
+        engine = db_session.get_bind()
+
+        def _on_execute(*args: object) -> None:
+            statements.append(str(args[2]))
+
+        event.listen(engine, "before_cursor_execute", _on_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", _on_execute)
+
+    return _count
+
+
 @pytest.fixture()
 def client(db_session: Session) -> Generator[TestClient, None, None]:
     """FastAPI test client with overridden dependencies."""
@@ -64,6 +114,7 @@ def client(db_session: Session) -> Generator[TestClient, None, None]:
         yield db_session
 
     app.dependency_overrides[get_db] = _override_db
+    app.dependency_overrides[get_read_db] = _override_db
     app.dependency_overrides[get_settings] = _test_settings
 
     with TestClient(app) as c:
@@ -72,6 +123,9 @@ def client(db_session: Session) -> Generator[TestClient, None, None]:
     app.dependency_overrides.clear()
     reset_settings()
     reset_engine()
+    reset_snapshot()
+    reset_decision_cache()
+    unknown_flags.clear()
 
 
 @pytest.fixture()
@@ -0,0 +1,234 @@
+"""Tests for the async database mode (ASYNC_DATABASE)."""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import json
+from typing import TYPE_CHECKING
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.v1 import environments, evaluate, flags, rules
+from app.core import snapshot
+from app.core.config import reset_settings
+from app.core.database import async_database_url, dispose_async_engine
+from app.main import create_app
+
+if TYPE_CHECKING:
+    from collections.abc import Generator
+
+    from fastapi import FastAPI
+    from sqlalchemy.orm import Session
+
+ADMIN = {"X-API-Key": "admin"}
+READ = {"X-API-Key": "read"}
+
+
+@pytest.fixture()
+def async_app(file_db: Session, monkeypatch: pytest.MonkeyPatch) -> Generator[FastAPI, None, None]:
+    monkeypatch.setenv("ADMIN_API_KEY", "admin")
+    monkeypatch.setenv("READ_API_KEY", "read")
+    reset_settings()
+    yield create_app(async_database=True)
+    snapshot.reset_snapshot()
+    reset_settings()
+
+
+@pytest.fixture()
+def async_client(async_app: FastAPI) -> Generator[TestClient, None, None]:
+    with TestClient(async_app) as client:
+        yield client
+
+
+def _seed(client: TestClient) -> tuple[str, str]:
+    flag = client.post(
+        "/api/v1/flags",
+        json={"key": "checkout", "name": "Checkout", "enabled": True, "rollout_percentage": 50},
+        headers=ADMIN,
+    )
+    assert flag.status_code == 201
+    env = client.post(
+        "/api/v1/environments", json={"key": "production", "name": "Production"}, headers=ADMIN
+    )
+    assert env.status_code == 201
+    rule = client.post(
+        "/api/v1/rules",
+        json={
+            "flag_key": "checkout",
+            "env_key": "production",
+            "conditions": [{"attribute": "plan", "operator": "equals", "value": "pro"}],
+            "variant": "pro",
+        },
+        headers=ADMIN,
+    )
+    assert rule.status_code == 201
+    return flag.json()["id"], rule.json()["id"]
+
+
+class TestAsyncDatabaseUrl:
+    def test_sqlite_uses_aiosqlite(self) -> None:
+        assert async_database_url("sqlite:///./x.db") == "sqlite+aiosqlite:///./x.db"
+        assert async_database_url("sqlite+aiosqlite:///x.db") == "sqlite+aiosqlite:///x.db"
+
+
+class TestAsyncHandlers:
+    def test_handlers_are_coroutines(self) -> None:
+        for module in (flags, environments, rules, evaluate):
+            endpoints = [route.endpoint for route in module.async_router.routes]  # type: ignore[attr-defined]
+            assert endpoints
+            assert all(inspect.iscoroutinefunction(e) for e in endpoints)
+
+    def test_admin_and_evaluation(self, async_client: TestClient) -> None:
+        flag_id, rule_id = _seed(async_client)
+
+        assert async_client.get(f"/api/v1/flags/{flag_id}", headers=ADMIN).json()["key"] == (
+            "checkout"
+        )
+        assert [f["key"] for f in async_client.get("/api/v1/flags", headers=ADMIN).json()] == [
+            "checkout"
+        ]
+        assert len(async_client.get("/api/v1/environments", headers=ADMIN).json()) == 1
+        rules = async_client.get("/api/v1/rules", params={"env": "production"}, headers=ADMIN)
+        assert [r["id"] for r in rules.json()] == [rule_id]
+        assert async_client.get("/api/v1/rules", params={"env": "nope"}, headers=ADMIN).json() == []
+
+        single = async_client.post(
+            "/api/v1/evaluate",
+            json={"flag_key": "checkout", "user_id": "u1", "attributes": {"plan": "pro"}},
+            headers=READ,
+        ).json()
+        assert (single["variant"], single["reason"], single["rule_id"]) == (
+            "pro",
+            "rule_match",
+            rule_id,
+        )
+        bulk = async_client.post(
+            "/api/v1/evaluate",
+            json={"evaluations": [{"flag_key": "checkout", "user_id": f"u{i}"} for i in range(20)]},
+            headers=READ,
+        ).json()["results"]
+        assert {r["reason"] for r in bulk} == {"rollout"}
+        everything = async_client.post(
+            "/api/v1/evaluate/all",
+            json={"user_id": "u1", "attributes": {"plan": "pro"}},
+            headers=READ,
+        ).json()["results"]
+        assert [r["flag_key"] for r in everything] == ["checkout"]
+        stream = async_client.post(
+            "/api/v1/evaluate/stream",
+            content=b'{"flag_key": "checkout", "user_id": "u1", "attributes": {"plan": "pro"}}\n',
+            headers=READ,
+        )
+        assert json.loads(stream.text)["reason"] == "rule_match"
+
+        patched = async_client.patch(
+            f"/api/v1/flags/{flag_id}", json={"enabled": False}, headers=ADMIN
+        )
+        assert patched.json()["enabled"] is False
+        single = async_client.post(
+            "/api/v1/evaluate", json={"flag_key": "checkout", "user_id": "u1"}, headers=READ
+        ).json()
+        assert single["reason"] == "disabled"
+
+        assert async_client.delete(f"/api/v1/flags/{flag_id}", headers=ADMIN).status_code == 204
+        assert async_client.get(f"/api/v1/flags/{flag_id}", headers=ADMIN).status_code == 404
+        assert async_client.get("/api/v1/rules", headers=ADMIN).json() == []
+        changes = async_client.get("/api/v1/changes", params={"since": 4}, headers=READ).json()
+        assert {(c["entity_type"], c["action"]) for c in changes["changes"]} == {
+            ("flag", "delete"),
+            ("rule", "delete"),
+        }
+
+    def test_errors(self, async_client: TestClient) -> None:
+        _seed(async_client)
+        dup = async_client.post(
+            "/api/v1/flags", json={"key": "checkout", "name": "Again"}, headers=ADMIN
+        )
+        assert dup.status_code == 409
+        dup_env = async_client.post(
+            "/api/v1/environments", json={"key": "production", "name": "P"}, headers=ADMIN
+        )
+        assert dup_env.status_code == 409
+        assert async_client.patch("/api/v1/flags/nope", json={}, headers=ADMIN).status_code == 404
+        assert async_client.delete("/api/v1/flags/nope", headers=ADMIN).status_code == 404
+        no_env = async_client.post(
+            "/api/v1/rules", json={"flag_key": "checkout", "env_key": "nope"}, headers=ADMIN
+        )
+        assert no_env.status_code == 404
+        no_flag = async_client.post("/api/v1/rules", json={"env_key": "production"}, headers=ADMIN)
+        assert no_flag.status_code == 422
+        assert async_client.get("/api/v1/flags").status_code == 401
+
+    def test_targeting_lists(self, async_client: TestClient) -> None:
+        flag = async_client.post(
+            "/api/v1/flags",
+            json={"key": "t", "name": "T", "enabled": True, "targeted_allow": ["a", "b"]},
+            headers=ADMIN,
+        ).json()
+        assert (flag["targeted_allow"], flag["targeted_allow_count"]) == (["a", "b"], 2)
+        patched = async_client.patch(
+            f"/api/v1/flags/{flag['id']}",
+            json={"targeted_allow": ["b"], "targeted_deny": ["a"]},
+            headers=ADMIN,
+        ).json()
+        assert (patched["targeted_allow"], patched["targeted_deny"]) == (["b"], ["a"])
+        listed = async_client.get("/api/v1/flags", headers=ADMIN).json()
+        assert (listed[0]["targeted_deny"], listed[0]["targeted_deny_count"]) == (["a"], 1)
+        result = async_client.post(
+            "/api/v1/evaluate", json={"flag_key": "t", "user_id": "a"}, headers=READ
+        ).json()
+        assert result["reason"] == "targeted_deny"
+
+    def test_server_timing(self, async_client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+        _seed(async_client)
+        monkeypatch.setenv("SERVER_TIMING", "true")
+        reset_settings()
+        resp = async_client.post(
+            "/api/v1/evaluate", json={"flag_key": "checkout", "user_id": "u"}, headers=READ
+        )
+        phases = [part.split(";")[0] for part in resp.headers["server-timing"].split(", ")]
+        assert phases == ["auth", "parse", "db", "match", "serialize", "total"]
+
+    def test_sync_app_sees_async_writes(self, async_client: TestClient) -> None:
+        flag_id, _rule_id = _seed(async_client)
+        with TestClient(create_app(async_database=False)) as sync_client:
+            assert sync_client.get(f"/api/v1/flags/{flag_id}", headers=ADMIN).status_code == 200
+
+    def test_concurrent_requests_share_one_rebuild(
+        self, async_app: FastAPI, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        builds: list[int] = []
+        load_snapshot = snapshot.load_snapshot
+
+        def _counting_load(db: Session, *, version: int = 0) -> snapshot.Snapshot:
+            builds.append(version)
+            return load_snapshot(db, version=version)
+
+        monkeypatch.setattr(snapshot, "load_snapshot", _counting_load)
+
+        async def run() -> list[httpx.Response]:
+            transport = httpx.ASGITransport(app=async_app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                await client.post(
+                    "/api/v1/flags", json={"key": "f", "name": "F", "enabled": True}, headers=ADMIN
+                )
+                responses = await asyncio.gather(
+                    *(
+                        client.post(
+                            "/api/v1/evaluate",
+                            json={"flag_key": "f", "user_id": f"u{i}"},
+                            headers=READ,
+                        )
+                        for i in range(50)
+                    )
+                )
+            await dispose_async_engine()
+            return responses
+
+        responses = asyncio.run(run())
+        assert all(r.status_code == 200 for r in responses)
+        assert {r.json()["reason"] for r in responses} == {"default"}
+        assert len(builds) == 1
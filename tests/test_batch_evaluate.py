@@ -0,0 +1,255 @@
+"""Tests for the offline batch evaluation CLI."""
+
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.cli import batch_evaluate
+from app.core.config import Settings, get_settings
+from app.core.database import get_db, get_read_db
+from app.core.snapshot import reset_snapshot
+from app.main import create_app
+from app.models.models import Environment, Flag, Rule
+
+if TYPE_CHECKING:
+    from collections.abc import Generator
+    from pathlib import Path
+
+    from sqlalchemy.orm import Session
+
+FIELDS = ("flag_key", "env_key", "enabled", "variant", "reason", "rule_id")
+
+
+@pytest.fixture()
+def seeded(file_db: Session) -> Session:
+    flag = Flag(key="checkout", name="Checkout", enabled=True, rollout_percentage=35.0)
+    prod = Environment(key="production", name="Production")
+    file_db.add_all(
+        [
+            flag,
+            prod,
+            Environment(key="staging", name="Staging"),
+            Flag(key="banner", name="Banner", enabled=True, default_variant="blue"),
+            Flag(key="off", name="Off"),
+        ]
+    )
+    file_db.flush()
+    file_db.add(
+        Rule(
+            flag_id=flag.id,
+            environment_id=prod.id,
+            priority=1,
+            conditions=json.dumps([{"attribute": "plan", "operator": "equals", "value": "pro"}]),
+            variant="pro",
+        )
+    )
+    file_db.commit()
+    return file_db
+
+
+def _api_results(db: Session, requests: list[dict[str, object]]) -> list[dict[str, object]]:
+    """Evaluate the same requests through the HTTP API on the same database."""
+    app = create_app(run_startup=False)
+
+    def _override_db() -> Generator[Session, None, None]:
+        yield db
+
+    app.dependency_overrides[get_db] = _override_db
+    app.dependency_overrides[get_read_db] = _override_db
+    app.dependency_overrides[get_settings] = lambda: Settings(read_api_key="key")
+    with TestClient(app) as client:
+        resp = client.post(
+            "/api/v1/evaluate", json={"evaluations": requests}, headers={"X-API-Key": "key"}
+        )
+    reset_snapshot()
+    return list(resp.json()["results"])
+
+
+def _read_output(path: Path) -> list[dict[str, object]]:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+class TestBatchEvaluate:
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_ndjson_matches_http_api(
+        self, seeded: Session, tmp_path: Path, workers: int, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        users = [
+            {"user_id": f"user-{i}", "attributes": {"plan": "pro" if i % 7 == 0 else "free"}}
+            for i in range(300)
+        ]
+        users.append({"user_id": "stage-1", "env_key": "staging"})
+        source = tmp_path / "users.ndjson"
+        source.write_text("\n".join(json.dumps(u) for u in users))
+        output = tmp_path / "out.ndjson"
+
+        code = batch_evaluate.main(
+            [str(source), "--output", str(output), "--workers", str(workers), "--chunk-size", "64"]
+        )
+        assert code == 0
+        results = _read_output(output)
+        expected = _api_results(
+            seeded,
+            [
+                {
+                    "flag_key": flag_key,
+                    "env_key": user.get("env_key", "production"),
+                    "user_id": user["user_id"],
+                    "attributes": user.get("attributes", {}),
+                }
+                for user in users
+                for flag_key in ("banner", "checkout", "off")
+            ],
+        )
+        assert [{f: r[f] for f in FIELDS} for r in results] == [
+            {f: r[f] for f in FIELDS} for r in expected
+        ]
+        assert "301 records, 903 evaluations" in capsys.readouterr().err
+
+    def test_csv_with_selected_flag(self, seeded: Session, tmp_path: Path) -> None:
+        source = tmp_path / "users.csv"
+        source.write_text("user_id,plan,env_key\nu1,pro,\nu2,,staging\n,free,\n")
+        output = tmp_path / "out.ndjson"
+
+        code = batch_evaluate.main(
+            [str(source), "--flag", "checkout", "--output", str(output), "--workers", "2"]
+        )
+        assert code == 0
+        results = _read_output(output)
+        expected = _api_results(
+            seeded,
+            [
+                {"flag_key": "checkout", "user_id": "u1", "attributes": {"plan": "pro"}},
+                {"flag_key": "checkout", "env_key": "staging", "user_id": "u2"},
+            ],
+        )
+        assert results[0]["reason"] == "rule_match"
+        assert [{f: r[f] for f in FIELDS} for r in results[:2]] == [
+            {f: r[f] for f in FIELDS} for r in expected
+        ]
+        assert results[2]["index"] == 2
+
+    @pytest.mark.parametrize(
+        ("json_columns", "attributes", "variants"),
+        [
+            (
+                [],
+                [
+                    {"beta": "false", "seats": "20"},
+                    {"beta": "true"},
+                    {"seats": "5", "code": "123"},
+                    {"seats": "2.5", "tags": "false"},
+                    {"tags": '["a"]'},
+                ],
+                ["beta", "beta", "code", "off", "off"],
+            ),
+            (
+                ["beta", "seats", "tags"],
+                [
+                    {"beta": False, "seats": 20},
+                    {"beta": True},
+                    {"seats": 5, "code": "123"},
+                    {"seats": 2.5, "tags": False},
+                    {"tags": ["a"]},
+                ],
+                ["team", "beta", "code", "untagged", "off"],
+            ),
+        ],
+    )
+    def test_csv_cells_match_the_api(
+        self,
+        seeded: Session,
+        tmp_path: Path,
+        json_columns: list[str],
+        attributes: list[dict[str, object]],
+        variants: list[str],
+    ) -> None:
+        flag = Flag(key="typed", name="Typed", enabled=True)
+        seeded.add(flag)
+        seeded.flush()
+        prod_id = seeded.scalar(select(Environment.id).where(Environment.key == "production"))
+        for priority, (conditions, variant) in enumerate(
+            [
+                ([{"attribute": "beta", "operator": "equals", "value": True}], "beta"),
+                ([{"attribute": "seats", "operator": "gt", "value": 10}], "team"),
+                ([{"attribute": "code", "operator": "contains", "value": "12"}], "code"),
+                ([{"attribute": "tags", "operator": "in_list", "value": [False]}], "untagged"),
+            ],
+            start=1,
+        ):
+            seeded.add(
+                Rule(
+                    flag_id=flag.id,
+                    environment_id=prod_id,
+                    priority=priority,
+                    conditions=json.dumps(conditions),
+                    variant=variant,
+                )
+            )
+        seeded.commit()
+        source = tmp_path / "users.csv"
+        source.write_text(
+            "user_id,beta,seats,code,tags\n"
+            "u1,false,20,,\n"
+            "u2,true,,,\n"
+            "u3,,5,123,\n"
+            "u4,,2.5,,false\n"
+            'u5,,,,"[""a""]"\n'
+        )
+        output = tmp_path / "out.ndjson"
+        args = [str(source), "--flag", "typed", "--output", str(output)]
+        if json_columns:
+            args += ["--json-columns", *json_columns]
+        assert batch_evaluate.main(args) == 0
+
+        expected = _api_results(
+            seeded,
+            [
+                {"flag_key": "typed", "user_id": f"u{i}", "attributes": attrs}
+                for i, attrs in enumerate(attributes, start=1)
+            ],
+        )
+        results = _read_output(output)
+        assert [{f: r[f] for f in FIELDS} for r in results] == [
+            {f: r[f] for f in FIELDS} for r in expected
+        ]
+        assert [r["variant"] for r in results] == variants
+
+    def test_invalid_json_cells(
+        self, seeded: Session, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        source = tmp_path / "users.csv"
+        source.write_text('user_id,beta\nu1,yes\nu2,"{}"\nu3,true\n')
+        output = tmp_path / "out.ndjson"
+        args = [str(source), "--flag", "banner", "--output", str(output)]
+        assert batch_evaluate.main([*args, "--json-columns", "beta"]) == 0
+        results = _read_output(output)
+        assert [r.get("index") for r in results] == [0, 1, None]
+        assert "beta" in results[1]["detail"][0]["msg"]
+
+        assert batch_evaluate.main([*args, "--json-columns", "plan"]) == 1
+        assert "plan" in capsys.readouterr().err
+
+    def test_invalid_ndjson_lines(self, seeded: Session, tmp_path: Path) -> None:
+        source = tmp_path / "users.ndjson"
+        source.write_text('not json\n{"attributes": {}}\n[1]\n{"user_id": "u1"}\n')
+        output = tmp_path / "out.ndjson"
+
+        assert batch_evaluate.main([str(source), "--flag", "banner", "--output", str(output)]) == 0
+        results = _read_output(output)
+        assert [r.get("index") for r in results] == [0, 1, 2, None]
+        assert results[1]["detail"][0]["loc"] == ["user_id"]
+        assert results[3]["variant"] == "blue"
+
+    def test_csv_without_user_id(
+        self, seeded: Session, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        source = tmp_path / "users.csv"
+        source.write_text("id,plan\n1,pro\n")
+        assert batch_evaluate.main([str(source)]) == 1
+        assert "user_id" in capsys.readouterr().err
@@ -0,0 +1,82 @@
+"""Tests for the synthetic data generator and the benchmark runner."""
+
+from __future__ import annotations
+
+import json
+from dataclasses import asdict
+from typing import TYPE_CHECKING
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models.models import Environment, Flag, Rule, TargetingEntry
+from benchmarks.run import compare, main
+from benchmarks.synthetic import SCALES, eval_requests, populate
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from sqlalchemy.orm import Session
+
+TINY = SCALES["tiny"]
+
+
+def _report(scale: str = "tiny", **medians: float) -> dict[str, object]:
+    return {
+        "scale": asdict(SCALES[scale]),
+        "results": {name: {"median_us": value} for name, value in medians.items()},
+    }
+
+
+class TestSynthetic:
+    def test_populate_matches_scale(self, db_session: Session) -> None:
+        populate(db_session, TINY)
+        assert db_session.scalar(select(func.count()).select_from(Environment)) == TINY.environments
+        assert db_session.scalar(select(func.count()).select_from(Flag)) == TINY.flags
+        assert (
+            db_session.scalar(select(func.count()).select_from(Rule))
+            == TINY.flags * TINY.environments * TINY.rules_per_flag
+        )
+        # One targeted flag at this scale: the allow list plus a deny list a tenth its size.
+        assert db_session.scalar(select(func.count()).select_from(TargetingEntry)) == 22
+
+    def test_requests_are_deterministic(self) -> None:
+        first = eval_requests(TINY, 50)
+        assert first == eval_requests(TINY, 50)
+        assert first != eval_requests(TINY, 50, seed=2)
+        assert {req.env_key for req in first} <= {"env-0", "env-1"}
+
+
+class TestCompare:
+    def test_flags_regressions_beyond_tolerance(self) -> None:
+        baseline = _report(a=100.0, b=100.0, gone=1.0)
+        current = _report(a=120.0, b=130.0, new=1.0)
+        comparisons = {item.name: item for item in compare(current, baseline, tolerance=0.25)}
+        assert set(comparisons) == {"a", "b"}
+        assert not comparisons["a"].regressed
+        assert comparisons["b"].regressed
+        assert comparisons["b"].change == pytest.approx(0.3)
+
+    def test_rejects_other_scale(self) -> None:
+        with pytest.raises(ValueError, match="does not match"):
+            compare(_report("tiny", a=1.0), _report("small", a=1.0), tolerance=0.25)
+
+
+class TestRun:
+    def test_writes_report_and_compares(self, tmp_path: Path) -> None:
+        output = tmp_path / "results.json"
+        baseline = tmp_path / "baseline.json"
+        args = ["--scale", "tiny", "--min-time", "0.001", "--repeat", "1"]
+        args += ["--only", "evaluate_flag", "admin_list_flags", "--baseline", str(baseline)]
+        assert main([*args, "--output", str(output), "--save-baseline"]) == 0
+        report = json.loads(output.read_text())
+        assert report["scale"]["name"] == "tiny"
+        assert set(report["results"]) == {"evaluate_flag", "admin_list_flags"}
+        assert report["results"]["evaluate_flag"]["median_us"] > 0
+
+        # A baseline far faster than anything achievable makes every benchmark regress.
+        saved = json.loads(baseline.read_text())
+        for result in saved["results"].values():
+            result["median_us"] = 1e-6
+        baseline.write_text(json.dumps(saved))
+        assert main([*args, "--output", str(output)]) == 1
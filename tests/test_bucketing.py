@@ -0,0 +1,64 @@
+"""Tests for rollout bucketing against the original hex-digest implementation."""
+
+from __future__ import annotations
+
+import hashlib
+
+import pytest
+
+from app.core import bucketing
+from app.core.bucketing import Bucketer, bucket
+
+
+def _reference_bucket(flag_key: str, env_key: str, user_id: str) -> int:
+    """The bucketing function as originally written, kept as the oracle."""
+    raw = f"{flag_key}:{env_key}:{user_id}"
+    digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    return int(digest[:8], 16) % 10000
+
+
+GOLDEN = [
+    ("user-1", 5134),
+    ("user-42", 4534),
+    ("üñï", 8876),
+    ("", 4354),
+    ("a:b", 2963),
+]
+
+USER_IDS = [f"user-{i}" for i in range(2000)] + ["", "a:b", "üñï", "x" * 500]
+
+
+class TestBucket:
+    @pytest.mark.parametrize(("user_id", "expected"), GOLDEN)
+    def test_golden_values(self, user_id: str, expected: int) -> None:
+        assert bucket("checkout", "production", user_id) == expected
+        assert Bucketer("checkout", "production").bucket(user_id) == expected
+
+    def test_matches_reference(self) -> None:
+        bucketer = Bucketer("flag", "staging")
+        for user_id in USER_IDS:
+            expected = _reference_bucket("flag", "staging", user_id)
+            assert bucket("flag", "staging", user_id) == expected
+            assert bucketer.bucket(user_id) == expected
+            assert bucketer.bucket(user_id.encode()) == expected
+
+    def test_prefix_state_is_not_mutated(self) -> None:
+        bucketer = Bucketer("flag", "production")
+        first = bucketer.bucket("u1")
+        bucketer.bucket("u2")
+        assert bucketer.bucket("u1") == first
+
+
+class TestBucketBatch:
+    def test_numpy_path(self) -> None:
+        pytest.importorskip("numpy")
+        result = Bucketer("flag", "production").bucket_batch(USER_IDS)
+        assert list(result) == [_reference_bucket("flag", "production", u) for u in USER_IDS]
+
+    def test_pure_python_path(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(bucketing, "np", None)
+        result = Bucketer("flag", "production").bucket_batch(u.encode() for u in USER_IDS)
+        assert list(result) == [_reference_bucket("flag", "production", u) for u in USER_IDS]
+
+    def test_empty(self) -> None:
+        assert len(Bucketer("flag", "production").bucket_batch([])) == 0
@@ -0,0 +1,166 @@
+"""Tests for the decision cache and unknown-flag counters."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+from app.core.cache import (
+    DecisionCache,
+    UnknownFlagCounter,
+    get_decision_cache,
+    reset_decision_cache,
+)
+from app.core.config import reset_settings
+from app.core.evaluation import Decision
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Generator
+    from contextlib import AbstractContextManager
+
+    from fastapi.testclient import TestClient
+
+ON = Decision(enabled=True, variant="on", reason="default")
+OFF = Decision(enabled=False, variant="off", reason="disabled")
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestDecisionCache:
+    def test_hit_and_miss_counters(self) -> None:
+        cache = DecisionCache(10, 60)
+        assert cache.get("k", 1) is None
+        cache.put("k", 1, ON)
+        assert cache.get("k", 1) == ON
+        stats = cache.stats()
+        assert (stats.hits, stats.misses, stats.size) == (1, 1, 1)
+        assert stats.hit_ratio == 0.5
+
+    def test_lru_eviction(self) -> None:
+        cache = DecisionCache(2, 60)
+        cache.put("a", 1, ON)
+        cache.put("b", 1, ON)
+        cache.get("a", 1)
+        cache.put("c", 1, OFF)
+        assert cache.get("b", 1) is None
+        assert cache.get("a", 1) == ON
+        assert cache.get("c", 1) == OFF
+        assert cache.stats().evictions == 1
+
+    def test_ttl_expiry(self) -> None:
+        clock = _Clock()
+        cache = DecisionCache(10, 5, clock=clock)
+        cache.put("k", 1, ON)
+        clock.now = 4.9
+        assert cache.get("k", 1) == ON
+        clock.now = 5.0
+        assert cache.get("k", 1) is None
+        assert cache.stats().size == 0
+
+    def test_version_change_drops_entries(self) -> None:
+        cache = DecisionCache(10, 60)
+        cache.put("k", 1, ON)
+        assert cache.get("k", 2) is None
+        assert cache.stats().invalidations == 1
+        assert cache.stats().size == 0
+
+
+@pytest.fixture()
+def cache_enabled(monkeypatch: pytest.MonkeyPatch) -> Generator[None, None, None]:
+    monkeypatch.setenv("DECISION_CACHE_SIZE", "100")
+    reset_settings()
+    reset_decision_cache()
+    yield
+    reset_settings()
+    reset_decision_cache()
+
+
+@pytest.mark.usefixtures("cache_enabled")
+class TestDecisionCacheEndpoint:
+    def test_repeat_requests_hit_cache_and_writes_invalidate(
+        self, client: TestClient, admin_headers: dict[str, str]
+    ) -> None:
+        flag_id = client.post(
+            "/api/v1/flags",
+            json={"key": "cached", "name": "Cached", "enabled": True},
+            headers=admin_headers,
+        ).json()["id"]
+        body = {"flag_key": "cached", "env_key": "production", "user_id": "u1"}
+        first = client.post("/api/v1/evaluate", json=body, headers=admin_headers).json()
+        second = client.post("/api/v1/evaluate", json=body, headers=admin_headers).json()
+        assert first["reason"] == second["reason"] == "default"
+        assert first["eval_id"] != second["eval_id"]
+
+        stats = client.get("/api/v1/stats/cache", headers=admin_headers).json()
+        assert stats["enabled"] is True
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+
+        client.patch(f"/api/v1/flags/{flag_id}", json={"enabled": False}, headers=admin_headers)
+        third = client.post("/api/v1/evaluate", json=body, headers=admin_headers).json()
+        assert third["reason"] == "disabled"
+        stats = client.get("/api/v1/stats/cache", headers=admin_headers).json()
+        assert stats["invalidations"] == 1
+
+
+class TestCacheStatsDisabled:
+    def test_reports_disabled(self, client: TestClient, admin_headers: dict[str, str]) -> None:
+        resp = client.get("/api/v1/stats/cache", headers=admin_headers)
+        assert resp.status_code == 200
+        assert resp.json()["enabled"] is False
+
+    def test_cache_disabled_by_default(self) -> None:
+        reset_decision_cache()
+        assert get_decision_cache() is None
+
+
+class TestUnknownFlags:
+    def test_counter_is_bounded(self) -> None:
+        counter = UnknownFlagCounter(max_keys=2)
+        for key in ("a", "b", "a", "c", "c"):
+            counter.record(key)
+        assert counter.most_common(10) == [("a", 2), ("b", 1)]
+        assert counter.total == 5
+        assert counter.untracked == 2
+
+    def test_unknown_keys_skip_db_and_are_counted(
+        self,
+        client: TestClient,
+        admin_headers: dict[str, str],
+        count_queries: Callable[[], AbstractContextManager[list[str]]],
+    ) -> None:
+        body = {"flag_key": "deleted-flag", "env_key": "production", "user_id": "u1"}
+        client.post("/api/v1/evaluate", json=body, headers=admin_headers)
+        with count_queries() as statements:
+            for _ in range(3):
+                resp = client.post("/api/v1/evaluate", json=body, headers=admin_headers)
+                assert resp.json()["reason"] == "disabled"
+            client.post(
+                "/api/v1/evaluate",
+                json={"evaluations": [body, {**body, "flag_key": "older-flag"}]},
+                headers=admin_headers,
+            )
+        assert statements == []
+
+        resp = client.get("/api/v1/stats/unknown-flags", headers=admin_headers)
+        data = resp.json()
+        assert data["total"] == 6
+        assert data["keys"] == [
+            {"flag_key": "deleted-flag", "count": 5},
+            {"flag_key": "older-flag", "count": 1},
+        ]
+
+    def test_created_keys_are_dropped_from_report(
+        self, client: TestClient, admin_headers: dict[str, str]
+    ) -> None:
+        body = {"flag_key": "late", "env_key": "production", "user_id": "u1"}
+        client.post("/api/v1/evaluate", json=body, headers=admin_headers)
+        client.post("/api/v1/flags", json={"key": "late", "name": "Late"}, headers=admin_headers)
+        resp = client.get("/api/v1/stats/unknown-flags", headers=admin_headers)
+        assert resp.json()["keys"] == []
@@ -0,0 +1,122 @@
+"""Tests for the configuration change log, delta sync and SSE stream."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import TYPE_CHECKING
+
+from app.api.v1.changes import change_events, load_changes
+from app.schemas.schemas import ChangesResponse
+
+if TYPE_CHECKING:
+    from fastapi.testclient import TestClient
+    from sqlalchemy.orm import Session
+
+
+def _seed(client: TestClient, admin_headers: dict[str, str]) -> tuple[str, str, str]:
+    flag = client.post(
+        "/api/v1/flags", json={"key": "f", "name": "F", "enabled": True}, headers=admin_headers
+    ).json()
+    env = client.post(
+        "/api/v1/environments", json={"key": "production", "name": "P"}, headers=admin_headers
+    ).json()
+    rule = client.post(
+        "/api/v1/rules",
+        json={"flag_id": flag["id"], "environment_id": env["id"], "variant": "on"},
+        headers=admin_headers,
+    ).json()
+    return flag["id"], env["id"], rule["id"]
+
+
+def _changes(client: TestClient, headers: dict[str, str], since: int) -> dict[str, object]:
+    resp = client.get("/api/v1/changes", params={"since": since}, headers=headers)
+    assert resp.status_code == 200
+    return dict(resp.json())
+
+
+class TestChanges:
+    def test_every_write_is_versioned(
+        self, client: TestClient, admin_headers: dict[str, str], read_headers: dict[str, str]
+    ) -> None:
+        flag_id, env_id, rule_id = _seed(client, admin_headers)
+        data = _changes(client, read_headers, 0)
+        assert data["version"] == 3
+        assert [(c["version"], c["entity_type"], c["entity_id"]) for c in data["changes"]] == [
+            (1, "flag", flag_id),
+            (2, "environment", env_id),
+            (3, "rule", rule_id),
+        ]
+        assert data["changes"][0]["entity"]["key"] == "f"
+        assert data["changes"][1]["entity"]["key"] == "production"
+        assert data["changes"][2]["entity"]["variant"] == "on"
+
+    def test_only_changes_after_version(
+        self, client: TestClient, admin_headers: dict[str, str], read_headers: dict[str, str]
+    ) -> None:
+        flag_id, _env_id, _rule_id = _seed(client, admin_headers)
+        client.patch(f"/api/v1/flags/{flag_id}", json={"name": "F2"}, headers=admin_headers)
+        client.patch(f"/api/v1/flags/{flag_id}", json={"name": "F3"}, headers=admin_headers)
+        data = _changes(client, read_headers, 3)
+        assert data["version"] == 5
+        assert len(data["changes"]) == 1
+        assert data["changes"][0]["version"] == 5
+        assert data["changes"][0]["entity"]["name"] == "F3"
+
+        assert _changes(client, read_headers, 5) == {"version": 5, "changes": []}
+
+    def test_delete_reports_flag_and_its_rules(
+        self, client: TestClient, admin_headers: dict[str, str], read_headers: dict[str, str]
+    ) -> None:
+        flag_id, _env_id, rule_id = _seed(client, admin_headers)
+        client.delete(f"/api/v1/flags/{flag_id}", headers=admin_headers)
+        data = _changes(client, read_headers, 3)
+        assert {(c["entity_type"], c["entity_id"], c["action"]) for c in data["changes"]} == {
+            ("flag", flag_id, "delete"),
+            ("rule", rule_id, "delete"),
+        }
+        assert all(c["entity"] is None for c in data["changes"])
+
+        # A client syncing from scratch sees the flag only as deleted.
+        full = _changes(client, read_headers, 0)
+        actions = {c["entity_id"]: c["action"] for c in full["changes"]}
+        assert actions[flag_id] == "delete"
+        assert actions[rule_id] == "delete"
+
+    def test_requires_key(self, client: TestClient) -> None:
+        assert client.get("/api/v1/changes").status_code == 401
+        assert client.get("/api/v1/changes/stream").status_code == 401
+
+
+class TestChangeStream:
+    def test_streams_new_changes(
+        self, client: TestClient, admin_headers: dict[str, str], db_session: Session
+    ) -> None:
+        flag_id, _env_id, _rule_id = _seed(client, admin_headers)
+
+        async def collect() -> list[str]:
+            events = change_events(lambda v: load_changes(db_session, v), 1, interval=0.01)
+            received = [await anext(events) for _ in range(3)]
+            client.patch(f"/api/v1/flags/{flag_id}", json={"name": "F2"}, headers=admin_headers)
+            received.append(await anext(events))
+            await events.aclose()
+            return received
+
+        retry, *changes = asyncio.run(collect())
+        assert retry.startswith("retry: ")
+        ids = [event.split("\n")[0] for event in changes]
+        assert ids == ["id: 2", "id: 3", "id: 4"]
+        last = json.loads(changes[-1].split("data: ", 1)[1])
+        assert last["entity"]["name"] == "F2"
+        assert changes[-1].startswith("id: 4\nevent: change\n")
+
+    def test_heartbeat_when_idle(self) -> None:
+        async def collect() -> list[str]:
+            events = change_events(
+                lambda v: ChangesResponse(version=v, changes=[]), 7, interval=0.01, heartbeat=0.02
+            )
+            received = [await anext(events) for _ in range(2)]
+            await events.aclose()
+            return received
+
+        assert asyncio.run(collect())[1] == ": keep-alive\n\n"
@@ -0,0 +1,124 @@
+"""Tests for the SQLite storage profile and the read-only evaluation pool."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import Settings, reset_settings
+from app.core.database import (
+    get_engine,
+    get_read_engine,
+    get_read_session_factory,
+    reset_engine,
+    sqlite_pragmas,
+)
+from app.core.snapshot import reset_snapshot
+from app.main import create_app
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Generator
+
+    from sqlalchemy.engine import Engine
+    from sqlalchemy.orm import Session
+
+
+@pytest.fixture()
+def configure(
+    file_db: Session, monkeypatch: pytest.MonkeyPatch
+) -> Generator[Callable[..., None], None, None]:
+    """Apply env settings on top of the file database and rebuild the engines."""
+
+    def _apply(**env: str) -> None:
+        for name, value in env.items():
+            monkeypatch.setenv(name.upper(), value)
+        reset_settings()
+        reset_engine()
+
+    yield _apply
+    reset_snapshot()
+
+
+def _pragma(engine: Engine, name: str) -> object:
+    with engine.connect() as conn:
+        return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+
+class TestSqlitePragmas:
+    def test_default_profile(self) -> None:
+        assert sqlite_pragmas(Settings()) == ["PRAGMA foreign_keys=ON", "PRAGMA busy_timeout=5000"]
+
+    def test_read_optimized_profile(self) -> None:
+        pragmas = sqlite_pragmas(
+            Settings(sqlite_profile="read_optimized", sqlite_cache_size_kib=1024), read_only=True
+        )
+        assert "PRAGMA journal_mode=WAL" in pragmas
+        assert "PRAGMA synchronous=NORMAL" in pragmas
+        assert "PRAGMA cache_size=-1024" in pragmas
+        assert pragmas[-1] == "PRAGMA query_only=ON"
+
+    def test_rejects_unknown_profile(self) -> None:
+        with pytest.raises(ValueError, match="sqlite_profile"):
+            Settings(sqlite_profile="fast")
+
+
+class TestEngines:
+    def test_default_profile_keeps_rollback_journal(self, configure: Callable[..., None]) -> None:
+        configure()
+        engine = get_engine()
+        assert _pragma(engine, "journal_mode") == "delete"
+        assert _pragma(engine, "foreign_keys") == 1
+        assert get_read_engine() is engine
+
+    def test_read_optimized_profile_and_pool_size(self, configure: Callable[..., None]) -> None:
+        configure(
+            sqlite_profile="read_optimized",
+            sqlite_cache_size_kib="2048",
+            sqlite_mmap_size_bytes="1048576",
+            db_pool_size="7",
+        )
+        engine = get_engine()
+        assert _pragma(engine, "journal_mode") == "wal"
+        assert _pragma(engine, "synchronous") == 1
+        assert _pragma(engine, "cache_size") == -2048
+        assert _pragma(engine, "mmap_size") == 1048576
+        assert _pragma(engine, "busy_timeout") == 5000
+        assert engine.pool.size() == 7  # type: ignore[attr-defined]
+
+    def test_read_only_pool_rejects_writes(self, configure: Callable[..., None]) -> None:
+        configure(read_only_pool="true", read_only_pool_size="3")
+        read_engine = get_read_engine()
+        assert read_engine is not get_engine()
+        assert read_engine.pool.size() == 3  # type: ignore[attr-defined]
+        assert _pragma(read_engine, "query_only") == 1
+        with get_read_session_factory()() as session:
+            assert session.execute(text("SELECT count(*) FROM flags")).scalar() == 0
+            with pytest.raises(OperationalError, match="readonly"):
+                session.execute(
+                    text("INSERT INTO environments (id, key, name) VALUES ('x', 'x', 'x')")
+                )
+
+    def test_evaluation_reads_through_read_only_pool(self, configure: Callable[..., None]) -> None:
+        configure(
+            sqlite_profile="read_optimized",
+            read_only_pool="true",
+            admin_api_key="admin",
+            read_api_key="read",
+        )
+        with TestClient(create_app(run_startup=False)) as client:
+            client.post(
+                "/api/v1/flags",
+                json={"key": "f", "name": "F", "enabled": True, "default_variant": "blue"},
+                headers={"X-API-Key": "admin"},
+            )
+            resp = client.post(
+                "/api/v1/evaluate",
+                json={"flag_key": "f", "user_id": "u1"},
+                headers={"X-API-Key": "read"},
+            )
+            assert resp.json()["variant"] == "blue"
+            assert get_read_engine().pool.checkedin() == 1  # type: ignore[attr-defined]
@@ -2,9 +2,13 @@
 
 from __future__ import annotations
 
+import json
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
+    from collections.abc import Callable
+    from contextlib import AbstractContextManager
+
     from fastapi.testclient import TestClient
 
 
@@ -213,6 +217,65 @@ class TestEvaluation:
         assert "results" in data
         assert len(data["results"]) == 2
 
+    def test_bulk_evaluation_uses_constant_queries(
+        self,
+        client: TestClient,
+        admin_headers: dict[str, str],
+        count_queries: Callable[[], AbstractContextManager[list[str]]],
+    ) -> None:
+        for i in range(5):
+            client.post(
+                "/api/v1/flags",
+                json={
+                    "key": f"bulk-{i}",
+                    "name": f"Bulk {i}",
+                    "enabled": True,
+                    "rollout_percentage": 50,
+                },
+                headers=admin_headers,
+            )
+        client.post(
+            "/api/v1/environments",
+            json={"key": "production", "name": "Production"},
+            headers=admin_headers,
+        )
+        evaluations = [
+            {"flag_key": f"bulk-{i % 6}", "env_key": "production", "user_id": f"u{i}"}
+            for i in range(200)
+        ]
+        with count_queries() as statements:
+            resp = client.post(
+                "/api/v1/evaluate", json={"evaluations": evaluations}, headers=admin_headers
+            )
+        assert resp.status_code == 200
+        results = resp.json()["results"]
+        assert len(results) == 200
+        assert [r["flag_key"] for r in results] == [e["flag_key"] for e in evaluations]
+        assert all(r["reason"] == "disabled" for r in results if r["flag_key"] == "bulk-5")
+        # The change-log version check plus the snapshot's five queries.
+        assert len(statements) <= 6
+
+    def test_bulk_deduplicates_identical_requests(
+        self, client: TestClient, admin_headers: dict[str, str]
+    ) -> None:
+        _setup_flag_with_env(client, admin_headers, rollout=50.0)
+        item = {
+            "flag_key": "eval-flag",
+            "env_key": "production",
+            "user_id": "u1",
+            "attributes": {"b": 1, "a": "x"},
+        }
+        reordered = {**item, "attributes": {"a": "x", "b": 1}}
+        resp = client.post(
+            "/api/v1/evaluate",
+            json={"evaluations": [item, reordered, item]},
+            headers=admin_headers,
+        )
+        results = resp.json()["results"]
+        assert len({(r["enabled"], r["reason"], r["variant"]) for r in results}) == 1
+        # Each result still carries its own eval id.
+        assert len({r["eval_id"] for r in results}) == 3
+
     def test_eval_response_fields(self, client: TestClient, admin_headers: dict[str, str]) -> None:
         _setup_flag_with_env(client, admin_headers)
         resp = client.post(
@@ -230,6 +293,132 @@ class TestEvaluation:
         assert "timestamp" in data
 
 
+class TestEvaluateAll:
+    def _create_flag(
+        self, client: TestClient, admin_headers: dict[str, str], key: str, **fields: object
+    ) -> str:
+        resp = client.post(
+            "/api/v1/flags", json={"key": key, "name": key, **fields}, headers=admin_headers
+        )
+        return str(resp.json()["id"])
+
+    def test_returns_every_non_archived_flag(
+        self, client: TestClient, admin_headers: dict[str, str], read_headers: dict[str, str]
+    ) -> None:
+        flag_id, env_id = _setup_flag_with_env(client, admin_headers)
+        client.post(
+            "/api/v1/rules",
+            json={
+                "flag_id": flag_id,
+                "environment_id": env_id,
+                "priority": 1,
+                "conditions": [{"attribute": "plan", "operator": "equals", "value": "pro"}],
+                "variant": "pro",
+            },
+            headers=admin_headers,
+        )
+        self._create_flag(client, admin_headers, "b-off")
+        self._create_flag(client, admin_headers, "a-allow", enabled=True, targeted_allow=["u1"])
+        archived = self._create_flag(client, admin_headers, "c-archived", enabled=True)
+        client.patch(f"/api/v1/flags/{archived}", json={"archived": True}, headers=admin_headers)
+
+        resp = client.post(
+            "/api/v1/evaluate/all",
+            json={"env_key": "production", "user_id": "u1", "attributes": {"plan": "pro"}},
+            headers=read_headers,
+        )
+        assert resp.status_code == 200
+        results = {r["flag_key"]: r for r in resp.json()["results"]}
+        assert list(results) == ["a-allow", "b-off", "eval-flag"]
+        assert results["a-allow"]["reason"] == "targeted_allow"
+        assert results["b-off"]["reason"] == "disabled"
+        assert results["eval-flag"]["reason"] == "rule_match"
+        assert results["eval-flag"]["variant"] == "pro"
+
+    def test_matches_single_evaluation(
+        self, client: TestClient, admin_headers: dict[str, str]
+    ) -> None:
+        _setup_flag_with_env(client, admin_headers, rollout=30.0)
+        self._create_flag(client, admin_headers, "other", enabled=True, rollout_percentage=70)
+        for env_key in ("production", "unknown-env"):
+            for i in range(10):
+                all_resp = client.post(
+                    "/api/v1/evaluate/all",
+                    json={"env_key": env_key, "user_id": f"user-{i}"},
+                    headers=admin_headers,
+                )
+                for result in all_resp.json()["results"]:
+                    single = client.post(
+                        "/api/v1/evaluate",
+                        json={
+                            "flag_key": result["flag_key"],
+                            "env_key": env_key,
+                            "user_id": f"user-{i}",
+                        },
+                        headers=admin_headers,
+                    ).json()
+                    for field in ("enabled", "variant", "reason", "rule_id", "env_key"):
+                        assert result[field] == single[field]
+
+    def test_requires_key(self, client: TestClient) -> None:
+        resp = client.post("/api/v1/evaluate/all", json={"user_id": "u1"})
+        assert resp.status_code == 401
+
+
+class TestEvaluateStream:
+    def test_streams_results_in_order(
+        self, client: TestClient, admin_headers: dict[str, str], read_headers: dict[str, str]
+    ) -> None:
+        _setup_flag_with_env(client, admin_headers, rollout=50.0, deny=["blocked"])
+        requests = [
+            {"flag_key": "eval-flag", "env_key": "production", "user_id": f"user-{i}"}
+            for i in range(2000)
+        ]
+        requests.append({"flag_key": "eval-flag", "env_key": "production", "user_id": "blocked"})
+        requests.append({"flag_key": "missing", "user_id": "u1"})
+        body = "\n".join(json.dumps(r) for r in requests)
+
+        resp = client.post("/api/v1/evaluate/stream", content=body, headers=read_headers)
+        assert resp.status_code == 200
+        assert resp.headers["content-type"] == "application/x-ndjson"
+        results = [json.loads(line) for line in resp.text.splitlines()]
+        assert len(results) == len(requests)
+        bulk = client.post(
+            "/api/v1/evaluate", json={"evaluations": requests}, headers=read_headers
+        ).json()["results"]
+        for streamed, expected in zip(results, bulk, strict=True):
+            for field in ("flag_key", "env_key", "enabled", "variant", "reason"):
+                assert streamed[field] == expected[field]
+        assert results[-2]["reason"] == "targeted_deny"
+        assert results[-1]["reason"] == "disabled"
+
+    def test_invalid_lines_reported_inline(
+        self, client: TestClient, admin_headers: dict[str, str]
+    ) -> None:
+        _setup_flag_with_env(client, admin_headers)
+        body = (
+            '{"flag_key": "eval-flag", "user_id": "u1"}\n'
+            "\n"
+            "not json\n"
+            '{"flag_key": "eval-flag"}\n'
+            '{"flag_key": "eval-flag", "user_id": "u2"}'
+        )
+        resp = client.post("/api/v1/evaluate/stream", content=body, headers=admin_headers)
+        results = [json.loads(line) for line in resp.text.splitlines()]
+        assert [r.get("index") for r in results] == [None, 1, 2, None]
+        assert results[2]["detail"][0]["loc"] == ["user_id"]
+        assert results[3]["flag_key"] == "eval-flag"
+
+    def test_empty_body(self, client: TestClient, read_headers: dict[str, str]) -> None:
+        resp = client.post("/api/v1/evaluate/stream", content=b"", headers=read_headers)
+        assert resp.status_code == 200
+        assert resp.text == ""
+
+    def test_requires_key(self, client: TestClient) -> None:
+        resp = client.post("/api/v1/evaluate/stream", content=b"{}")
+        assert resp.status_code == 401
+
+
 class TestPredicates:
     """Test individual predicate operators via rule evaluation."""
 
@@ -0,0 +1,125 @@
+"""Tests for the configuration snapshot export endpoint."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from app.core.export import etag_matches
+from app.core.snapshot import reset_snapshot
+
+if TYPE_CHECKING:
+    from fastapi.testclient import TestClient
+
+
+def _seed(client: TestClient, admin_headers: dict[str, str]) -> tuple[str, str]:
+    flag = client.post(
+        "/api/v1/flags",
+        json={
+            "key": "checkout",
+            "name": "Checkout",
+            "enabled": True,
+            "default_variant": "blue",
+            "rollout_percentage": 20,
+            "targeted_allow": ["zed", "amy"],
+        },
+        headers=admin_headers,
+    ).json()
+    env = client.post(
+        "/api/v1/environments",
+        json={"key": "production", "name": "Production"},
+        headers=admin_headers,
+    ).json()
+    archived = client.post(
+        "/api/v1/flags", json={"key": "old", "name": "Old", "enabled": True}, headers=admin_headers
+    ).json()
+    client.patch(f"/api/v1/flags/{archived['id']}", json={"archived": True}, headers=admin_headers)
+    for priority, variant, enabled in ((2, "second", True), (1, "first", True), (0, "off", False)):
+        client.post(
+            "/api/v1/rules",
+            json={
+                "flag_id": flag["id"],
+                "environment_id": env["id"],
+                "priority": priority,
+                "conditions": [{"attribute": "plan", "operator": "equals", "value": variant}],
+                "variant": variant,
+                "enabled": enabled,
+            },
+            headers=admin_headers,
+        )
+    return flag["id"], env["id"]
+
+
+class TestSnapshotExport:
+    def test_exports_effective_config(
+        self, client: TestClient, admin_headers: dict[str, str], read_headers: dict[str, str]
+    ) -> None:
+        _seed(client, admin_headers)
+        resp = client.get(
+            "/api/v1/snapshot", params={"env_key": "production"}, headers=read_headers
+        )
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["env_key"] == "production"
+        assert list(data["flags"]) == ["checkout"]
+        flag = data["flags"]["checkout"]
+        assert flag["enabled"] is True
+        assert flag["default_variant"] == "blue"
+        assert flag["rollout_percentage"] == 20
+        assert flag["targeted_allow"] == ["amy", "zed"]
+        assert [r["variant"] for r in flag["rules"]] == ["first", "second"]
+        assert flag["rules"][0]["conditions"][0]["value"] == "first"
+        assert resp.headers["etag"].startswith('"')
+        assert resp.headers["x-config-version"].isdigit()
+
+    def test_unknown_env_exports_flag_level_config(
+        self, client: TestClient, admin_headers: dict[str, str]
+    ) -> None:
+        _seed(client, admin_headers)
+        resp = client.get("/api/v1/snapshot", params={"env_key": "nope"}, headers=admin_headers)
+        assert resp.json()["flags"]["checkout"]["rules"] == []
+
+    def test_if_none_match_returns_304(
+        self, client: TestClient, admin_headers: dict[str, str], read_headers: dict[str, str]
+    ) -> None:
+        flag_id, _env_id = _seed(client, admin_headers)
+        etag = client.get("/api/v1/snapshot", headers=read_headers).headers["etag"]
+
+        resp = client.get("/api/v1/snapshot", headers={**read_headers, "If-None-Match": etag})
+        assert resp.status_code == 304
+        assert resp.content == b""
+        assert resp.headers["etag"] == etag
+
+        client.patch(
+            f"/api/v1/flags/{flag_id}", json={"rollout_percentage": 30}, headers=admin_headers
+        )
+        resp = client.get("/api/v1/snapshot", headers={**read_headers, "If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.headers["etag"] != etag
+
+    def test_etag_depends_only_on_content(
+        self, client: TestClient, admin_headers: dict[str, str], read_headers: dict[str, str]
+    ) -> None:
+        _seed(client, admin_headers)
+        first = client.get("/api/v1/snapshot", headers=read_headers)
+        reset_snapshot()
+        client.post(
+            "/api/v1/environments",
+            json={"key": "staging", "name": "Staging"},
+            headers=admin_headers,
+        )
+        second = client.get("/api/v1/snapshot", headers=read_headers)
+        assert second.headers["x-config-version"] != first.headers["x-config-version"]
+        assert second.headers["etag"] == first.headers["etag"]
+        assert second.content == first.content
+
+    def test_requires_key(self, client: TestClient) -> None:
+        assert client.get("/api/v1/snapshot").status_code == 401
+
+
+class TestEtagMatches:
+    def test_matching(self) -> None:
+        assert etag_matches('"a"', '"a"')
+        assert etag_matches('"b", W/"a"', '"a"')
+        assert etag_matches("*", '"a"')
+        assert not etag_matches('"b"', '"a"')
+        assert not etag_matches(None, '"a"')
@@ -0,0 +1,186 @@
+"""Tests for compiled predicate matchers.
+
+The compiled matchers must agree with the original per-evaluation predicate
+logic for every operator and value combination, so that logic is kept here as
+the reference implementation.
+"""
+
+from __future__ import annotations
+
+import itertools
+
+import pytest
+
+from app.core.matchers import (
+    CompareMatcher,
+    EqualsMatcher,
+    InListMatcher,
+    Matcher,
+    compile_predicate,
+    match_all,
+)
+from app.schemas.schemas import Predicate
+
+
+def _reference_coerce_eq(a: object, b: object) -> bool:
+    if isinstance(a, bool) or isinstance(b, bool):
+        return bool(a) == bool(b)
+    try:
+        return float(a) == float(b)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return str(a) == str(b)
+
+
+def _reference_numeric_compare(a: object, b: object, op: str) -> bool:
+    try:
+        fa, fb = float(a), float(b)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return False
+    return {"gt": fa > fb, "gte": fa >= fb, "lt": fa < fb, "lte": fa <= fb}[op]
+
+
+def _reference_match(predicate: Predicate, attributes: dict[str, object]) -> bool:
+    attr_val = attributes.get(predicate.attribute)
+    if predicate.operator == "exists":
+        return predicate.attribute in attributes
+    if attr_val is None:
+        return False
+    op, val = predicate.operator, predicate.value
+    if op == "equals":
+        return _reference_coerce_eq(attr_val, val)
+    if op == "not_equals":
+        return not _reference_coerce_eq(attr_val, val)
+    if op == "contains":
+        return isinstance(attr_val, str) and isinstance(val, str) and val in attr_val
+    if op == "in_list":
+        if isinstance(val, list):
+            return any(_reference_coerce_eq(attr_val, v) for v in val)
+        return False
+    if op in ("gt", "gte", "lt", "lte"):
+        return _reference_numeric_compare(attr_val, val, op)
+    return False
+
+
+ATTRIBUTE_VALUES: list[object] = [
+    "US",
+    "us",
+    "",
+    "5",
+    "5.0",
+    " 5 ",
+    "abc5",
+    "True",
+    "nan",
+    "inf",
+    0,
+    5,
+    -5,
+    5.0,
+    5.5,
+    True,
+    False,
+    ["US", "CA"],
+    [],
+]
+
+SCALAR_PREDICATE_VALUES: list[object] = [
+    "US",
+    "5",
+    "5.0",
+    "",
+    "abc",
+    "True",
+    5,
+    0,
+    5.5,
+    -1,
+    True,
+    False,
+    None,
+]
+
+LIST_PREDICATE_VALUES: list[object] = [
+    ["US", "CA"],
+    ["5", 6],
+    [5, "abc"],
+    [0],
+    [],
+    ["", "1e1"],
+    [1.5, "US"],
+    "not-a-list",
+]
+
+
+def _cases() -> list[tuple[str, object]]:
+    scalar_ops = ["equals", "not_equals", "contains", "gt", "gte", "lt", "lte"]
+    cases = [(op, v) for op in scalar_ops for v in SCALAR_PREDICATE_VALUES]
+    cases += [("in_list", v) for v in LIST_PREDICATE_VALUES]
+    cases += [("exists", None)]
+    return cases
+
+
+class TestCompiledMatchersAgreeWithReference:
+    @pytest.mark.parametrize(("operator", "value"), _cases())
+    def test_matrix(self, operator: str, value: object) -> None:
+        predicate = Predicate(attribute="attr", operator=operator, value=value)  # type: ignore[arg-type]
+        matcher = compile_predicate(predicate)
+        for attr_value in ATTRIBUTE_VALUES:
+            attributes: dict[str, object] = {"attr": attr_value}
+            assert matcher.match(attributes) is _reference_match(predicate, attributes), (
+                operator,
+                value,
+                attr_value,
+            )
+        assert matcher.match({}) is _reference_match(predicate, {})
+        assert matcher.match({"other": 1}) is _reference_match(predicate, {"other": 1})
+
+
+class TestCompilation:
+    def test_values_are_pre_coerced(self) -> None:
+        matcher = compile_predicate(Predicate(attribute="age", operator="gte", value="18"))
+        assert isinstance(matcher, CompareMatcher)
+        assert matcher.number == 18.0
+
+        matcher = compile_predicate(Predicate(attribute="n", operator="equals", value="7"))
+        assert isinstance(matcher, EqualsMatcher)
+        assert matcher.number == 7.0
+
+    def test_in_list_becomes_sets(self) -> None:
+        matcher = compile_predicate(
+            Predicate(attribute="country", operator="in_list", value=["US", "CA", 3])
+        )
+        assert isinstance(matcher, InListMatcher)
+        assert matcher.numbers == frozenset({3.0})
+        assert matcher.texts == frozenset({"US", "CA", "3"})
+
+    def test_unsatisfiable_predicates_compile_to_never(self) -> None:
+        for predicate in (
+            Predicate(attribute="a", operator="gt", value="abc"),
+            Predicate(attribute="a", operator="contains", value=5),
+            Predicate(attribute="a", operator="in_list", value="US"),
+        ):
+            matcher = compile_predicate(predicate)
+            assert type(matcher) is Matcher
+            assert matcher.match({"a": "abc"}) is False
+
+    def test_match_all(self) -> None:
+        matchers = tuple(
+            compile_predicate(p)
+            for p in (
+                Predicate(attribute="country", operator="equals", value="US"),
+                Predicate(attribute="age", operator="gt", value=18),
+            )
+        )
+        assert match_all(matchers, {"country": "US", "age": 30}) is True
+        assert match_all(matchers, {"country": "US", "age": 10}) is False
+        assert match_all((), {}) is True
+
+    def test_cartesian_combinations_of_in_list(self) -> None:
+        values: list[str | int | float] = ["1", 2, "x", 3.5]
+        for size in range(len(values) + 1):
+            for combo in itertools.combinations(values, size):
+                predicate = Predicate(attribute="a", operator="in_list", value=list(combo))
+                matcher = compile_predicate(predicate)
+                for attr_value in ATTRIBUTE_VALUES:
+                    attributes: dict[str, object] = {"a": attr_value}
+                    assert matcher.match(attributes) is _reference_match(predicate, attributes)
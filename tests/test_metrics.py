@@ -0,0 +1,219 @@
+"""Tests for the Prometheus metrics."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.core.cache import reset_decision_cache
+from app.core.config import reset_settings
+from app.core.metrics import (
+    DB_QUERY_ERRORS,
+    DB_QUERY_SECONDS,
+    EVALUATION_SAMPLER,
+    EVALUATION_SECONDS,
+    UNKNOWN_FLAG,
+    Counter,
+    Histogram,
+    Metric,
+    Sampler,
+    install_query_metrics,
+    reset_metrics,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Generator
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy.orm import Session
+
+
+@pytest.fixture(autouse=True)
+def _fresh_metrics(monkeypatch: pytest.MonkeyPatch) -> Generator[None, None, None]:
+    # Time every evaluation so that counts are exact.
+    monkeypatch.setenv("EVALUATION_TIMING_SAMPLE", "1")
+    reset_settings()
+    EVALUATION_SAMPLER.configure(1)
+    reset_metrics()
+    yield
+    reset_metrics()
+    reset_settings()
+
+
+def _lines(body: str, prefix: str) -> list[str]:
+    return [line for line in body.splitlines() if line.startswith(prefix)]
+
+
+class TestHistogram:
+    def test_buckets_are_cumulative(self) -> None:
+        histogram = Histogram("h_seconds", "Help.", ("kind",), buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 5):
+            histogram.observe(value, ("a",))
+        assert histogram.count(("a",)) == 4
+        assert histogram.total(("a",)) == pytest.approx(5.65)
+        assert histogram.render().splitlines() == [
+            "# HELP h_seconds Help.",
+            "# TYPE h_seconds histogram",
+            'h_seconds_bucket{kind="a",le="0.1"} 2',
+            'h_seconds_bucket{kind="a",le="1.0"} 3',
+            'h_seconds_bucket{kind="a",le="+Inf"} 4',
+            'h_seconds_sum{kind="a"} 5.65',
+            'h_seconds_count{kind="a"} 4',
+        ]
+
+    def test_weighted_observations(self) -> None:
+        histogram = Histogram("h_seconds", "Help.", buckets=(1,))
+        histogram.observe(0.5, weight=10)
+        assert histogram.count() == 10
+        assert histogram.total() == pytest.approx(5.0)
+
+    def test_metric_without_samples_cannot_be_created(self) -> None:
+        class Incomplete(Metric):
+            pass
+
+        with pytest.raises(TypeError, match="abstract"):
+            Incomplete("m", "Help.")  # type: ignore[abstract]
+
+    def test_label_values_are_escaped(self) -> None:
+        counter = Counter("c_total", "Help.", ("path",))
+        counter.inc(('a"b\\c\n',))
+        counter.inc(('a"b\\c\n',), 2)
+        assert counter.render().splitlines()[-1] == 'c_total{path="a\\"b\\\\c\\n"} 3'
+
+
+class TestEvaluationMetrics:
+    def test_evaluations_are_labelled_by_flag_and_reason(
+        self, client: TestClient, admin_headers: dict[str, str], read_headers: dict[str, str]
+    ) -> None:
+        client.post(
+            "/api/v1/flags",
+            json={"key": "f", "name": "F", "enabled": True, "targeted_deny": ["blocked"]},
+            headers=admin_headers,
+        )
+        for flag_key, user_id in (("f", "blocked"), ("f", "other"), ("nope", "other")):
+            client.post(
+                "/api/v1/evaluate",
+                json={"flag_key": flag_key, "env_key": "production", "user_id": user_id},
+                headers=read_headers,
+            )
+        assert EVALUATION_SECONDS.series() == [
+            (UNKNOWN_FLAG, "disabled"),
+            ("f", "default"),
+            ("f", "targeted_deny"),
+        ]
+        assert EVALUATION_SECONDS.count(("f", "default")) == 1
+
+    def test_bulk_and_all_evaluations_are_recorded(
+        self, client: TestClient, admin_headers: dict[str, str], read_headers: dict[str, str]
+    ) -> None:
+        client.post("/api/v1/flags", json={"key": "f", "name": "F"}, headers=admin_headers)
+        request = {"flag_key": "f", "env_key": "production", "user_id": "u"}
+        client.post(
+            "/api/v1/evaluate",
+            json={"evaluations": [request, request, {**request, "flag_key": "nope"}]},
+            headers=read_headers,
+        )
+        client.post(
+            "/api/v1/evaluate/all",
+            json={"env_key": "production", "user_id": "u"},
+            headers=read_headers,
+        )
+        # Identical bulk requests are decided once.
+        assert EVALUATION_SECONDS.count(("f", "disabled")) == 2
+        assert EVALUATION_SECONDS.count((UNKNOWN_FLAG, "disabled")) == 1
+
+
+class TestSampler:
+    def test_picks_about_one_in_every(self) -> None:
+        sampler = Sampler(10)
+        picked = sum(bool(sampler.take()) for _ in range(Sampler.PATTERN_LENGTH))
+        assert 0.09 < picked / Sampler.PATTERN_LENGTH < 0.11
+        assert all(Sampler(1).take() for _ in range(100))
+        assert not any(Sampler(0).take() for _ in range(100))
+        with pytest.raises(ValueError, match="negative"):
+            Sampler(-1)
+
+    def test_sampled_evaluations_are_scaled(
+        self, client: TestClient, admin_headers: dict[str, str], read_headers: dict[str, str]
+    ) -> None:
+        client.post("/api/v1/flags", json={"key": "f", "name": "F"}, headers=admin_headers)
+        EVALUATION_SAMPLER.configure(4)
+        request = {"flag_key": "f", "env_key": "production", "user_id": "u"}
+        for _ in range(200):
+            client.post("/api/v1/evaluate", json=request, headers=read_headers)
+        assert EVALUATION_SECONDS.count(("f", "disabled")) % 4 == 0
+        assert 100 <= EVALUATION_SECONDS.count(("f", "disabled")) <= 300
+
+
+class TestQueryMetrics:
+    def test_statements_are_timed_by_type(self, db_session: Session) -> None:
+        install_query_metrics()
+        db_session.execute(text("SELECT 1"))
+        with pytest.raises(OperationalError):
+            db_session.execute(text("SELECT * FROM missing_table"))
+        assert DB_QUERY_SECONDS.count(("SELECT",)) == 1
+        assert DB_QUERY_ERRORS.value(("SELECT",)) == 1
+
+
+class TestMetricsEndpoint:
+    def test_exposition(
+        self, client: TestClient, admin_headers: dict[str, str], read_headers: dict[str, str]
+    ) -> None:
+        flag_id = client.post(
+            "/api/v1/flags", json={"key": "f", "name": "F"}, headers=admin_headers
+        ).json()["id"]
+        client.get(f"/api/v1/flags/{flag_id}", headers=admin_headers)
+        client.get(f"/api/v1/flags/{flag_id}/targeting/allow", headers=admin_headers)
+        client.get("/no/such/path")
+
+        resp = client.get("/api/v1/metrics")
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+        body = resp.text
+        # Routes are labelled by template, not by the requested path.
+        assert _lines(
+            body,
+            'featureflags_http_request_seconds_count{method="GET",route="/api/v1/flags/{flag_id}"',
+        ) == [
+            'featureflags_http_request_seconds_count{method="GET",'
+            'route="/api/v1/flags/{flag_id}",status="200"} 1'
+        ]
+        assert _lines(
+            body,
+            'featureflags_http_request_seconds_count{method="GET",'
+            'route="/api/v1/flags/{flag_id}/targeting/{kind}",status="200"}',
+        )
+        assert _lines(body, 'featureflags_http_request_seconds_count{method="GET",route="(unm')
+        assert _lines(body, 'featureflags_db_query_seconds_count{statement="INSERT"}')
+        assert _lines(body, "featureflags_threadpool_threads ")
+        assert _lines(body, "featureflags_decision_cache_hit_ratio ") == [
+            "featureflags_decision_cache_hit_ratio 0"
+        ]
+
+    def test_cache_hit_ratio(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        client: TestClient,
+        admin_headers: dict[str, str],
+        read_headers: dict[str, str],
+    ) -> None:
+        monkeypatch.setenv("DECISION_CACHE_SIZE", "100")
+        reset_settings()
+        reset_decision_cache()
+        client.post("/api/v1/flags", json={"key": "f", "name": "F"}, headers=admin_headers)
+        for _ in range(4):
+            client.post(
+                "/api/v1/evaluate",
+                json={"flag_key": "f", "env_key": "production", "user_id": "u"},
+                headers=read_headers,
+            )
+        body = client.get("/api/v1/metrics").text
+        assert _lines(body, "featureflags_decision_cache_hits_total ") == [
+            "featureflags_decision_cache_hits_total 3"
+        ]
+        assert _lines(body, "featureflags_decision_cache_hit_ratio ") == [
+            "featureflags_decision_cache_hit_ratio 0.75"
+        ]
@@ -0,0 +1,136 @@
+"""Tests for the hash-indexed rule lookup."""
+
+from __future__ import annotations
+
+import random
+
+from app.core.matchers import compile_predicate, match_all
+from app.core.rule_index import INDEX_MIN_RULES, RuleIndex
+from app.core.snapshot import CompiledRule
+from app.schemas.schemas import Predicate
+
+
+def _rule(priority: int, *conditions: dict[str, object]) -> CompiledRule:
+    return CompiledRule(
+        id=f"rule-{priority}",
+        priority=priority,
+        variant=f"v{priority}",
+        matchers=tuple(compile_predicate(Predicate(**c)) for c in conditions),  # type: ignore[arg-type]
+    )
+
+
+def _linear_first_match(
+    rules: tuple[CompiledRule, ...], attributes: dict[str, object]
+) -> CompiledRule | None:
+    for rule in rules:
+        if match_all(rule.matchers, attributes):
+            return rule
+    return None
+
+
+COUNTRIES = ["US", "CA", "UK", "DE", "EG"]
+PLANS = ["free", "pro", "team"]
+
+
+def _random_condition(rng: random.Random) -> dict[str, object]:
+    kind = rng.choice(["country_eq", "country_in", "tenant", "plan", "age", "beta", "flag"])
+    if kind == "country_eq":
+        return {"attribute": "country", "operator": "equals", "value": rng.choice(COUNTRIES)}
+    if kind == "country_in":
+        return {
+            "attribute": "country",
+            "operator": "in_list",
+            "value": rng.sample(COUNTRIES, rng.randint(0, 3)),
+        }
+    if kind == "tenant":
+        return {"attribute": "tenant_id", "operator": "equals", "value": rng.choice([1, "2", 3.0])}
+    if kind == "plan":
+        return {"attribute": "plan", "operator": "not_equals", "value": rng.choice(PLANS)}
+    if kind == "age":
+        return {"attribute": "age", "operator": "gte", "value": rng.randint(10, 60)}
+    if kind == "beta":
+        return {"attribute": "beta", "operator": "equals", "value": rng.choice([True, False])}
+    return {"attribute": "country", "operator": "exists"}
+
+
+def _random_attributes(rng: random.Random) -> dict[str, object]:
+    attributes: dict[str, object] = {}
+    if rng.random() < 0.9:
+        attributes["country"] = rng.choice([*COUNTRIES, True, "us", 1])
+    if rng.random() < 0.7:
+        attributes["tenant_id"] = rng.choice([1, "1", "2.0", 3, "3", "x", False])
+    if rng.random() < 0.7:
+        attributes["plan"] = rng.choice(PLANS)
+    if rng.random() < 0.5:
+        attributes["age"] = rng.randint(0, 80)
+    if rng.random() < 0.5:
+        attributes["beta"] = rng.choice([True, False, "yes", 0])
+    return attributes
+
+
+class TestRuleIndex:
+    def test_small_rule_sets_are_not_indexed(self) -> None:
+        rules = tuple(
+            _rule(i, {"attribute": "country", "operator": "equals", "value": "US"})
+            for i in range(INDEX_MIN_RULES - 1)
+        )
+        assert RuleIndex(rules).by_attribute == {}
+
+    def test_only_candidate_rules_are_checked(self) -> None:
+        rules = tuple(
+            _rule(i, {"attribute": "tenant_id", "operator": "equals", "value": f"t{i}"})
+            for i in range(200)
+        )
+        index = RuleIndex(rules)
+        assert index.unindexed == []
+        assert list(index._candidates({"tenant_id": "t150"})) == [150]
+        assert list(index._candidates({"tenant_id": "missing"})) == []
+        match = index.first_match({"tenant_id": "t150"})
+        assert match is not None
+        assert match.priority == 150
+
+    def test_lowest_priority_wins_across_index_and_unindexed(self) -> None:
+        rules = (
+            _rule(0, {"attribute": "age", "operator": "gt", "value": 100}),
+            _rule(1, {"attribute": "country", "operator": "exists"}),
+            *(
+                _rule(i, {"attribute": "country", "operator": "in_list", "value": ["US", "CA"]})
+                for i in range(2, 20)
+            ),
+        )
+        match = RuleIndex(rules).first_match({"country": "US"})
+        assert match is not None
+        assert match.priority == 1
+
+    def test_numeric_coercion_is_preserved(self) -> None:
+        rules = tuple(
+            _rule(i, {"attribute": "tenant_id", "operator": "equals", "value": i})
+            for i in range(20)
+        )
+        index = RuleIndex(rules)
+        for value in (7, "7", "7.0", 7.0, " 7 "):
+            match = index.first_match({"tenant_id": value})
+            assert match is not None
+            assert match.priority == 7
+
+    def test_boolean_attribute_falls_back_to_all_rules_on_attribute(self) -> None:
+        rules = tuple(
+            _rule(i, {"attribute": "country", "operator": "equals", "value": f"c{i}"})
+            for i in range(20)
+        )
+        # bool(True) == bool("c0"), so every rule on the attribute can match.
+        match = RuleIndex(rules).first_match({"country": True})
+        assert match is not None
+        assert match.priority == 0
+
+    def test_matches_linear_scan_on_random_configs(self) -> None:
+        rng = random.Random(1234)
+        for _ in range(200):
+            rules = tuple(
+                _rule(p, *(_random_condition(rng) for _ in range(rng.randint(1, 3))))
+                for p in sorted(rng.sample(range(1000), rng.randint(INDEX_MIN_RULES, 60)))
+            )
+            index = RuleIndex(rules)
+            for _ in range(25):
+                attributes = _random_attributes(rng)
+                assert index.first_match(attributes) == _linear_first_match(rules, attributes)
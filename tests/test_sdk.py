@@ -0,0 +1,307 @@
+"""Conformance and client tests for the embeddable ``featureflags`` SDK."""
+
+from __future__ import annotations
+
+import itertools
+import json
+import random
+import subprocess
+import sys
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING
+
+import pytest
+
+from app.core.evaluation import decide
+from app.core.snapshot import get_snapshot
+from app.models.models import Environment, Flag, FlagEnvironment, Rule, TargetingEntry
+from featureflags import FlagClient, SnapshotError
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy.orm import Session
+
+ENVS = ("production", "dev")
+
+CONDITIONS: list[list[dict[str, object]]] = [
+    [{"attribute": "plan", "operator": "equals", "value": "pro"}],
+    [{"attribute": "seats", "operator": "equals", "value": "10"}],
+    [{"attribute": "beta", "operator": "equals", "value": True}],
+    [{"attribute": "plan", "operator": "not_equals", "value": "free"}],
+    [{"attribute": "email", "operator": "contains", "value": "@corp"}],
+    [{"attribute": "country", "operator": "in_list", "value": ["DE", "FR", 1, "2.5"]}],
+    [{"attribute": "seats", "operator": "gt", "value": 50}],
+    [{"attribute": "seats", "operator": "lte", "value": "5"}],
+    [
+        {"attribute": "age", "operator": "gte", "value": 18},
+        {"attribute": "vip", "operator": "exists"},
+    ],
+    [{"attribute": "user_id", "operator": "in_list", "value": ["user-3", "user-7"]}],
+    [{"attribute": "score", "operator": "lt", "value": "nope"}],
+    [],
+]
+
+ATTRIBUTE_VALUES: dict[str, list[object]] = {
+    "plan": ["pro", "free", "enterprise", 1],
+    "seats": [10, "10", 10.0, 3, 75, "many", True],
+    "beta": [True, False, "yes", 0],
+    "email": ["a@corp.io", "b@home.io", 5],
+    "country": ["DE", "US", 1, "1", 2.5, True],
+    "age": [17, 18, "30"],
+    "vip": ["x"],
+    "score": [1],
+}
+
+
+def _seed(db_session: Session, rng: random.Random) -> None:
+    envs = [Environment(key=key, name=key) for key in ENVS]
+    flags = [
+        Flag(
+            key=f"flag-{i}",
+            name=f"Flag {i}",
+            enabled=i != 5,
+            archived=i == 6,
+            default_variant=rng.choice(["off", "on", "blue"]),
+            rollout_percentage=rng.choice([None, 0.0, 12.5, 50.0, 99.99, 100.0]),
+        )
+        for i in range(10)
+    ]
+    db_session.add_all([*envs, *flags])
+    db_session.flush()
+    for i, flag in enumerate(flags):
+        allow = ["user-1", "user-2"] if i % 2 else []
+        deny = ["user-2"] if i % 3 == 0 else []
+        db_session.add_all(
+            [
+                *(TargetingEntry(flag_id=flag.id, kind="allow", user_id=u) for u in allow),
+                *(TargetingEntry(flag_id=flag.id, kind="deny", user_id=u) for u in deny),
+            ]
+        )
+    for flag in flags[:4]:
+        db_session.add(
+            FlagEnvironment(
+                flag_id=flag.id,
+                environment_id=envs[1].id,
+                enabled=flag.key != "flag-3",
+                rollout_percentage=rng.choice([None, 30.0]),
+                default_variant="green",
+            )
+        )
+        db_session.add(
+            TargetingEntry(
+                flag_id=flag.id, environment_id=envs[1].id, kind="deny", user_id="user-4"
+            )
+        )
+    for flag, env in itertools.product(flags, envs):
+        # More than INDEX_MIN_RULES rules, so the server side uses its rule index.
+        for priority in range(rng.randint(0, 10)):
+            db_session.add(
+                Rule(
+                    flag_id=flag.id,
+                    environment_id=env.id,
+                    priority=priority,
+                    conditions=json.dumps(rng.choice(CONDITIONS[:-1])),
+                    enabled=rng.random() > 0.1,
+                    variant=f"v{priority}",
+                )
+            )
+    db_session.commit()
+
+
+def _users(rng: random.Random, count: int) -> Iterator[tuple[str, dict[str, object]]]:
+    for i in range(count):
+        attributes = {
+            name: rng.choice(values)
+            for name, values in ATTRIBUTE_VALUES.items()
+            if rng.random() < 0.5
+        }
+        yield f"user-{i}", attributes
+
+
+def _export(client: TestClient, headers: dict[str, str], env_key: str) -> bytes:
+    resp = client.get("/api/v1/snapshot", params={"env_key": env_key}, headers=headers)
+    assert resp.status_code == 200
+    return resp.content
+
+
+class TestConformance:
+    @pytest.mark.parametrize("seed", [1, 2, 3])
+    def test_matches_server_engine(
+        self,
+        client: TestClient,
+        db_session: Session,
+        read_headers: dict[str, str],
+        tmp_path: Path,
+        seed: int,
+    ) -> None:
+        rng = random.Random(seed)
+        _seed(db_session, rng)
+        snapshot = get_snapshot(db_session)
+        flag_keys = [f"flag-{i}" for i in range(10)] + ["missing"]
+        users = list(_users(rng, 300))
+        reasons: Counter[str] = Counter()
+        for env_key in ENVS:
+            path = tmp_path / f"{env_key}.json"
+            path.write_bytes(_export(client, read_headers, env_key))
+            with FlagClient(path, env_key=env_key, refresh_interval=0) as sdk:
+                for flag_key, (user_id, attributes) in itertools.product(flag_keys, users):
+                    expected = decide(
+                        snapshot.lookup(flag_key, env_key),
+                        env_key,
+                        user_id,
+                        attributes,  # type: ignore[arg-type]
+                    )
+                    got = sdk.evaluate(flag_key, user_id, attributes)
+                    reasons[got.reason] += 1
+                    assert tuple(got) == tuple(expected), (env_key, flag_key, user_id, attributes)
+        # Every step of the evaluation order was exercised.
+        assert set(reasons) == {
+            "disabled",
+            "targeted_deny",
+            "targeted_allow",
+            "rule_match",
+            "rollout",
+            "default",
+        }
+
+    def test_rollout_buckets_match(
+        self, client: TestClient, admin_headers: dict[str, str], tmp_path: Path
+    ) -> None:
+        client.post(
+            "/api/v1/flags",
+            json={"key": "half", "name": "Half", "enabled": True, "rollout_percentage": 50},
+            headers=admin_headers,
+        )
+        client.post(
+            "/api/v1/environments", json={"key": "production", "name": "P"}, headers=admin_headers
+        )
+        path = tmp_path / "snapshot.json"
+        path.write_bytes(_export(client, admin_headers, "production"))
+        requests = [{"flag_key": "half", "user_id": f"u{i}"} for i in range(200)]
+        results = client.post(
+            "/api/v1/evaluate", json={"evaluations": requests}, headers=admin_headers
+        ).json()["results"]
+        with FlagClient(path, refresh_interval=0) as sdk:
+            assert [sdk.is_enabled("half", f"u{i}") for i in range(200)] == [
+                r["enabled"] for r in results
+            ]
+
+
+class _Proxy(BaseHTTPRequestHandler):
+    """Serves GET requests from the app behind a FastAPI test client."""
+
+    client: TestClient
+    seen: list[dict[str, str]]
+
+    def do_GET(self) -> None:  # noqa: N802
+        headers = {k: v for k, v in self.headers.items() if k.lower() != "host"}
+        self.seen.append(headers)
+        resp = self.client.get(self.path, headers=headers)
+        self.send_response(resp.status_code)
+        for name in ("ETag", "X-Config-Version", "Content-Type"):
+            if name in resp.headers:
+                self.send_header(name, resp.headers[name])
+        self.send_header("Content-Length", str(len(resp.content)))
+        self.end_headers()
+        self.wfile.write(resp.content)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture()
+def server_url(client: TestClient) -> Iterator[tuple[str, list[dict[str, str]]]]:
+    seen: list[dict[str, str]] = []
+    handler = type("Handler", (_Proxy,), {"client": client, "seen": seen})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}", seen
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class TestFlagClient:
+    def test_bootstraps_and_refreshes_from_endpoint(
+        self,
+        client: TestClient,
+        admin_headers: dict[str, str],
+        read_headers: dict[str, str],
+        server_url: tuple[str, list[dict[str, str]]],
+    ) -> None:
+        url, seen = server_url
+        flag = client.post(
+            "/api/v1/flags",
+            json={"key": "f", "name": "F", "enabled": True, "default_variant": "blue"},
+            headers=admin_headers,
+        ).json()
+        sdk = FlagClient(url, api_key=read_headers["X-API-Key"], refresh_interval=0)
+        assert sdk.variant("f", "u1") == "blue"
+        assert sdk.config_version is not None
+        assert sdk.flag_keys == {"f"}
+
+        assert sdk.refresh() is False
+        assert seen[-1]["If-None-Match"] == sdk.etag
+
+        client.patch(f"/api/v1/flags/{flag['id']}", json={"enabled": False}, headers=admin_headers)
+        assert sdk.refresh() is True
+        assert sdk.evaluate("f", "u1").reason == "disabled"
+
+    def test_bad_key_fails_bootstrap(self, server_url: tuple[str, list[dict[str, str]]]) -> None:
+        with pytest.raises(SnapshotError, match="HTTP 401"):
+            FlagClient(server_url[0], api_key="wrong", refresh_interval=0)
+
+    def test_background_refresh_from_file(self, tmp_path: Path) -> None:
+        path = tmp_path / "snapshot.json"
+        document: dict[str, object] = {"env_key": "production", "flags": {}}
+        path.write_text(json.dumps(document))
+        with FlagClient(path, refresh_interval=0.01) as sdk:
+            assert sdk.evaluate("f", "u1").reason == "disabled"
+            document["flags"] = {
+                "f": {
+                    "enabled": True,
+                    "default_variant": "on",
+                    "rollout_percentage": None,
+                    "targeted_allow": [],
+                    "targeted_deny": ["u1"],
+                    "rules": [],
+                }
+            }
+            path.write_text(json.dumps(document))
+            for _ in range(500):
+                if sdk.flag_keys:
+                    break
+                threading.Event().wait(0.01)
+            assert sdk.evaluate("f", "u1").reason == "targeted_deny"
+            assert sdk.evaluate("f", "u2").reason == "default"
+
+    def test_failed_refresh_keeps_last_config(self, tmp_path: Path) -> None:
+        path = tmp_path / "snapshot.json"
+        path.write_text(json.dumps({"env_key": "production", "flags": {}}))
+        sdk = FlagClient(path, refresh_interval=0)
+        path.write_text("{not json")
+        with pytest.raises(SnapshotError):
+            sdk.refresh()
+        assert isinstance(sdk.last_error, SnapshotError)
+        assert sdk.evaluate("f", "u1").reason == "disabled"
+
+    def test_rejects_other_environment(self, tmp_path: Path) -> None:
+        path = tmp_path / "snapshot.json"
+        path.write_text(json.dumps({"env_key": "dev", "flags": {}}))
+        with pytest.raises(SnapshotError, match="'dev'"):
+            FlagClient(path, refresh_interval=0)
+
+    def test_sdk_does_not_import_service(self) -> None:
+        code = (
+            "import sys, featureflags; "
+            "bad = [m for m in ('app', 'fastapi', 'sqlalchemy', 'pydantic') if m in sys.modules]; "
+            "sys.exit(bool(bad))"
+        )
+        assert subprocess.run([sys.executable, "-c", code], check=False).returncode == 0
@@ -0,0 +1,215 @@
+"""Tests for the snapshot file shared by worker processes."""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+from app.core.changes import FLAG, latest_version, record_change
+from app.core.config import reset_settings
+from app.core.shared_snapshot import MappedTargetingList, SharedSnapshotFile
+from app.core.snapshot import get_config_version, get_snapshot, load_shared_snapshot, reset_snapshot
+from app.core.targeting import ALLOW, DENY
+from app.models.models import Environment, Flag, TargetingEntry
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Generator
+    from contextlib import AbstractContextManager
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy.orm import Session
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture()
+def shared_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Generator[Path, None, None]:
+    """Enable the shared snapshot file in a fresh directory."""
+    directory = tmp_path / "shared"
+    monkeypatch.setenv("SHARED_SNAPSHOT_DIR", str(directory))
+    reset_settings()
+    reset_snapshot()
+    yield directory
+    reset_snapshot()
+    reset_settings()
+
+
+@pytest.fixture()
+def shared_file(tmp_path: Path) -> Generator[SharedSnapshotFile, None, None]:
+    shared = SharedSnapshotFile(tmp_path / "shared")
+    yield shared
+    shared.close()
+
+
+def _seed(db_session: Session, allow: list[str]) -> Flag:
+    flag = Flag(key="f", name="F", enabled=True)
+    db_session.add_all([flag, Environment(key="production", name="Production")])
+    db_session.flush()
+    db_session.add_all(TargetingEntry(flag_id=flag.id, kind=ALLOW, user_id=u) for u in allow)
+    db_session.commit()
+    return flag
+
+
+class TestMappedTargetingList:
+    def test_membership_and_iteration(self, shared_file: SharedSnapshotFile) -> None:
+        users = [f"user-{i}" for i in range(10_000)] + ["ünïcødé", ""]
+        mapped = shared_file.publish(1, {}, {("f", None, ALLOW): users})
+        allow = mapped.lists[("f", None, ALLOW)]
+        assert isinstance(allow, MappedTargetingList)
+        assert len(allow) == len(users)
+        assert all(u in allow for u in users)
+        assert "user-10000" not in allow
+        assert "user-" not in allow
+        assert 42 not in allow
+        assert list(allow) == sorted(users)
+
+    def test_identical_lists_are_stored_once(self, shared_file: SharedSnapshotFile) -> None:
+        members = {
+            ("f", None, ALLOW): ["a", "b"],
+            ("f", "e", ALLOW): ["b", "a"],
+            ("f", None, DENY): [],
+        }
+        mapped = shared_file.publish(1, {"flags": []}, members)
+        assert mapped.lists[("f", None, ALLOW)] is mapped.lists[("f", "e", ALLOW)]
+        assert ("f", None, DENY) not in mapped.lists
+        assert mapped.config == {"flags": []}
+        assert (mapped.stats.lists, mapped.stats.entries, mapped.stats.largest) == (1, 2, 2)
+
+
+class TestSharedSnapshotFile:
+    def test_version_is_shared(self, tmp_path: Path, shared_file: SharedSnapshotFile) -> None:
+        other = SharedSnapshotFile(tmp_path / "shared")
+        try:
+            assert shared_file.version() == 0
+            assert other.advance(3) == 3
+            assert shared_file.version() == 3
+            # Never moves backwards.
+            assert shared_file.advance(2) == 3
+            assert other.version() == 3
+        finally:
+            other.close()
+
+    def test_publish_swaps_the_file(self, shared_file: SharedSnapshotFile) -> None:
+        assert shared_file.read() is None
+        old = shared_file.publish(1, {}, {("f", None, ALLOW): ["old"]})
+        new = shared_file.publish(2, {}, {("f", None, ALLOW): ["new"]})
+        # A reader still holding the old mapping keeps a consistent view.
+        assert "old" in old.lists[("f", None, ALLOW)]
+        assert "new" in new.lists[("f", None, ALLOW)]
+        current = shared_file.read()
+        assert current is not None
+        assert current.version == 2
+        assert [p.name for p in shared_file.path.parent.iterdir() if p.suffix == ".tmp"] == []
+
+    def test_other_process_maps_the_same_snapshot(self, shared_file: SharedSnapshotFile) -> None:
+        shared_file.advance(1)
+        shared_file.publish(1, {}, {("f", None, ALLOW): [f"u{i}" for i in range(1000)]})
+        script = textwrap.dedent(
+            f"""
+            from pathlib import Path
+            from app.core.shared_snapshot import SharedSnapshotFile
+            shared = SharedSnapshotFile(Path({str(shared_file.path.parent)!r}))
+            mapped = shared.read()
+            allow = mapped.lists[("f", None, "allow")]
+            print(shared.version(), mapped.version, "u999" in allow, "u1000" in allow)
+            """
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        assert result.stdout.split() == ["1", "1", "True", "False"]
+
+
+class TestSharedSnapshots:
+    def test_snapshot_is_compiled_from_the_shared_file(
+        self, shared_dir: Path, db_session: Session
+    ) -> None:
+        _seed(db_session, ["a", "b"])
+        snapshot = get_snapshot(db_session)
+        config = snapshot.lookup("f", "production")
+        assert config is not None
+        assert isinstance(config.targeted_allow, MappedTargetingList)
+        assert "a" in config.targeted_allow
+        assert snapshot.version == get_config_version()
+        assert (shared_dir / "snapshot.bin").exists()
+
+    def test_other_workers_map_without_querying(
+        self,
+        shared_dir: Path,
+        db_session: Session,
+        count_queries: Callable[[], AbstractContextManager[list[str]]],
+    ) -> None:
+        _seed(db_session, ["a"])
+        built = get_snapshot(db_session)
+        worker = SharedSnapshotFile(shared_dir)
+        try:
+            with count_queries() as statements:
+                mapped = load_shared_snapshot(db_session, worker, worker.version())
+        finally:
+            worker.close()
+        assert statements == []
+        assert mapped.version == built.version
+        assert mapped.configs.keys() == built.configs.keys()
+
+    def test_write_in_another_worker_triggers_rebuild(
+        self, shared_dir: Path, db_session: Session, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        flag = _seed(db_session, ["a"])
+        before = get_snapshot(db_session)
+        # This worker will not poll the change log again in this test.
+        monkeypatch.setenv("CONFIG_POLL_INTERVAL_SECONDS", "3600")
+        reset_settings()
+        db_session.add(TargetingEntry(flag_id=flag.id, kind=DENY, user_id="a"))
+        record_change(db_session, FLAG, flag.id)
+        db_session.commit()
+        worker = SharedSnapshotFile(shared_dir)
+        try:
+            worker.advance(latest_version(db_session))
+        finally:
+            worker.close()
+        after = get_snapshot(db_session)
+        assert after.version == before.version + 1
+        config = after.lookup("f", "production")
+        assert config is not None
+        assert "a" in config.targeted_deny
+
+    def test_file_from_an_earlier_run_is_rebuilt(
+        self, shared_dir: Path, db_session: Session
+    ) -> None:
+        _seed(db_session, ["a"])
+        earlier = SharedSnapshotFile(shared_dir)
+        try:
+            earlier.publish(0, {"flags": [], "environments": [], "overrides": [], "rules": []}, {})
+        finally:
+            earlier.close()
+        os.utime(shared_dir / "snapshot.bin", (0, 0))
+        snapshot = get_snapshot(db_session)
+        assert snapshot.has_flag("f")
+
+    def test_evaluation_through_the_api(
+        self,
+        shared_dir: Path,
+        client: TestClient,
+        admin_headers: dict[str, str],
+        read_headers: dict[str, str],
+    ) -> None:
+        client.post(
+            "/api/v1/flags",
+            json={"key": "f", "name": "F", "enabled": True, "targeted_deny": ["blocked"]},
+            headers=admin_headers,
+        )
+        for user_id, reason in (("blocked", "targeted_deny"), ("other", "default")):
+            resp = client.post(
+                "/api/v1/evaluate",
+                json={"flag_key": "f", "env_key": "production", "user_id": user_id},
+                headers=read_headers,
+            )
+            assert resp.json()["reason"] == reason
+        stats = client.get("/api/v1/stats/targeting", headers=admin_headers).json()
+        assert stats["entries"] == 1
@@ -0,0 +1,246 @@
+"""Tests for the rollout simulator, its endpoint and its CLI."""
+
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+import pytest
+
+from app.cli import simulate as simulate_cli
+from app.core import bucketing, simulation
+from app.core.evaluation import decide
+from app.core.simulation import RolloutSimulator
+from app.core.snapshot import FlagConfig
+from app.core.streaming import LineSplitter
+from app.core.targeting import EMPTY, TargetingList
+from app.models.models import Environment, Flag
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy.orm import Session
+
+USERS = [f"user-{i}" for i in range(5000)]
+
+
+def _config(
+    rollout: float | None,
+    *,
+    default_variant: str = "on",
+    disabled: bool = False,
+    allow: TargetingList = EMPTY,
+) -> FlagConfig:
+    return FlagConfig(
+        flag_key="sim",
+        disabled=disabled,
+        archived=False,
+        targeted_deny=EMPTY,
+        targeted_allow=allow,
+        rollout_percentage=rollout,
+        default_variant=default_variant,
+        rollout_threshold=None if rollout is None else int(rollout * 100),
+    )
+
+
+def _flipped(current: FlagConfig, proposed: FlagConfig) -> list[str]:
+    return [
+        user_id
+        for user_id in USERS
+        if decide(current, "production", user_id, {}).enabled
+        != decide(proposed, "production", user_id, {}).enabled
+    ]
+
+
+@pytest.fixture(params=["numpy", "python"])
+def batch_path(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(simulation, "np", None)
+        monkeypatch.setattr(bucketing, "np", None)
+    yield
+
+
+class TestRolloutSimulator:
+    @pytest.mark.parametrize(
+        ("current", "proposed"),
+        [(10.0, 25.0), (50.0, 12.5), (None, 30.0), (30.0, 30.0)],
+    )
+    def test_changed_users_match_evaluation(
+        self, batch_path: None, current: float | None, proposed: float
+    ) -> None:
+        config = _config(current)
+        simulator = RolloutSimulator(config, "production", proposed)
+        simulator.feed([u.encode() for u in USERS[:3000]])
+        simulator.feed([u.encode() for u in USERS[3000:]])
+        impact = simulator.report()
+
+        expected = _flipped(config, _config(proposed))
+        assert impact.changed == expected
+        assert impact.turned_on + impact.turned_off == len(expected)
+        assert impact.total == len(USERS)
+        assert sum(impact.histogram) == len(USERS)
+        assert len(impact.histogram) == 100
+        assert impact.enabled_before == sum(
+            decide(config, "production", u, {}).enabled for u in USERS
+        )
+
+    def test_targeted_users_never_change(self, batch_path: None) -> None:
+        allow = TargetingList(USERS[:100])
+        config = _config(0.0, allow=allow)
+        simulator = RolloutSimulator(config, "production", 100.0)
+        simulator.feed([u.encode() for u in USERS])
+        impact = simulator.report()
+        assert impact.targeted == 100
+        assert impact.turned_on == len(USERS) - 100
+        assert not set(impact.changed) & set(USERS[:100])
+
+    def test_disabled_flag_has_no_impact(self) -> None:
+        simulator = RolloutSimulator(_config(10.0, disabled=True), "production", 90.0)
+        simulator.feed([u.encode() for u in USERS])
+        impact = simulator.report()
+        assert impact.turned_on == impact.turned_off == 0
+
+    def test_changed_limit(self) -> None:
+        simulator = RolloutSimulator(_config(0.0), "production", 100.0, changed_limit=10)
+        returned = simulator.feed([u.encode() for u in USERS])
+        impact = simulator.report()
+        assert len(returned) == len(USERS)
+        assert len(impact.changed) == 10
+        assert impact.changed_truncated
+
+    def test_default_off_without_rollout(self) -> None:
+        simulator = RolloutSimulator(_config(None, default_variant="off"), "production", 50.0)
+        simulator.feed([u.encode() for u in USERS])
+        impact = simulator.report()
+        assert impact.enabled_before == 0
+        assert impact.turned_on == impact.enabled_after > 0
+
+    def test_histogram_bins(self) -> None:
+        simulator = RolloutSimulator(_config(10.0), "production", 20.0)
+        simulator.feed([u.encode() for u in USERS])
+        assert len(simulator.histogram()) == 10000
+        assert sum(simulator.histogram(1)) == len(USERS)
+        with pytest.raises(ValueError, match="divide"):
+            simulator.histogram(3)
+
+
+class TestLineSplitter:
+    def test_lines_across_blocks(self) -> None:
+        splitter = LineSplitter()
+        lines = splitter.push(b"a\r\nbb\n\nc")
+        lines += splitter.push(b"c\nd")
+        lines += splitter.finish()
+        assert lines == [b"a", b"bb", b"cc", b"d"]
+
+    def test_max_line_length(self) -> None:
+        splitter = LineSplitter(max_line_length=4)
+        assert splitter.push(b"abcd\nab") == [b"abcd"]
+        with pytest.raises(ValueError, match="longer than 4 bytes"):
+            splitter.push(b"cde")
+        with pytest.raises(ValueError, match="longer than 4 bytes"):
+            LineSplitter(max_line_length=4).push(b"a\nabcde\n")
+
+
+class TestSimulateEndpoint:
+    def _setup(self, client: TestClient, admin_headers: dict[str, str]) -> None:
+        client.post(
+            "/api/v1/flags",
+            json={"key": "sim", "name": "Sim", "enabled": True, "rollout_percentage": 10},
+            headers=admin_headers,
+        )
+        client.post(
+            "/api/v1/environments",
+            json={"key": "production", "name": "Production"},
+            headers=admin_headers,
+        )
+
+    def test_simulate(self, client: TestClient, admin_headers: dict[str, str]) -> None:
+        self._setup(client, admin_headers)
+        resp = client.post(
+            "/api/v1/simulate/rollout",
+            params={"flag_key": "sim", "env_key": "production", "percentage": 25, "bins": 10},
+            content="\n".join(USERS).encode(),
+            headers=admin_headers,
+        )
+        assert resp.status_code == 200
+        data = resp.json()
+        expected = _flipped(_config(10.0), _config(25.0))
+        assert data["total"] == len(USERS)
+        assert data["current_percentage"] == 10.0
+        assert data["turned_on"] == len(expected)
+        assert data["turned_off"] == 0
+        assert data["changed"] == expected
+        assert data["changed_truncated"] is False
+        assert len(data["histogram"]) == 10
+
+    @pytest.mark.parametrize(
+        ("params", "status"),
+        [
+            ({"flag_key": "nope", "env_key": "production", "percentage": 5}, 404),
+            ({"flag_key": "sim", "env_key": "nope", "percentage": 5}, 404),
+            ({"flag_key": "sim", "env_key": "production", "percentage": 5, "bins": 3}, 422),
+            ({"flag_key": "sim", "env_key": "production", "percentage": 101}, 422),
+        ],
+    )
+    def test_invalid(
+        self,
+        client: TestClient,
+        admin_headers: dict[str, str],
+        params: dict[str, object],
+        status: int,
+    ) -> None:
+        self._setup(client, admin_headers)
+        resp = client.post(
+            "/api/v1/simulate/rollout", params=params, content=b"u1\n", headers=admin_headers
+        )
+        assert resp.status_code == status
+
+    def test_requires_admin(self, client: TestClient, read_headers: dict[str, str]) -> None:
+        resp = client.post(
+            "/api/v1/simulate/rollout",
+            params={"flag_key": "sim", "env_key": "production", "percentage": 5},
+            content=b"u1\n",
+            headers=read_headers,
+        )
+        assert resp.status_code == 401
+
+
+class TestSimulateCli:
+    @pytest.fixture()
+    def database(self, file_db: Session) -> None:
+        file_db.add_all(
+            [
+                Flag(key="sim", name="Sim", enabled=True, rollout_percentage=40.0),
+                Environment(key="production", name="Production"),
+            ]
+        )
+        file_db.commit()
+
+    def test_writes_changed_users(
+        self, database: None, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        users = tmp_path / "users.txt"
+        users.write_text("\n".join(USERS) + "\n")
+        changed = tmp_path / "changed.txt"
+        code = simulate_cli.main(
+            ["sim", "production", "20", str(users), "--changed-output", str(changed)]
+        )
+        assert code == 0
+        summary = json.loads(capsys.readouterr().out)
+        expected = _flipped(_config(40.0), _config(20.0))
+        assert changed.read_text().split() == expected
+        assert summary["turned_off"] == len(expected)
+        assert summary["total"] == len(USERS)
+        assert "changed" not in summary
+
+    def test_unknown_flag(
+        self, database: None, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        users = tmp_path / "users.txt"
+        users.write_text("u1\n")
+        assert simulate_cli.main(["nope", "production", "20", str(users)]) == 1
+        assert "nope" in capsys.readouterr().err
@@ -0,0 +1,296 @@
+"""Tests for the compiled in-memory flag snapshot."""
+
+from __future__ import annotations
+
+import json
+import time
+from typing import TYPE_CHECKING
+
+import pytest
+
+from app.core.changes import FLAG, latest_version, record_change
+from app.core.config import reset_settings
+from app.core.snapshot import load_snapshot, mark_config_changed
+from app.models.models import Environment, Flag, FlagEnvironment, Rule, TargetingEntry
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from contextlib import AbstractContextManager
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy.orm import Session
+
+
+def _seed(db_session: Session) -> tuple[Flag, Environment, Environment]:
+    flag = Flag(
+        key="snap-flag",
+        name="Snap",
+        enabled=True,
+        default_variant="blue",
+        rollout_percentage=10.0,
+    )
+    prod = Environment(key="production", name="Production")
+    dev = Environment(key="dev", name="Dev")
+    db_session.add_all([flag, prod, dev])
+    db_session.flush()
+    db_session.add(
+        FlagEnvironment(
+            flag_id=flag.id,
+            environment_id=dev.id,
+            enabled=True,
+            rollout_percentage=None,
+            default_variant="green",
+        )
+    )
+    db_session.add_all(
+        [
+            TargetingEntry(flag_id=flag.id, kind="allow", user_id="flag-allow"),
+            TargetingEntry(flag_id=flag.id, kind="deny", user_id="flag-deny"),
+            # The override's lists replace the flag-level ones: no deny list in dev.
+            TargetingEntry(
+                flag_id=flag.id, environment_id=dev.id, kind="allow", user_id="dev-allow"
+            ),
+        ]
+    )
+    db_session.add_all(
+        [
+            Rule(
+                flag_id=flag.id,
+                environment_id=prod.id,
+                priority=2,
+                conditions=json.dumps([{"attribute": "plan", "operator": "exists"}]),
+                variant="second",
+            ),
+            Rule(
+                flag_id=flag.id,
+                environment_id=prod.id,
+                priority=1,
+                conditions=json.dumps(
+                    [{"attribute": "plan", "operator": "equals", "value": "pro"}]
+                ),
+                variant="first",
+            ),
+            Rule(
+                flag_id=flag.id,
+                environment_id=prod.id,
+                priority=0,
+                conditions="[]",
+                enabled=False,
+                variant="disabled-rule",
+            ),
+        ]
+    )
+    db_session.commit()
+    return flag, prod, dev
+
+
+class TestLoadSnapshot:
+    def test_uses_five_queries(
+        self,
+        db_session: Session,
+        count_queries: Callable[[], AbstractContextManager[list[str]]],
+    ) -> None:
+        _seed(db_session)
+        with count_queries() as statements:
+            load_snapshot(db_session)
+        assert len(statements) == 5
+
+    def test_flag_level_config_without_override(self, db_session: Session) -> None:
+        _seed(db_session)
+        config = load_snapshot(db_session).lookup("snap-flag", "production")
+        assert config is not None
+        assert set(config.targeted_allow) == {"flag-allow"}
+        assert set(config.targeted_deny) == {"flag-deny"}
+        assert config.rollout_percentage == 10.0
+        assert config.default_variant == "blue"
+        assert [r.variant for r in config.rules] == ["first", "second"]
+
+    def test_env_override_merged(self, db_session: Session) -> None:
+        _seed(db_session)
+        config = load_snapshot(db_session).lookup("snap-flag", "dev")
+        assert config is not None
+        assert set(config.targeted_allow) == {"dev-allow"}
+        assert len(config.targeted_deny) == 0
+        # A null per-env rollout falls back to the flag-level value.
+        assert config.rollout_percentage == 10.0
+        assert config.default_variant == "green"
+        assert config.rules == ()
+
+    def test_disabled_override(self, db_session: Session) -> None:
+        flag, _prod, dev = _seed(db_session)
+        override = db_session.query(FlagEnvironment).filter_by(environment_id=dev.id).one()
+        override.enabled = False
+        db_session.commit()
+        config = load_snapshot(db_session).lookup(flag.key, "dev")
+        assert config is not None
+        assert config.disabled is True
+
+    def test_unknown_env_uses_flag_level_without_rules(self, db_session: Session) -> None:
+        _seed(db_session)
+        config = load_snapshot(db_session).lookup("snap-flag", "nowhere")
+        assert config is not None
+        assert config.default_variant == "blue"
+        assert config.rules == ()
+
+    def test_unknown_flag(self, db_session: Session) -> None:
+        _seed(db_session)
+        assert load_snapshot(db_session).lookup("missing", "production") is None
+
+
+class TestSnapshotEvaluation:
+    def test_warm_evaluation_issues_no_queries(
+        self,
+        client: TestClient,
+        admin_headers: dict[str, str],
+        count_queries: Callable[[], AbstractContextManager[list[str]]],
+    ) -> None:
+        client.post(
+            "/api/v1/flags",
+            json={"key": "warm", "name": "Warm", "enabled": True},
+            headers=admin_headers,
+        )
+        body = {"flag_key": "warm", "env_key": "production", "user_id": "u1"}
+        client.post("/api/v1/evaluate", json=body, headers=admin_headers)
+        with count_queries() as statements:
+            for _ in range(5):
+                resp = client.post("/api/v1/evaluate", json=body, headers=admin_headers)
+                assert resp.json()["reason"] == "default"
+        assert statements == []
+
+    def test_admin_write_invalidates_snapshot(
+        self, client: TestClient, admin_headers: dict[str, str]
+    ) -> None:
+        flag_id = client.post(
+            "/api/v1/flags",
+            json={"key": "toggle", "name": "Toggle", "enabled": True},
+            headers=admin_headers,
+        ).json()["id"]
+        body = {"flag_key": "toggle", "env_key": "production", "user_id": "u1"}
+        resp = client.post("/api/v1/evaluate", json=body, headers=admin_headers)
+        assert resp.json()["reason"] == "default"
+        client.patch(f"/api/v1/flags/{flag_id}", json={"enabled": False}, headers=admin_headers)
+        resp = client.post("/api/v1/evaluate", json=body, headers=admin_headers)
+        assert resp.json()["reason"] == "disabled"
+
+    def test_env_override_evaluation(
+        self, client: TestClient, db_session: Session, admin_headers: dict[str, str]
+    ) -> None:
+        _seed(db_session)
+        resp = client.post(
+            "/api/v1/evaluate",
+            json={"flag_key": "snap-flag", "env_key": "dev", "user_id": "dev-allow"},
+            headers=admin_headers,
+        )
+        data = resp.json()
+        assert data["reason"] == "targeted_allow"
+        assert data["variant"] == "green"
+        # flag-level allow list does not apply once the env override exists
+        resp = client.post(
+            "/api/v1/evaluate",
+            json={"flag_key": "snap-flag", "env_key": "dev", "user_id": "flag-allow"},
+            headers=admin_headers,
+        )
+        assert resp.json()["reason"] != "targeted_allow"
+
+
+class TestConfigVersionPolling:
+    @pytest.fixture()
+    def poll_every(self, monkeypatch: pytest.MonkeyPatch) -> Callable[[float], None]:
+        def _set(seconds: float) -> None:
+            monkeypatch.setenv("CONFIG_POLL_INTERVAL_SECONDS", str(seconds))
+            reset_settings()
+
+        return _set
+
+    def test_other_workers_write_is_picked_up_after_the_interval(
+        self,
+        client: TestClient,
+        db_session: Session,
+        admin_headers: dict[str, str],
+        poll_every: Callable[[float], None],
+    ) -> None:
+        poll_every(0.5)
+        flag_id = client.post(
+            "/api/v1/flags",
+            json={"key": "toggle", "name": "Toggle", "enabled": True},
+            headers=admin_headers,
+        ).json()["id"]
+        body = {"flag_key": "toggle", "env_key": "production", "user_id": "u1"}
+        assert (
+            client.post("/api/v1/evaluate", json=body, headers=admin_headers).json()["reason"]
+            == "default"
+        )
+
+        # Another worker's write: committed with its change row, but this
+        # process is not told about it.
+        flag = db_session.get(Flag, flag_id)
+        assert flag is not None
+        flag.enabled = False
+        record_change(db_session, FLAG, flag.id)
+        db_session.commit()
+        assert (
+            client.post("/api/v1/evaluate", json=body, headers=admin_headers).json()["reason"]
+            == "default"
+        )
+        time.sleep(0.6)
+        assert (
+            client.post("/api/v1/evaluate", json=body, headers=admin_headers).json()["reason"]
+            == "disabled"
+        )
+
+    def test_write_during_a_poll_is_not_skipped(
+        self,
+        client: TestClient,
+        admin_headers: dict[str, str],
+        monkeypatch: pytest.MonkeyPatch,
+        poll_every: Callable[[float], None],
+    ) -> None:
+        poll_every(3600)
+        client.post(
+            "/api/v1/flags",
+            json={"key": "f", "name": "F", "enabled": True},
+            headers=admin_headers,
+        )
+        polls: list[int] = []
+
+        def racing_latest_version(db: Session) -> int:
+            version = latest_version(db)
+            if not polls:
+                # Another request commits a write after this poll read the log.
+                mark_config_changed()
+            polls.append(version)
+            return version
+
+        monkeypatch.setattr("app.core.snapshot.latest_version", racing_latest_version)
+        body = {"flag_key": "f", "env_key": "production", "user_id": "u1"}
+        for _ in range(3):
+            client.post("/api/v1/evaluate", json=body, headers=admin_headers)
+        assert len(polls) == 2
+
+    def test_poll_is_one_index_lookup(
+        self,
+        client: TestClient,
+        admin_headers: dict[str, str],
+        count_queries: Callable[[], AbstractContextManager[list[str]]],
+        poll_every: Callable[[float], None],
+    ) -> None:
+        poll_every(0)
+        client.post(
+            "/api/v1/flags",
+            json={"key": "f", "name": "F", "enabled": True},
+            headers=admin_headers,
+        )
+        body = {"flag_key": "f", "env_key": "production", "user_id": "u1"}
+        client.post("/api/v1/evaluate", json=body, headers=admin_headers)
+        with count_queries() as statements:
+            client.post("/api/v1/evaluate", json=body, headers=admin_headers)
+        assert len(statements) == 1
+        assert "max(config_changes.version)" in statements[0]
+
+    def test_snapshot_version_is_the_change_log_version(
+        self, client: TestClient, db_session: Session, admin_headers: dict[str, str]
+    ) -> None:
+        for key in ("a", "b"):
+            client.post("/api/v1/flags", json={"key": key, "name": key}, headers=admin_headers)
+        stats = client.get("/api/v1/stats/targeting", headers=admin_headers).json()
+        assert stats["config_version"] == latest_version(db_session) == 2
@@ -0,0 +1,503 @@
+"""Tests for targeting lists: membership sets, storage, endpoints, migration and stats."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from alembic.config import Config
+from sqlalchemy import create_engine, func, select, text
+
+from alembic import command
+from app.core.changes import latest_version
+from app.core.targeting import (
+    ALLOW,
+    DENY,
+    EMPTY,
+    BulkUpload,
+    FlagLevelList,
+    TargetingList,
+    TargetingStore,
+    flag_level_lists,
+    replace_members,
+)
+from app.models.models import (
+    Environment,
+    Flag,
+    FlagEnvironment,
+    TargetingEntry,
+    TargetingUpload,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy.orm import Session
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class TestTargetingStore:
+    def test_membership(self) -> None:
+        targets = TargetingList(["a", "b"])
+        assert "a" in targets
+        assert "c" not in targets
+        assert len(targets) == 2
+
+    def test_identical_lists_share_one_set(self) -> None:
+        store = TargetingStore()
+        assert store.get(["u1", "u2", "u3"]) is store.get(["u3", "u2", "u1"])
+        assert store.get([]) is EMPTY
+        stats = store.stats()
+        assert stats.lists == 1
+        assert stats.entries == 3
+        assert stats.largest == 3
+        assert stats.memory_bytes > 0
+
+    def test_duplicates_collapse(self) -> None:
+        assert len(TargetingStore().get(["x", "x", "y"])) == 2
+
+
+class TestTargetingEvaluation:
+    def test_large_allow_list(self, client: TestClient, admin_headers: dict[str, str]) -> None:
+        allow = [f"user-{i}" for i in range(50_000)]
+        client.post(
+            "/api/v1/flags",
+            json={"key": "big", "name": "Big", "enabled": True, "targeted_allow": allow},
+            headers=admin_headers,
+        )
+        for user_id, reason in (("user-49999", "targeted_allow"), ("other", "default")):
+            resp = client.post(
+                "/api/v1/evaluate",
+                json={"flag_key": "big", "env_key": "production", "user_id": user_id},
+                headers=admin_headers,
+            )
+            assert resp.json()["reason"] == reason
+
+    def test_stats_endpoint(self, client: TestClient, admin_headers: dict[str, str]) -> None:
+        client.post(
+            "/api/v1/flags",
+            json={
+                "key": "t",
+                "name": "T",
+                "targeted_allow": ["a", "b"],
+                "targeted_deny": ["c"],
+            },
+            headers=admin_headers,
+        )
+        resp = client.get("/api/v1/stats/targeting", headers=admin_headers)
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["lists"] == 2
+        assert data["entries"] == 3
+        assert data["largest"] == 2
+        assert data["memory_bytes"] > 0
+
+    def test_stats_requires_admin(self, client: TestClient, read_headers: dict[str, str]) -> None:
+        resp = client.get("/api/v1/stats/targeting", headers=read_headers)
+        assert resp.status_code == 401
+
+
+def _create_flag(client: TestClient, headers: dict[str, str], **fields: object) -> str:
+    body = {"key": "t", "name": "T", "enabled": True, **fields}
+    resp = client.post("/api/v1/flags", json=body, headers=headers)
+    assert resp.status_code == 201
+    return str(resp.json()["id"])
+
+
+def _entries(db_session: Session, flag_id: str) -> dict[tuple[str | None, str, str], int]:
+    rows = db_session.execute(
+        select(
+            TargetingEntry.environment_id,
+            TargetingEntry.kind,
+            TargetingEntry.user_id,
+            TargetingEntry.id,
+        ).where(TargetingEntry.flag_id == flag_id)
+    )
+    return {(env, kind, user_id): row_id for env, kind, user_id, row_id in rows}
+
+
+class TestTargetingStorage:
+    def test_flag_lists_become_rows(
+        self, client: TestClient, admin_headers: dict[str, str], db_session: Session
+    ) -> None:
+        flag_id = _create_flag(
+            client, admin_headers, targeted_allow=["a", "b", "a"], targeted_deny=["c"]
+        )
+        assert set(_entries(db_session, flag_id)) == {
+            (None, ALLOW, "a"),
+            (None, ALLOW, "b"),
+            (None, DENY, "c"),
+        }
+        flag = client.get(f"/api/v1/flags/{flag_id}", headers=admin_headers).json()
+        assert (flag["targeted_allow"], flag["targeted_deny"]) == (["a", "b"], ["c"])
+        assert (flag["targeted_allow_count"], flag["targeted_deny_count"]) == (2, 1)
+
+    def test_update_writes_only_the_difference(
+        self, client: TestClient, admin_headers: dict[str, str], db_session: Session
+    ) -> None:
+        flag_id = _create_flag(client, admin_headers, targeted_allow=["a", "b"])
+        before = _entries(db_session, flag_id)
+        resp = client.patch(
+            f"/api/v1/flags/{flag_id}",
+            json={"targeted_allow": ["b", "c"]},
+            headers=admin_headers,
+        )
+        assert resp.json()["targeted_allow"] == ["b", "c"]
+        after = _entries(db_session, flag_id)
+        assert set(after) == {(None, ALLOW, "b"), (None, ALLOW, "c")}
+        # "b" was kept, not rewritten.
+        assert after[(None, ALLOW, "b")] == before[(None, ALLOW, "b")]
+
+    def test_flag_delete_removes_entries(
+        self, client: TestClient, admin_headers: dict[str, str], db_session: Session
+    ) -> None:
+        flag_id = _create_flag(client, admin_headers, targeted_deny=["x"])
+        assert client.delete(f"/api/v1/flags/{flag_id}", headers=admin_headers).status_code == 204
+        assert _entries(db_session, flag_id) == {}
+
+    def test_replace_members_and_flag_level_lists(self, db_session: Session) -> None:
+        flag = Flag(key="f", name="F")
+        env = Environment(key="dev", name="Dev")
+        db_session.add_all([flag, env])
+        db_session.flush()
+        replace_members(db_session, flag.id, None, ALLOW, [f"u{i}" for i in range(1200)])
+        replace_members(db_session, flag.id, env.id, ALLOW, ["env-only"])
+        replace_members(db_session, flag.id, None, ALLOW, [f"u{i}" for i in range(600, 1800)])
+        lists = flag_level_lists(db_session, [flag.id], limit=3)
+        assert lists == {(flag.id, ALLOW): FlagLevelList(["u1000", "u1001", "u1002"], 1200)}
+        assert flag_level_lists(db_session, limit=3) == lists
+        flag_level = {user_id for env, _, user_id in _entries(db_session, flag.id) if env is None}
+        assert flag_level == {f"u{i}" for i in range(600, 1800)}
+        assert db_session.scalar(select(func.count()).select_from(TargetingUpload)) == 0
+
+
+class TestTargetingEndpoints:
+    def test_patch_adds_and_removes_incrementally(
+        self, client: TestClient, admin_headers: dict[str, str], read_headers: dict[str, str]
+    ) -> None:
+        flag_id = _create_flag(client, admin_headers, targeted_allow=["a", "b"])
+        url = f"/api/v1/flags/{flag_id}/targeting/allow"
+        resp = client.patch(
+            url, json={"add": ["c", "a"], "remove": ["b", "zz"]}, headers=admin_headers
+        )
+        assert resp.status_code == 200
+        assert resp.json() == {"added": 1, "removed": 1, "size": 2}
+
+        evaluate = {"flag_key": "t", "env_key": "production"}
+        for user_id, reason in (("c", "targeted_allow"), ("b", "default")):
+            result = client.post(
+                "/api/v1/evaluate", json={**evaluate, "user_id": user_id}, headers=read_headers
+            )
+            assert result.json()["reason"] == reason
+
+        changes = client.get("/api/v1/changes", params={"since": 1}, headers=read_headers).json()
+        [entity] = [c["entity"] for c in changes["changes"]]
+        assert (entity["targeted_allow"], entity["targeted_allow_count"]) == (["a", "c"], 2)
+
+    def test_noop_patch_does_not_change_config(
+        self, client: TestClient, admin_headers: dict[str, str], read_headers: dict[str, str]
+    ) -> None:
+        flag_id = _create_flag(client, admin_headers, targeted_deny=["a"])
+        version = client.get("/api/v1/changes", headers=read_headers).json()["version"]
+        resp = client.patch(
+            f"/api/v1/flags/{flag_id}/targeting/deny",
+            json={"add": ["a"], "remove": ["missing"]},
+            headers=admin_headers,
+        )
+        assert resp.json() == {"added": 0, "removed": 0, "size": 1}
+        assert client.get("/api/v1/changes", headers=read_headers).json()["version"] == version
+
+    def test_paging_and_membership(self, client: TestClient, admin_headers: dict[str, str]) -> None:
+        flag_id = _create_flag(
+            client, admin_headers, targeted_allow=[f"u{i:02d}" for i in range(25)]
+        )
+        url = f"/api/v1/flags/{flag_id}/targeting/allow"
+        seen: list[str] = []
+        params: dict[str, str | int] = {"limit": 10}
+        while True:
+            page = client.get(url, params=params, headers=admin_headers).json()
+            seen.extend(page["user_ids"])
+            if page["next_after"] is None:
+                break
+            params["after"] = page["next_after"]
+        assert seen == [f"u{i:02d}" for i in range(25)]
+
+        assert client.get(f"{url}/u07", headers=admin_headers).json() == {
+            "user_id": "u07",
+            "member": True,
+        }
+        assert client.get(f"{url}/nope", headers=admin_headers).json()["member"] is False
+        deny = client.get(f"/api/v1/flags/{flag_id}/targeting/deny/u07", headers=admin_headers)
+        assert deny.json()["member"] is False
+
+    def test_environment_override_lists(
+        self,
+        client: TestClient,
+        admin_headers: dict[str, str],
+        read_headers: dict[str, str],
+        db_session: Session,
+    ) -> None:
+        flag_id = _create_flag(client, admin_headers, targeted_allow=["flag-level"])
+        env = client.post(
+            "/api/v1/environments", json={"key": "dev", "name": "Dev"}, headers=admin_headers
+        ).json()
+        url = f"/api/v1/flags/{flag_id}/targeting/allow"
+        body = {"add": ["dev-user"]}
+        missing = client.patch(url, params={"env": "dev"}, json=body, headers=admin_headers)
+        assert missing.status_code == 404
+        assert missing.json()["detail"] == "Flag has no override in this environment"
+        no_env = client.patch(url, params={"env": "nope"}, json=body, headers=admin_headers)
+        assert no_env.json()["detail"] == "Environment not found"
+
+        db_session.add(
+            FlagEnvironment(
+                flag_id=flag_id, environment_id=env["id"], enabled=True, default_variant="on"
+            )
+        )
+        db_session.commit()
+        resp = client.patch(url, params={"env": "dev"}, json=body, headers=admin_headers)
+        assert resp.json() == {"added": 1, "removed": 0, "size": 1}
+        for user_id, reason in (("dev-user", "targeted_allow"), ("flag-level", "default")):
+            result = client.post(
+                "/api/v1/evaluate",
+                json={"flag_key": "t", "env_key": "dev", "user_id": user_id},
+                headers=read_headers,
+            )
+            assert result.json()["reason"] == reason
+        # The flag-level list is untouched.
+        page = client.get(f"/api/v1/flags/{flag_id}/targeting/allow", headers=admin_headers).json()
+        assert page["user_ids"] == ["flag-level"]
+
+    def test_errors(
+        self, client: TestClient, admin_headers: dict[str, str], read_headers: dict[str, str]
+    ) -> None:
+        flag_id = _create_flag(client, admin_headers)
+        assert (
+            client.get(
+                f"/api/v1/flags/{flag_id}/targeting/maybe", headers=admin_headers
+            ).status_code
+            == 422
+        )
+        assert (
+            client.get("/api/v1/flags/nope/targeting/allow", headers=admin_headers).status_code
+            == 404
+        )
+        assert (
+            client.get(f"/api/v1/flags/{flag_id}/targeting/allow", headers=read_headers).status_code
+            == 401
+        )
+
+
+class TestTargetingMigration:
+    def test_json_lists_move_to_rows_and_back(self, tmp_path: Path) -> None:
+        url = f"sqlite:///{tmp_path / 'migrated.db'}"
+        config = Config(ROOT / "alembic.ini")
+        config.set_main_option("sqlalchemy.url", url)
+        command.upgrade(config, "1b89b2832390")
+        engine = create_engine(url)
+        try:
+            with engine.begin() as conn:
+                conn.execute(
+                    text(
+                        "INSERT INTO flags (id, key, name, description, enabled, archived, "
+                        "default_variant, targeted_allow, targeted_deny, created_at, updated_at) "
+                        "VALUES ('f1', 'f', 'F', '', 1, 0, 'off', '[\"a\", \"b\", \"a\"]', '[]', "
+                        "CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"
+                    )
+                )
+                conn.execute(
+                    text(
+                        "INSERT INTO environments (id, key, name, description, created_at) "
+                        "VALUES ('e1', 'dev', 'Dev', '', CURRENT_TIMESTAMP)"
+                    )
+                )
+                conn.execute(
+                    text(
+                        "INSERT INTO flag_environments (id, flag_id, environment_id, enabled, "
+                        "targeted_allow, targeted_deny, default_variant) "
+                        "VALUES ('o1', 'f1', 'e1', 1, '[]', '[\"c\"]', 'on')"
+                    )
+                )
+            command.upgrade(config, "head")
+            with engine.connect() as conn:
+                rows = conn.execute(
+                    text(
+                        "SELECT flag_id, environment_id, kind, user_id FROM targeting_entries "
+                        "ORDER BY id"
+                    )
+                ).all()
+            assert [tuple(r) for r in rows] == [
+                ("f1", None, "allow", "a"),
+                ("f1", None, "allow", "b"),
+                ("f1", "e1", "deny", "c"),
+            ]
+
+            command.downgrade(config, "1b89b2832390")
+            with engine.connect() as conn:
+                flag = conn.execute(text("SELECT targeted_allow, targeted_deny FROM flags")).one()
+                override = conn.execute(
+                    text("SELECT targeted_allow, targeted_deny FROM flag_environments")
+                ).one()
+            assert [json.loads(v) for v in flag] == [["a", "b"], []]
+            assert [json.loads(v) for v in override] == [[], ["c"]]
+        finally:
+            engine.dispose()
+
+
+def _lines(user_ids: list[str], block: int = 1000) -> Iterator[bytes]:
+    for start in range(0, len(user_ids), block):
+        yield "".join(f"{u}\n" for u in user_ids[start : start + block]).encode()
+
+
+def _upload(
+    client: TestClient,
+    headers: dict[str, str],
+    flag_id: str,
+    body: bytes | Iterator[bytes],
+    **params: str | int,
+) -> list[dict[str, object]]:
+    resp = client.post(
+        f"/api/v1/flags/{flag_id}/targeting/allow/upload",
+        params=params,
+        content=body,
+        headers=headers,
+    )
+    assert resp.status_code == 200, resp.text
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in resp.text.splitlines()]
+
+
+class TestBulkUpload:
+    def test_add_in_chunks_reports_progress(
+        self, client: TestClient, admin_headers: dict[str, str], read_headers: dict[str, str]
+    ) -> None:
+        flag_id = _create_flag(client, admin_headers, targeted_allow=["u1"])
+        users = [f"u{i}" for i in range(5000)]
+        lines = _upload(client, admin_headers, flag_id, _lines(users), chunk_size=1000)
+        assert [line["received"] for line in lines[:-1]] == [1000, 2000, 3000, 4000, 5000]
+        summary = lines[-1]
+        assert summary["done"] is True
+        assert (summary["added"], summary["removed"], summary["size"]) == (4999, 0, 5000)
+        result = client.post(
+            "/api/v1/evaluate", json={"flag_key": "t", "user_id": "u4321"}, headers=read_headers
+        )
+        assert result.json()["reason"] == "targeted_allow"
+        changes = client.get("/api/v1/changes", params={"since": 1}, headers=read_headers).json()
+        assert len(changes["changes"]) == 1
+
+    def test_interrupted_upload_has_published_its_chunks(
+        self, client: TestClient, admin_headers: dict[str, str], db_session: Session
+    ) -> None:
+        flag_id = _create_flag(client, admin_headers)
+        before = latest_version(db_session)
+        upload = BulkUpload(db_session, flag_id, None, ALLOW, "add")
+        assert upload.feed(["a", "b"]) is True
+        # The process dies here: finish() and abort() never run.
+        published = latest_version(db_session)
+        assert published > before
+        # A chunk that changes nothing is not logged.
+        assert upload.feed(["a"]) is False
+        assert latest_version(db_session) == published
+
+    def test_remove(self, client: TestClient, admin_headers: dict[str, str]) -> None:
+        flag_id = _create_flag(client, admin_headers, targeted_allow=["a", "b", "c"])
+        summary = _upload(client, admin_headers, flag_id, b"a\nc\nzz\n", mode="remove")[-1]
+        assert (summary["removed"], summary["size"]) == (2, 1)
+
+    def test_replace_swaps_once_and_keeps_unchanged_rows(
+        self, client: TestClient, admin_headers: dict[str, str], db_session: Session
+    ) -> None:
+        flag_id = _create_flag(client, admin_headers, targeted_allow=["keep", "drop"])
+        before = _entries(db_session, flag_id)
+        lines = _upload(
+            client,
+            admin_headers,
+            flag_id,
+            b"keep\nnew-1\nnew-2\nnew-1\n",
+            mode="replace",
+            chunk_size=2,
+        )
+        # Staged chunks change nothing until the final swap.
+        assert all(line["added"] == 0 for line in lines[:-1])
+        assert (lines[-1]["added"], lines[-1]["removed"], lines[-1]["size"]) == (2, 1, 3)
+        after = _entries(db_session, flag_id)
+        assert set(after) == {(None, ALLOW, "keep"), (None, ALLOW, "new-1"), (None, ALLOW, "new-2")}
+        assert after[(None, ALLOW, "keep")] == before[(None, ALLOW, "keep")]
+        assert db_session.scalar(select(func.count()).select_from(TargetingUpload)) == 0
+
+    def test_csv_first_column_with_header(
+        self, client: TestClient, admin_headers: dict[str, str]
+    ) -> None:
+        flag_id = _create_flag(client, admin_headers)
+        body = b'user_id,plan\n"u1",pro\nu2 , free\n"u3,eu", "a,b"\n\n'
+        resp = client.post(
+            f"/api/v1/flags/{flag_id}/targeting/deny/upload",
+            params={"header": "true"},
+            content=body,
+            headers={**admin_headers, "Content-Type": "text/csv"},
+        )
+        assert json.loads(resp.text.splitlines()[-1])["size"] == 3
+        page = client.get(f"/api/v1/flags/{flag_id}/targeting/deny", headers=admin_headers).json()
+        assert page["user_ids"] == ["u1", "u2", "u3,eu"]
+
+    def test_invalid_line_stops_upload(
+        self, client: TestClient, admin_headers: dict[str, str], db_session: Session
+    ) -> None:
+        flag_id = _create_flag(client, admin_headers, targeted_allow=["old"])
+        blocks = [b"a\nb\n", b"x" * 300 + b"\nc\n"]
+        lines = _upload(client, admin_headers, flag_id, iter(blocks), mode="replace", chunk_size=2)
+        assert "longer than 255" in str(lines[-1]["error"])
+        assert "done" not in lines[-1]
+        # The replacement never happened and nothing is left staged.
+        assert set(_entries(db_session, flag_id)) == {(None, ALLOW, "old")}
+        assert db_session.scalar(select(func.count()).select_from(TargetingUpload)) == 0
+
+        # In add mode, chunks committed before the error stay applied.
+        lines = _upload(client, admin_headers, flag_id, iter(blocks), chunk_size=2)
+        assert lines[-1]["added"] == 2
+        page = client.get(f"/api/v1/flags/{flag_id}/targeting/allow", headers=admin_headers).json()
+        assert page["user_ids"] == ["a", "b", "old"]
+
+    def test_body_without_newlines_is_not_buffered(
+        self, client: TestClient, admin_headers: dict[str, str], db_session: Session
+    ) -> None:
+        flag_id = _create_flag(client, admin_headers, targeted_allow=["old"])
+        blocks = iter([b"x" * 8192] * 1024)  # 8 MiB on one line
+        lines = _upload(client, admin_headers, flag_id, blocks, mode="replace")
+        assert lines == [
+            {"received": 0, "added": 0, "removed": 0, "error": "line longer than 17404 bytes"}
+        ]
+        assert set(_entries(db_session, flag_id)) == {(None, ALLOW, "old")}
+
+    def test_errors_before_streaming(
+        self, client: TestClient, admin_headers: dict[str, str]
+    ) -> None:
+        url = "/api/v1/flags/nope/targeting/allow/upload"
+        assert client.post(url, content=b"a\n", headers=admin_headers).status_code == 404
+        flag_id = _create_flag(client, admin_headers)
+        resp = client.post(
+            f"/api/v1/flags/{flag_id}/targeting/allow/upload",
+            params={"mode": "merge"},
+            content=b"a\n",
+            headers=admin_headers,
+        )
+        assert resp.status_code == 422
+
+    def test_large_upload_in_every_mode(
+        self, client: TestClient, admin_headers: dict[str, str], read_headers: dict[str, str]
+    ) -> None:
+        # Throughput is tracked by the targeting_upload benchmark (benchmarks/run.py).
+        flag_id = _create_flag(client, admin_headers)
+        users = [f"user-{i}" for i in range(20_000)]
+        for mode in ("add", "replace"):
+            lines = _upload(client, admin_headers, flag_id, _lines(users, block=8192), mode=mode)
+            assert lines[-1]["size"] == 20_000
+        result = client.post(
+            "/api/v1/evaluate",
+            json={"flag_key": "t", "user_id": "user-19999"},
+            headers=read_headers,
+        )
+        assert result.json()["reason"] == "targeted_allow"
@@ -0,0 +1,172 @@
+"""Tests for the Server-Timing header and the slow-evaluation log."""
+
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+
+import pytest
+
+from app.core.config import reset_settings
+from app.core.timing import RequestTiming, server_timing_header
+
+if TYPE_CHECKING:
+    from collections.abc import Generator
+
+    from fastapi.testclient import TestClient
+
+EVAL = {"flag_key": "f", "env_key": "production", "user_id": "u"}
+
+
+@pytest.fixture()
+def timing_settings(monkeypatch: pytest.MonkeyPatch) -> Generator[pytest.MonkeyPatch, None, None]:
+    """Let a test set timing variables; settings are re-read per request."""
+    yield monkeypatch
+    reset_settings()
+
+
+def _enable(monkeypatch: pytest.MonkeyPatch, **env: str) -> None:
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    reset_settings()
+
+
+def _phases(header: str) -> list[str]:
+    return [part.split(";")[0] for part in header.split(", ")]
+
+
+def _seed(client: TestClient, admin_headers: dict[str, str]) -> None:
+    client.post(
+        "/api/v1/environments",
+        json={"key": "production", "name": "Production"},
+        headers=admin_headers,
+    )
+    client.post(
+        "/api/v1/flags",
+        json={"key": "f", "name": "F", "enabled": True, "targeted_allow": ["a", "b"]},
+        headers=admin_headers,
+    )
+    client.post(
+        "/api/v1/rules",
+        json={
+            "flag_key": "f",
+            "env_key": "production",
+            "conditions": [{"attribute": "plan", "operator": "equals", "value": "pro"}],
+            "variant": "pro",
+        },
+        headers=admin_headers,
+    )
+
+
+class TestRequestTiming:
+    def test_breakdown_derives_parse_and_serialize(self) -> None:
+        timing = RequestTiming()
+        timing.record("auth", 0.001)
+        with timing.phase("db"):
+            pass
+        with timing.phase("match"):
+            pass
+        breakdown = timing.breakdown()
+        assert list(breakdown) == ["auth", "parse", "db", "match", "serialize", "total"]
+        assert breakdown["auth"] == pytest.approx(1.0)
+        assert all(value >= 0 for value in breakdown.values())
+
+    def test_header_format(self) -> None:
+        assert server_timing_header({"db": 1.23456, "total": 2}) == "db;dur=1.235, total;dur=2.000"
+
+
+class TestServerTimingHeader:
+    def test_off_by_default(
+        self, client: TestClient, admin_headers: dict[str, str], read_headers: dict[str, str]
+    ) -> None:
+        _seed(client, admin_headers)
+        resp = client.post("/api/v1/evaluate", json=EVAL, headers=read_headers)
+        assert "server-timing" not in resp.headers
+
+    @pytest.mark.parametrize(
+        ("path", "body"),
+        [
+            ("/api/v1/evaluate", EVAL),
+            ("/api/v1/evaluate", {"evaluations": [EVAL, {**EVAL, "flag_key": "nope"}]}),
+            ("/api/v1/evaluate/all", {"env_key": "production", "user_id": "u"}),
+        ],
+    )
+    def test_evaluation_phases(
+        self,
+        timing_settings: pytest.MonkeyPatch,
+        client: TestClient,
+        admin_headers: dict[str, str],
+        read_headers: dict[str, str],
+        path: str,
+        body: dict[str, object],
+    ) -> None:
+        _seed(client, admin_headers)
+        _enable(timing_settings, SERVER_TIMING="true")
+        resp = client.post(path, json=body, headers=read_headers)
+        assert resp.status_code == 200
+        assert _phases(resp.headers["server-timing"]) == [
+            "auth",
+            "parse",
+            "db",
+            "match",
+            "serialize",
+            "total",
+        ]
+
+    def test_other_endpoints_report_total(
+        self, timing_settings: pytest.MonkeyPatch, client: TestClient
+    ) -> None:
+        _enable(timing_settings, SERVER_TIMING="true")
+        resp = client.get("/api/v1/healthz")
+        assert _phases(resp.headers["server-timing"]) == ["total"]
+
+
+class TestSlowEvaluationLog:
+    def test_slow_evaluations_are_logged_with_flag_details(
+        self,
+        timing_settings: pytest.MonkeyPatch,
+        caplog: pytest.LogCaptureFixture,
+        client: TestClient,
+        admin_headers: dict[str, str],
+        read_headers: dict[str, str],
+    ) -> None:
+        _seed(client, admin_headers)
+        _enable(timing_settings, SLOW_EVALUATION_THRESHOLD_MS="0.001")
+        with caplog.at_level(logging.WARNING, logger="app.core.timing"):
+            resp = client.post(
+                "/api/v1/evaluate",
+                json={"evaluations": [EVAL, EVAL, {**EVAL, "flag_key": "nope"}]},
+                headers=read_headers,
+            )
+        # Only enabled for the log, so no header.
+        assert "server-timing" not in resp.headers
+        (record,) = caplog.records
+        assert record.getMessage().startswith("Slow evaluation: POST /api/v1/evaluate took ")
+        assert record.flags == [  # type: ignore[attr-defined]
+            {"flag": "f", "env": "production", "rules": 1, "allow": 2, "deny": 0},
+            {"flag": "nope", "env": "production", "rules": 0, "allow": 0, "deny": 0},
+        ]
+        assert set(record.server_timing) == {  # type: ignore[attr-defined]
+            "auth",
+            "parse",
+            "db",
+            "match",
+            "serialize",
+            "total",
+        }
+
+    def test_fast_and_non_evaluation_requests_are_not_logged(
+        self,
+        timing_settings: pytest.MonkeyPatch,
+        caplog: pytest.LogCaptureFixture,
+        client: TestClient,
+        admin_headers: dict[str, str],
+        read_headers: dict[str, str],
+    ) -> None:
+        _enable(timing_settings, SLOW_EVALUATION_THRESHOLD_MS="60000")
+        _seed(client, admin_headers)
+        with caplog.at_level(logging.WARNING, logger="app.core.timing"):
+            client.post("/api/v1/evaluate", json=EVAL, headers=read_headers)
+            _enable(timing_settings, SLOW_EVALUATION_THRESHOLD_MS="0.001")
+            client.get("/api/v1/flags", headers=admin_headers)
+        assert caplog.records == []